@@ -6,7 +6,30 @@ from datetime import datetime, timedelta
 import re
 import random
 
+from booking_ids import new_booking_id, normalize_booking_id
+from booking_list import BookingListView
+from catalog import get_catalog
+from intents import IntentClassifier
+from seating import booking_show, get_inventory
+from schedule import format_showtime
+from slots import SlotExtractor
+from storage import open_storage
+from temporal import format_day
+from transcript import trim_text_widget
+
 class MovieBookingChatbot:
+    # Intent keywords, in priority order
+    INTENTS = [
+        ("greeting", ["hello", "hi", "hey", "greetings"]),
+        ("help", ["help"]),
+        ("book", ["book", "reserve", "buy ticket"]),
+        ("show_movies", ["show movie", "available", "what's playing", "list movie"]),
+        ("view_bookings", ["view booking", "my booking", "previous booking"]),
+        ("cancel", ["cancel", "delete booking"]),
+        ("thanks", ["thank", "thanks", "appreciate"]),
+        ("price", ["price", "cost", "how much"])
+    ]
+    
     def __init__(self):
         # Initialize data files
         self.movies_file = "movies.json"
@@ -16,7 +39,12 @@ class MovieBookingChatbot:
         # Initialize data
         self.current_user = None
         self.booking_state = {}
+        self.intent_classifier = IntentClassifier(self.INTENTS)
         self.initialize_data_files()
+        self.catalog = get_catalog(self.movies_file)
+        self.storage = open_storage(self.bookings_file, self.users_file)
+        self.inventory = get_inventory(self.storage, self.catalog)
+        self.slot_extractor = SlotExtractor(self.catalog)
         
         # Ticket price configuration
         self.ticket_price = 12.50
@@ -371,15 +399,12 @@ class MovieBookingChatbot:
     
     def load_booking_data(self):
         """Load data into comboboxes"""
-        with open(self.movies_file, 'r') as f:
-            data = json.load(f)
-        
         # Load movies
-        movies = [movie["title"] for movie in data["movies"]]
+        movies = [movie["title"] for movie in self.catalog.movies()]
         self.movie_combo['values'] = movies
         
         # Load theaters
-        theaters = [theater["name"] for theater in data["theaters"]]
+        theaters = [theater["name"] for theater in self.catalog.theaters()]
         self.theater_combo['values'] = theaters
         
         # Load dates (today + next 7 days)
@@ -390,7 +415,7 @@ class MovieBookingChatbot:
         self.date_combo['values'] = dates
         
         # Load showtimes
-        self.time_combo['values'] = data["showtimes"]
+        self.time_combo['values'] = self.catalog.showtimes()
     
     def update_price_display(self):
         """Update the price display based on selections"""
@@ -430,6 +455,7 @@ class MovieBookingChatbot:
         else:
             self.chat_display.insert(tk.END, "Assistant: ", "bot_tag")
             self.chat_display.insert(tk.END, message + "\n\n")
+        trim_text_widget(self.chat_display, 2000)
         
         self.chat_display.config(state=tk.DISABLED)
         self.chat_display.see(tk.END)
@@ -450,8 +476,11 @@ class MovieBookingChatbot:
     
     def understand_message(self, message):
         """Natural language processing for user messages"""
+        match = self.intent_classifier.classify(message)
+        intent = match.intent if match else None
+        
         # Greeting patterns
-        if any(word in message for word in ["hello", "hi", "hey", "greetings"]):
+        if intent == "greeting":
             return random.choice([
                 "Hello! How can I assist you with movie tickets today?",
                 "Hi there! Ready to book some movies?",
@@ -459,27 +488,27 @@ class MovieBookingChatbot:
             ])
         
         # Help command
-        elif "help" in message:
+        elif intent == "help":
             return self.get_help_response()
         
         # Book tickets patterns
-        elif any(word in message for word in ["book", "reserve", "buy ticket"]):
+        elif intent == "book":
             return self.process_booking_request(message)
         
         # Show movies patterns
-        elif any(word in message for word in ["show movie", "available", "what's playing", "list movie"]):
+        elif intent == "show_movies":
             return self.show_available_movies()
         
         # View bookings patterns
-        elif any(word in message for word in ["view booking", "my booking", "previous booking"]):
+        elif intent == "view_bookings":
             return self.view_bookings_chat()
         
         # Cancel booking patterns
-        elif any(word in message for word in ["cancel", "delete booking"]):
+        elif intent == "cancel":
             return self.process_cancel_request(message)
         
         # Thank you patterns
-        elif any(word in message for word in ["thank", "thanks", "appreciate"]):
+        elif intent == "thanks":
             return random.choice([
                 "You're welcome! Enjoy your movie! 🎬",
                 "My pleasure! Let me know if you need anything else.",
@@ -487,7 +516,7 @@ class MovieBookingChatbot:
             ])
         
         # Price query
-        elif any(word in message for word in ["price", "cost", "how much"]):
+        elif intent == "price":
             return f"Ticket prices:\nStandard: ${self.ticket_price}\nVIP: ${self.ticket_price + self.vip_upcharge}\n\nYou can also use the booking panel on the right to calculate exact prices."
         
         # Default response
@@ -517,57 +546,64 @@ class MovieBookingChatbot:
     
     def process_booking_request(self, message):
         """Process natural language booking request"""
-        # Extract movie title
-        movie_title = None
-        with open(self.movies_file, 'r') as f:
-            movies_data = json.load(f)
-        
-        for movie in movies_data["movies"]:
-            if movie["title"].lower() in message:
-                movie_title = movie["title"]
-                break
+        # Every detail in one pass: movie, theater, day, time, tickets, seat type
+        slots = self.slot_extractor.extract(message)
+        movie = slots.movie or self.catalog.match_movie(message, fuzzy=True)
+        movie_title = movie["title"] if movie else None
         
         if not movie_title:
             return "Which movie would you like to book? You can say something like 'Book tickets for The Last Adventure'"
         
-        # Extract number of tickets
-        ticket_match = re.search(r'(\d+)\s*ticket', message)
-        num_tickets = int(ticket_match.group(1)) if ticket_match else 1
+        num_tickets = slots.tickets or 1
         
-        # Extract date (simplified)
-        date_str = "tomorrow"
-        if "today" in message:
-            date_str = "today"
+        # Day defaults to tomorrow
+        day = slots.date or (datetime.now() + timedelta(days=1)).date()
+        date_str = format_day(day)
+        showtime = format_showtime(slots.time) if slots.time else None
+        if showtime:
+            date_str += f" at {showtime}"
+        if slots.theater:
+            date_str += f" at {slots.theater['name']}"
         
         response = f"I'll help you book {num_tickets} ticket(s) for '{movie_title}' {date_str}.\n\n"
-        response += "Please use the booking panel on the right to select:\n"
-        response += "1. Theater\n2. Exact date\n3. Showtime\n4. Seat type\n\n"
-        response += "Or you can type: 'Book {num_tickets} tickets for {movie_title} at 6:30 PM' for more specific booking."
+        missing = [label for label, known in [("Theater", slots.theater), ("Exact date", slots.date),
+                                              ("Showtime", showtime), ("Seat type", slots.seat_type)]
+                   if not known]
+        if missing:
+            response += "Please use the booking panel on the right to select:\n"
+            response += "".join(f"{n}. {label}\n" for n, label in enumerate(missing, 1)) + "\n"
+            response += f"Or you can type: 'Book {num_tickets} tickets for {movie_title} at 6:30 PM' for more specific booking."
+        else:
+            response += "Everything is filled in on the booking panel, click '🎫 Book Tickets' to confirm."
         
         # Auto-fill the form
         self.movie_var.set(movie_title)
         self.tickets_var.set(str(num_tickets))
+        self.date_var.set(day.strftime("%Y-%m-%d (%A)"))
+        if showtime and showtime in self.catalog.showtimes():
+            self.time_var.set(showtime)
+        if slots.theater:
+            self.theater_var.set(slots.theater["name"])
+        if slots.seat_type:
+            self.seat_type_var.set(slots.seat_type)
         
         return response
     
     def show_available_movies(self):
         """Show available movies in chat"""
-        with open(self.movies_file, 'r') as f:
-            data = json.load(f)
-        
         response = "🎬 **Now Showing:**\n\n"
         
-        for movie in data["movies"]:
+        for movie in self.catalog.movies():
             response += f"**{movie['title']}**\n"
             response += f"Genre: {movie['genre']} | Duration: {movie['duration']} | Rating: {movie['rating']}\n"
             response += f"{movie['description']}\n\n"
         
         response += "**Available Theaters:**\n"
-        for theater in data["theaters"]:
+        for theater in self.catalog.theaters():
             response += f"• {theater['name']} ({theater['location']})\n"
         
         response += "\n**Showtimes:**\n"
-        for time in data["showtimes"]:
+        for time in self.catalog.showtimes():
             response += f"• {time}\n"
         
         return response
@@ -577,17 +613,16 @@ class MovieBookingChatbot:
         if not self.current_user:
             return "Please log in first to view your bookings. Use the 'Login' button above."
         
-        with open(self.bookings_file, 'r') as f:
-            data = json.load(f)
-        
-        user_bookings = [b for b in data["bookings"] if b.get("username") == self.current_user]
+        user_bookings, more = self.storage.recent_bookings_for_user(self.current_user, 10)
         
         if not user_bookings:
             return "You don't have any bookings yet. Would you like to book a movie?"
         
         response = "📋 **Your Bookings:**\n\n"
+        if more:
+            response += "Showing your 10 most recent bookings; all of them are under 'View Bookings'.\n\n"
         
-        for i, booking in enumerate(user_bookings, 1):
+        for i, booking in enumerate(reversed(user_bookings), 1):
             response += f"**Booking #{i}**\n"
             response += f"Movie: {booking['movie']}\n"
             response += f"Theater: {booking['theater']}\n"
@@ -595,6 +630,7 @@ class MovieBookingChatbot:
             response += f"Tickets: {booking['tickets']} ({booking['seat_type']})\n"
             response += f"Total: ${booking['total_price']}\n"
             response += f"Booking ID: {booking['booking_id']}\n"
+            response += f"Status: {booking.get('status', 'confirmed')}\n"
             response += "-"*30 + "\n"
         
         response += "\nTo cancel a booking, say: 'Cancel booking [Booking ID]'"
@@ -605,7 +641,7 @@ class MovieBookingChatbot:
         """Process cancel booking request"""
         # Extract booking ID
         id_match = re.search(r'booking\s*#?\s*(\w+)', message)
-        booking_id = id_match.group(1) if id_match else None
+        booking_id = normalize_booking_id(id_match.group(1)) if id_match else None
         
         if booking_id:
             return self.cancel_booking(booking_id)
@@ -627,7 +663,8 @@ class MovieBookingChatbot:
             "date": self.date_var.get(),
             "time": self.time_var.get(),
             "tickets": int(self.tickets_var.get()),
-            "seat_type": self.seat_type_var.get()
+            "seat_type": self.seat_type_var.get(),
+            "status": "confirmed"
         }
         
         # Calculate price
@@ -639,12 +676,30 @@ class MovieBookingChatbot:
         booking_data["total_price"] = round(total_price, 2)
         
         # Generate booking ID
-        booking_data["booking_id"] = f"BK{random.randint(10000, 99999)}"
+        booking_data["booking_id"] = new_booking_id(os.path.dirname(self.bookings_file) or ".")
         booking_data["booking_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         booking_data["username"] = self.current_user or "guest"
         
-        # Save booking
-        self.save_booking(booking_data)
+        # Take seats for the show
+        hold = self.inventory.hold(booking_show(booking_data), booking_data["tickets"])
+        if hold is None:
+            left = self.inventory.available(booking_show(booking_data))
+            messagebox.showerror("Sold Out", f"Only {left} seat(s) are left for this show.")
+            return
+        booking_data["seats"] = hold.seats
+        
+        # Save booking, unless another process sold these seats meanwhile
+        try:
+            saved = self.save_booking(booking_data)
+        except Exception:
+            self.inventory.release(hold.hold_id)
+            raise
+        if not saved:
+            self.inventory.release(hold.hold_id)
+            self.inventory.refresh(booking_show(booking_data))
+            messagebox.showerror("Seats Taken", "Those seats were just booked by someone else. Please try again.")
+            return
+        self.inventory.commit(hold.hold_id, booking_data)
         
         # Show confirmation
         confirmation = f"✅ **Booking Confirmed!**\n\n"
@@ -653,6 +708,7 @@ class MovieBookingChatbot:
         confirmation += f"**Theater:** {booking_data['theater']}\n"
         confirmation += f"**Date & Time:** {booking_data['date']} at {booking_data['time']}\n"
         confirmation += f"**Tickets:** {booking_data['tickets']} ({booking_data['seat_type']})\n"
+        confirmation += f"**Seats:** {', '.join(booking_data['seats'])}\n"
         confirmation += f"**Total Price:** ${booking_data['total_price']}\n\n"
         confirmation += "Enjoy your movie! 🎬🍿"
         
@@ -664,14 +720,8 @@ class MovieBookingChatbot:
         self.seat_type_var.set("Standard")
     
     def save_booking(self, booking_data):
-        """Save booking to JSON file"""
-        with open(self.bookings_file, 'r') as f:
-            data = json.load(f)
-        
-        data["bookings"].append(booking_data)
-        
-        with open(self.bookings_file, 'w') as f:
-            json.dump(data, f, indent=4)
+        """Save booking to storage, return False if its seats were sold meanwhile"""
+        return self.storage.add_booking(booking_data, check=self.inventory.fits)
     
     def view_bookings(self):
         """View bookings in a new window"""
@@ -694,13 +744,17 @@ class MovieBookingChatbot:
         bookings_frame = tk.Frame(view_window, bg="#0f3460")
         bookings_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
         
-        # Load bookings
-        with open(self.bookings_file, 'r') as f:
-            data = json.load(f)
-        
-        user_bookings = [b for b in data["bookings"] if b.get("username") == (self.current_user or "guest")]
+        # Bookings are fetched a page at a time and only visible rows get widgets
+        username = self.current_user or "guest"
+        listing = BookingListView(
+            bookings_frame,
+            fetch_page=lambda before: self.storage.recent_bookings_for_user(
+                username, BookingListView.PAGE_SIZE, before),
+            describe=self.describe_booking,
+            on_cancel=lambda booking_id: self.cancel_booking_gui(booking_id, listing),
+        )
         
-        if not user_bookings:
+        if not listing.bookings:
             no_bookings = tk.Label(
                 bookings_frame,
                 text="You don't have any bookings yet.\n\nUse the booking panel to book your first movie!",
@@ -712,87 +766,42 @@ class MovieBookingChatbot:
             no_bookings.pack(expand=True)
             return
         
-        # Create scrollable frame
-        canvas = tk.Canvas(bookings_frame, bg="#0f3460", highlightthickness=0)
-        scrollbar = tk.Scrollbar(bookings_frame, orient=tk.VERTICAL, command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg="#0f3460")
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        # Display each booking
-        for i, booking in enumerate(user_bookings):
-            booking_frame = tk.Frame(
-                scrollable_frame,
-                bg="#1a1a2e",
-                relief=tk.RAISED,
-                borderwidth=2
-            )
-            booking_frame.pack(fill=tk.X, pady=10, padx=10)
-            
-            # Booking info
-            info_text = f"🎬 {booking['movie']}\n"
-            info_text += f"🏢 {booking['theater']}\n"
-            info_text += f"📅 {booking['date']} at {booking['time']}\n"
-            info_text += f"🎫 {booking['tickets']} ticket(s) ({booking['seat_type']})\n"
-            info_text += f"💰 ${booking['total_price']}\n"
-            info_text += f"🆔 Booking ID: {booking['booking_id']}"
-            
-            info_label = tk.Label(
-                booking_frame,
-                text=info_text,
-                font=("Arial", 11),
-                bg="#1a1a2e",
-                fg="#ffffff",
-                justify=tk.LEFT
-            )
-            info_label.pack(side=tk.LEFT, padx=10, pady=10)
-            
-            # Cancel button
-            cancel_btn = tk.Button(
-                booking_frame,
-                text="Cancel",
-                command=lambda b_id=booking['booking_id']: self.cancel_booking_gui(b_id, view_window),
-                bg="#e94560",
-                fg="#ffffff",
-                font=("Arial", 10, "bold"),
-                relief=tk.FLAT,
-                cursor="hand2"
-            )
-            cancel_btn.pack(side=tk.RIGHT, padx=10, pady=10)
-        
-        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        listing.pack()
+    
+    def describe_booking(self, booking):
+        """Text of one row in the bookings window"""
+        info_text = f"🎬 {booking['movie']}\n"
+        info_text += f"🏢 {booking['theater']}\n"
+        info_text += f"📅 {booking['date']} at {booking['time']}\n"
+        info_text += f"🎫 {booking['tickets']} ticket(s) ({booking['seat_type']})\n"
+        info_text += f"💰 ${booking['total_price']}\n"
+        info_text += f"🆔 Booking ID: {booking['booking_id']}"
+        if booking.get("status") == "cancelled":
+            info_text += "\n❌ Cancelled"
+        return info_text
     
-    def cancel_booking_gui(self, booking_id, window):
+    def cancel_booking_gui(self, booking_id, listing):
         """Cancel booking from GUI"""
         if messagebox.askyesno("Confirm Cancellation", 
                                f"Are you sure you want to cancel booking {booking_id}?"):
             result = self.cancel_booking(booking_id)
             messagebox.showinfo("Cancellation", result)
-            window.destroy()
-            self.view_bookings()
+            # Redraw just that row
+            booking = self.storage.get_booking(booking_id)
+            if booking:
+                listing.refresh(booking)
     
     def cancel_booking(self, booking_id):
         """Cancel a booking by ID"""
-        with open(self.bookings_file, 'r') as f:
-            data = json.load(f)
-        
-        # Find and remove booking
-        original_count = len(data["bookings"])
-        data["bookings"] = [b for b in data["bookings"] if b.get("booking_id") != booking_id]
-        
-        if len(data["bookings"]) < original_count:
-            with open(self.bookings_file, 'w') as f:
-                json.dump(data, f, indent=4)
-            return f"✅ Booking {booking_id} has been cancelled successfully. Refund will be processed within 5-7 business days."
-        else:
+        booking = self.storage.get_booking(booking_id)
+        if booking is None:
             return f"❌ Booking {booking_id} not found. Please check the booking ID and try again."
+        # Mark it cancelled in place; the inventory reads the cancellation back and frees the seats
+        if booking.get("status") == "cancelled" or not self.storage.update_booking(
+                booking_id, {"status": "cancelled"}, expect={"status": booking.get("status")}):
+            return f"Booking {booking_id} is already cancelled."
+        self.inventory.refresh(booking_show(booking))
+        return f"✅ Booking {booking_id} has been cancelled successfully. Refund will be processed within 5-7 business days."
     
     def run(self):
         """Run the application"""
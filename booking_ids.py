@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: the data files are single-process there anyway
+    fcntl = None
+
+# Crockford base32: no I, L, O or U, and ASCII order matches numeric order
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {c: i for i, c in enumerate(ALPHABET)}
+_DECODE.update({"O": 0, "I": 1, "L": 1})
+
+PREFIX = "BK"
+EPOCH = 1704067200  # 2024-01-01 UTC
+TIME_BITS = 32      # seconds since EPOCH, good until 2160
+NODE_BITS = 8
+SEQUENCE_BITS = 10
+LENGTH = (TIME_BITS + NODE_BITS + SEQUENCE_BITS) // 5  # characters after the prefix
+LEASE_FILE = "booking_nodes.lock"
+
+
+def _encode(value):
+    chars = []
+    for _ in range(LENGTH):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def _decode(text):
+    value = 0
+    for char in text:
+        value = value << 5 | _DECODE[char]
+    return value
+
+
+_leases = {}  # (pid, directory) -> (node, open lease file)
+_leases_lock = threading.Lock()
+
+
+def lease_node(directory="."):
+    """Return a node no other live process issuing ids for directory holds
+
+    Node n is a lock on byte n of LEASE_FILE in directory, taken without
+    waiting and held until the process exits, when the OS drops it, so a
+    crashed process frees its node. The lease is per process (fcntl locks
+    are), and a forked child takes its own. Without fcntl the node comes
+    from the process id, which is only safe for a single process.
+    """
+    if fcntl is None:
+        return os.getpid() % (1 << NODE_BITS)
+    key = (os.getpid(), os.path.abspath(directory))
+    with _leases_lock:
+        lease = _leases.get(key)
+        if lease is None:
+            lease_file = open(os.path.join(directory, LEASE_FILE), 'a+b')
+            for node in range(1 << NODE_BITS):
+                try:
+                    fcntl.lockf(lease_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB, 1, node, os.SEEK_SET)
+                except OSError:
+                    continue
+                lease = _leases[key] = (node, lease_file)
+                break
+            else:
+                lease_file.close()
+                raise RuntimeError(f"all {1 << NODE_BITS} booking id nodes in {directory} are taken")
+    return lease[0]
+
+
+class BookingIds:
+    """Generator of unique booking ids that sort by creation time
+
+    An id is "BK" plus ten Crockford base32 characters holding
+    seconds since 2024 | node | sequence, e.g. BK0W3NQ7K5F2. Ids from one
+    generator strictly increase; a node issuing more than 1024 ids in a second
+    borrows from the next second rather than repeating or blocking. Every
+    process writing the same bookings needs its own node (0-255): the
+    BOOKING_NODE environment variable if set, else one leased in directory,
+    the bookings' directory (see lease_node). Use one generator per
+    directory in a process, as new_booking_id() does, since they share the
+    node.
+    """
+
+    def __init__(self, node=None, clock=time.time, directory="."):
+        if node is None:
+            node = os.environ.get("BOOKING_NODE")
+            node = int(node) if node is not None else lease_node(directory)
+        self.node = node % (1 << NODE_BITS)
+        self.clock = clock
+        self._last = 0  # last (seconds, sequence) issued, packed
+        self._lock = threading.Lock()
+
+    def new_id(self):
+        """Return a new booking id"""
+        now = (int(self.clock()) - EPOCH) << SEQUENCE_BITS
+        # Two integer updates; this is the only shared state in the process
+        with self._lock:
+            self._last = stamp = max(now, self._last + 1)
+        seconds, sequence = stamp >> SEQUENCE_BITS, stamp & ((1 << SEQUENCE_BITS) - 1)
+        return PREFIX + _encode((seconds << NODE_BITS | self.node) << SEQUENCE_BITS | sequence)
+
+
+def is_sortable(booking_id):
+    """True if booking_id came from BookingIds (older ids are BK + five digits)"""
+    return (len(booking_id) == len(PREFIX) + LENGTH and booking_id.startswith(PREFIX)
+            and all(c in ALPHABET for c in booking_id[len(PREFIX):]))
+
+
+def normalize_booking_id(text):
+    """Return a booking id as typed or read aloud in its canonical form
+
+    Case and spaces don't matter, and the look-alikes O, I and L are read as 0,
+    1 and 1, as Crockford base32 intends.
+    """
+    text = "".join(text.split()).upper()
+    if text.startswith(PREFIX):
+        body = text[len(PREFIX):]
+        if len(body) == LENGTH and all(c in _DECODE for c in body):
+            return PREFIX + "".join(ALPHABET[_DECODE[c]] for c in body)
+    return text
+
+
+def id_time(booking_id):
+    """Return the UTC datetime a sortable booking id was issued"""
+    value = _decode(booking_id[len(PREFIX):])
+    seconds = value >> (NODE_BITS + SEQUENCE_BITS)
+    return datetime.fromtimestamp(EPOCH + seconds, timezone.utc)
+
+
+def id_range(start, end):
+    """Return (low, high) so that low <= booking_id < high selects ids issued in [start, end)
+
+    start and end are datetimes (naive ones are taken as local time) or Unix
+    timestamps. Legacy ids never fall inside a range.
+    """
+    def bound(moment):
+        if isinstance(moment, datetime):
+            moment = moment.timestamp()
+        seconds = min(max(int(moment) - EPOCH, 0), (1 << TIME_BITS) - 1)
+        return PREFIX + _encode(seconds << (NODE_BITS + SEQUENCE_BITS))
+    return bound(start), bound(end)
+
+
+_generators = {}
+_generators_lock = threading.Lock()
+
+
+def new_booking_id(directory="."):
+    """Return a new booking id from this process's generator for the bookings in directory"""
+    key = (os.getpid(), os.path.abspath(directory))
+    generator = _generators.get(key)
+    if generator is None:
+        with _generators_lock:
+            generator = _generators.get(key)
+            if generator is None:
+                generator = _generators[key] = BookingIds(directory=directory)
+    return generator.new_id()
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    # The old scheme: BK + five random digits
+    import random
+    seen, draws = set(), 0
+    while True:
+        draws += 1
+        booking_id = random.randint(10000, 99999)
+        if booking_id in seen:
+            break
+        seen.add(booking_id)
+    print(f"BK + randint(10000, 99999): first collision after {draws} bookings")
+
+    generator = BookingIds(node=7)
+    count, threads = 400_000, 8
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        batches = list(pool.map(lambda _: [generator.new_id() for _ in range(count // threads)],
+                                range(threads)))
+    elapsed = time.perf_counter() - started
+    ids = [booking_id for batch in batches for booking_id in batch]
+    assert len(set(ids)) == len(ids), "duplicate id"
+    for batch in batches:
+        assert batch == sorted(batch), "ids not increasing"
+    print(f"{len(ids):,} ids from {threads} threads in {elapsed:.2f} s "
+          f"({len(ids) / elapsed:,.0f}/s), all unique, e.g. {ids[0]} {ids[-1]}")
+
+    low, high = id_range(time.time() - 60, time.time() + 3600)
+    assert low <= generator.new_id() < high
+    spoken = "bk" + ids[0][2:].lower().replace("0", "o")
+    print(f"{ids[0]} was issued {id_time(ids[0]):%Y-%m-%d %H:%M:%S} UTC; "
+          f"typed as {spoken!r} it reads back as {normalize_booking_id(spoken)}")
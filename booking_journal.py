@@ -0,0 +1,541 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+import traceback
+from collections import deque
+
+from file_locks import FileLock, atomic_write_json, file_mode, fsync_dir
+from seating import booking_show as _show
+
+
+class BookingJournal:
+    """Bookings held in memory and persisted as a snapshot plus an append-only journal
+
+    Every change is appended as one JSON line to the journal file. A background
+    thread fsyncs the journal in batches (group commit), so many writers share a
+    single fsync. Once the journal grows past compact_threshold records, and
+    past compact_ratio times the rows in the snapshot, it is folded into the
+    snapshot (the regular bookings.json format) with an atomic rename, and the
+    journal restarts empty. Compaction rewrites the whole snapshot under the
+    locks, so scaling with the snapshot keeps its cost per record written flat.
+
+    Several processes can share the files. Appends and compaction hold an
+    exclusive file lock (see file_locks.py) and first replay whatever the other
+    processes appended, and every read picks up new records the same way, so
+    no process loses or overwrites another's bookings.
+
+    If an fsync fails the commit thread prints the error and tries again
+    every retry_interval seconds; writers waiting on that fsync get an
+    OSError rather than waiting forever.
+
+    The last change_log_size changed bookings, by any process, are kept in
+    order for changes_since(), so a cache can follow the bookings without
+    rereading them.
+    """
+
+    retry_interval = 1.0
+
+    def __init__(self, bookings_file="bookings.json", journal_file=None,
+                 commit_interval=0.005, compact_threshold=10000, compact_ratio=0.5,
+                 change_log_size=10000):
+        self.bookings_file = bookings_file
+        self.journal_file = journal_file or os.path.splitext(bookings_file)[0] + ".journal"
+        self.commit_interval = commit_interval
+        self.compact_threshold = compact_threshold
+        self.compact_ratio = compact_ratio
+        self.change_log_size = change_log_size
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._sync_lock = threading.Lock()  # serializes fsync, compaction and close
+        self._file_lock = FileLock(self.journal_file)
+        self._rows = []       # booking dicts, None once deleted
+        self._index = {}      # booking_id -> [row positions]
+        self._by_user = {}    # username -> [row positions], ascending
+        self._by_show = {}    # show (see seating.booking_show) -> [row positions], ascending
+        self._changes = deque()  # (seq, booking as changed), oldest first
+        self._changes_from = 0   # the change log holds every change after this seq
+        self._seq = 0         # last sequence number applied, by any process
+        self._durable_seq = 0 # last sequence number fsynced
+        self._sync_error = None  # why the last fsync failed
+        self._sync_failures = 0
+        self._snapshot_seq = 0
+        self._snapshot_rows = 0
+        self._journal_records = 0
+        self._journal = None
+        self._journal_id = None  # (device, inode) of the journal being read
+        self._offset = 0         # bytes of the journal applied so far
+        self._closed = False
+
+        with self._lock, self._file_lock.exclusive():
+            self._load()
+            self._durable_seq = self._seq
+
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # Loading
+
+    def _load(self):
+        """Load the snapshot and replay the journal on top of it"""
+        try:
+            with open(self.bookings_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {"bookings": []}
+
+        self._rows, self._index, self._by_user, self._by_show = [], {}, {}, {}
+        for booking in data.get("bookings", []):
+            self._insert(booking)
+        self._snapshot_seq = self._seq = data.get("journal_seq", 0)
+        self._snapshot_rows = len(self._rows)
+        self._durable_seq = max(self._durable_seq, self._snapshot_seq)
+        self._journal_records = 0
+        self._changes.clear()
+        self._changes_from = self._seq
+
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_file, 'ab')
+        self._journal_id = None
+        self._offset = 0
+        self._replay()
+
+    def _changed(self):
+        """True if the journal has records (or a new inode) not applied yet"""
+        try:
+            st = os.stat(self.journal_file)
+        except FileNotFoundError:
+            return False
+        return (st.st_dev, st.st_ino) != self._journal_id or st.st_size != self._offset
+
+    def _replay(self):
+        """Apply journal records appended since the last replay, by any process
+
+        Caller holds self._lock and the file lock. A journal replaced by another
+        process's compaction means starting again from its snapshot.
+        """
+        with open(self.journal_file, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if self._journal_id is not None and (st.st_dev, st.st_ino) != self._journal_id:
+                self._load()
+                return
+            self._journal_id = (st.st_dev, st.st_ino)
+            f.seek(self._offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # torn write, cut off by the next append
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    break
+                self._offset += len(raw)
+                if record["seq"] <= self._seq:
+                    continue
+                self._apply(record)
+                self._seq = record["seq"]
+                self._journal_records += 1
+
+    def _refresh(self):
+        """Pick up other processes' changes before a read; caller holds self._lock"""
+        if self._changed():
+            with self._file_lock.shared():
+                self._replay()
+
+    def _insert(self, booking):
+        """Add a booking row and index it"""
+        pos = len(self._rows)
+        self._index.setdefault(booking.get("booking_id"), []).append(pos)
+        self._by_user.setdefault(booking.get("username"), []).append(pos)
+        self._by_show.setdefault(_show(booking), []).append(pos)
+        self._rows.append(booking)
+
+    def _apply(self, record):
+        """Apply one journal record to the in-memory state"""
+        op = record["op"]
+        if op == "add":
+            self._insert(record["booking"])
+            self._log_change(record["seq"], record["booking"])
+        elif op == "update":
+            for pos in self._index.get(record["booking_id"], []):
+                old = self._rows[pos]
+                if old is not None:
+                    # Replace rather than mutate so snapshots can share row dicts
+                    self._rows[pos] = dict(old, **record["fields"])
+                    if self._rows[pos].get("username") != old.get("username"):
+                        self._by_user[old.get("username")].remove(pos)
+                        bisect.insort(self._by_user.setdefault(self._rows[pos].get("username"), []), pos)
+                    if _show(self._rows[pos]) != _show(old):
+                        self._by_show[_show(old)].remove(pos)
+                        bisect.insort(self._by_show.setdefault(_show(self._rows[pos]), []), pos)
+                    self._log_change(record["seq"], self._rows[pos])
+        elif op == "delete":
+            for pos in self._index.pop(record["booking_id"], []):
+                self._rows[pos] = None
+            self._log_change(record["seq"], {"booking_id": record["booking_id"], "status": "deleted"})
+
+    def _log_change(self, seq, booking):
+        self._changes.append((seq, booking))
+        if len(self._changes) > self.change_log_size:
+            self._changes_from = self._changes.popleft()[0]
+
+    # Writing
+
+    def _append(self, record, sync, must_exist=None, expect=None, check=None):
+        """Write a record to the journal and apply it, optionally waiting for fsync
+
+        With must_exist, nothing is written (and False returned) unless that
+        booking id is still live once every other process's records are in,
+        and, with expect, its fields still have the expected values. Likewise
+        nothing is written if check() returns false once those records are in.
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("booking journal is closed")
+            with self._file_lock.exclusive():
+                if self._changed():
+                    self._replay()
+                if must_exist is not None:
+                    positions = self._index.get(must_exist)
+                    if not positions:
+                        return False
+                    if expect and any(self._rows[positions[0]].get(k) != v for k, v in expect.items()):
+                        return False
+                if check is not None and not check():
+                    return False
+                fd = self._journal.fileno()
+                if os.fstat(fd).st_size > self._offset:
+                    # A writer crashed mid-line; drop the fragment before appending
+                    os.ftruncate(fd, self._offset)
+                self._seq += 1
+                record["seq"] = self._seq
+                line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+                self._journal.write(line)
+                self._journal.flush()  # visible to other processes before unlocking
+                self._offset += len(line)
+                self._apply(record)
+                self._journal_records += 1
+            seq = self._seq
+            self._cond.notify_all()
+
+            if sync:
+                failures = self._sync_failures
+                while self._durable_seq < seq:
+                    if self._sync_failures != failures:
+                        error = self._sync_error
+                        raise OSError(f"booking journal could not be synced: {error}") from error
+                    self._cond.wait()
+        return True
+
+    def add(self, booking, sync=True, check=None):
+        """Append a new booking, return False if check refused it
+
+        check(booking, others) is called under the exclusive lock, others
+        being every live booking for the same show, by any process, and the
+        booking is only added if it returns true.
+        """
+        return self._append({"op": "add", "booking": booking}, sync,
+                            check=check and (lambda: check(booking, self._for_show(_show(booking)))))
+
+    def update(self, booking_id, fields, sync=True, expect=None):
+        """Update fields of a booking in place, return False if it doesn't exist
+
+        With expect (a dict of field values), the update is only made, atomically,
+        if the booking still has those values; e.g. expect={"status": "confirmed"}
+        lets exactly one of two racing cancellations win.
+        """
+        return self._append({"op": "update", "booking_id": booking_id, "fields": fields},
+                            sync, must_exist=booking_id, expect=expect)
+
+    def delete(self, booking_id, sync=True):
+        """Remove a booking, return False if it doesn't exist"""
+        return self._append({"op": "delete", "booking_id": booking_id}, sync, must_exist=booking_id)
+
+    # Reading
+
+    def get(self, booking_id):
+        """Return the first booking with this id, or None"""
+        with self._lock:
+            self._refresh()
+            for pos in self._index.get(booking_id, []):
+                if self._rows[pos] is not None:
+                    return self._rows[pos]
+        return None
+
+    def all(self):
+        """Return all live bookings in booking order"""
+        with self._lock:
+            self._refresh()
+            return [b for b in self._rows if b is not None]
+
+    def scan(self, batch=1000):
+        """Yield live bookings in booking order, taking the lock batch rows at a time
+
+        Compaction swaps in a new row list, so a scan keeps reading the one it
+        started on and sees neither gaps nor repeats.
+        """
+        with self._lock:
+            self._refresh()
+            rows = self._rows
+        pos = 0
+        while True:
+            with self._lock:
+                chunk = rows[pos:pos + batch]
+            if not chunk:
+                return
+            pos += len(chunk)
+            for booking in chunk:
+                if booking is not None:
+                    yield booking
+
+    def _for_show(self, key):
+        rows = self._rows
+        return [rows[pos] for pos in self._by_show.get(key, ()) if rows[pos] is not None]
+
+    def for_show(self, show):
+        """Return the bookings for a show (see seating.booking_show), in booking order"""
+        with self._lock:
+            self._refresh()
+            return self._for_show(show)
+
+    def changes_since(self, seq):
+        """Return (bookings changed after seq, oldest first, the seq to ask from next)
+
+        A deleted booking comes back as {"booking_id": ..., "status": "deleted"}.
+        The bookings are None when seq is None or older than the change log
+        reaches, and the caller must reread what it needs.
+        """
+        with self._lock:
+            self._refresh()
+            if seq is None or seq < self._changes_from:
+                return None, self._seq
+            changed = []
+            for change_seq, booking in reversed(self._changes):
+                if change_seq <= seq:
+                    break
+                changed.append(booking)
+            changed.reverse()
+            return changed, self._seq
+
+    def for_user(self, username):
+        """Return a user's bookings in booking order"""
+        with self._lock:
+            self._refresh()
+            rows = self._rows
+            return [rows[pos] for pos in self._by_user.get(username, ()) if rows[pos] is not None]
+
+    def recent_for_user(self, username, limit, before=None):
+        """Return (up to limit of a user's bookings, newest first, cursor for the next page)
+
+        Pass the cursor back as before to continue; it is None on the last
+        page. Cost is the page size, however many bookings there are.
+        """
+        with self._lock:
+            self._refresh()
+            positions = self._by_user.get(username, [])
+            end = len(positions)
+            if before is not None:
+                anchor = next((pos for pos in self._index.get(before, ()) if self._rows[pos] is not None), None)
+                end = bisect.bisect_left(positions, anchor) if anchor is not None else 0
+            page = []
+            while end and len(page) <= limit:
+                end -= 1
+                booking = self._rows[positions[end]]
+                if booking is not None:
+                    page.append(booking)
+        if len(page) > limit:
+            page.pop()
+            return page, page[-1].get("booking_id")
+        return page, None
+
+    def between(self, low, high):
+        """Return live bookings with low <= booking_id < high, in id order"""
+        with self._lock:
+            self._refresh()
+            found = [b for b in self._rows
+                     if b is not None and low <= (b.get("booking_id") or "") < high]
+        return sorted(found, key=lambda b: b["booking_id"])
+
+    # Group commit and compaction
+
+    def _flush_loop(self):
+        """Fsync pending journal writes in batches"""
+        while True:
+            with self._lock:
+                while self._durable_seq == self._seq and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+
+            # Let concurrent writers pile onto the same fsync
+            time.sleep(self.commit_interval)
+            try:
+                self._sync()
+            except Exception as e:
+                traceback.print_exc()
+                with self._lock:
+                    self._sync_error = e
+                    self._sync_failures += 1
+                    self._cond.notify_all()
+                time.sleep(self.retry_interval)
+                continue
+
+            threshold = self._compact_due()
+            if self._journal_records >= threshold:
+                try:
+                    self.compact(threshold)
+                except Exception:
+                    # The journal is synced, so nothing is lost; try again after the next write
+                    traceback.print_exc()
+
+    def _compact_due(self):
+        """Journal records at which to compact, see the class docstring"""
+        return max(self.compact_threshold, int(self._snapshot_rows * self.compact_ratio))
+
+    def _sync(self):
+        """Fsync everything written so far"""
+        with self._sync_lock:
+            with self._lock:
+                if self._closed:
+                    return
+                target = self._seq
+                # A reload may swap the journal file out from under the fsync
+                fd = os.dup(self._journal.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            with self._lock:
+                if target > self._durable_seq:
+                    self._durable_seq = target
+                self._cond.notify_all()
+
+    def compact(self, min_records=0):
+        """Fold the journal into a new snapshot
+
+        Skipped if, once other processes' records are in, the journal holds
+        fewer than min_records (another process may just have compacted).
+        """
+        with self._sync_lock, self._lock:
+            if self._closed:
+                return
+            with self._file_lock.exclusive():
+                if self._changed():
+                    self._replay()
+                if self._journal_records >= min_records:
+                    self._compact()
+
+    def _compact(self):
+        """Write the snapshot and restart the journal; caller holds every lock"""
+        rows = [b for b in self._rows if b is not None]
+        atomic_write_json(self.bookings_file, {"bookings": rows, "journal_seq": self._seq})
+
+        # Everything is in the snapshot, so the journal restarts empty
+        temp_file = self.journal_file + ".tmp"
+        with open(temp_file, 'wb') as f:
+            os.fsync(f.fileno())
+        os.chmod(temp_file, file_mode(self.journal_file))
+        self._journal.close()
+        os.replace(temp_file, self.journal_file)
+        fsync_dir(self.journal_file)
+        self._journal = open(self.journal_file, 'ab')
+        st = os.fstat(self._journal.fileno())
+        self._journal_id = (st.st_dev, st.st_ino)
+        self._offset = 0
+        self._snapshot_seq = self._seq
+        self._snapshot_rows = len(rows)
+        self._journal_records = 0
+        self._durable_seq = self._seq
+        self._cond.notify_all()
+        self._rows, self._index, self._by_user, self._by_show = [], {}, {}, {}
+        for booking in rows:
+            self._insert(booking)
+
+    def close(self):
+        """Flush outstanding writes and stop the commit thread"""
+        self._sync()
+        with self._sync_lock, self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            self._journal.close()
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(bookings_file="bookings.json"):
+    """Return the shared journal for a bookings file"""
+    key = os.path.abspath(bookings_file)
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None:
+            journal = BookingJournal(bookings_file)
+            _journals[key] = journal
+    return journal
+
+
+if __name__ == "__main__":
+    import random
+    import shutil
+    import tempfile
+
+    # "View my bookings" against a large history: 2000 users, one of them a regular
+    directory = tempfile.mkdtemp()
+    try:
+        rng = random.Random(5)
+        bookings_file = os.path.join(directory, "bookings.json")
+        for total in (10_000, 100_000, 1_000_000):
+            rows = [{"booking_id": f"B{i:07d}", "username": f"user{rng.randrange(2000)}", "tickets": 2}
+                    for i in range(total)]
+            atomic_write_json(bookings_file, {"bookings": rows})
+            journal = BookingJournal(bookings_file)
+            repeats = 200
+
+            started = time.perf_counter()
+            for _ in range(repeats // 20):
+                scanned = [b for b in journal.all() if b.get("username") == "user7"][-5:]
+            scan = (time.perf_counter() - started) / (repeats // 20)
+            started = time.perf_counter()
+            for _ in range(repeats):
+                page, cursor = journal.recent_for_user("user7", 5)
+            indexed = (time.perf_counter() - started) / repeats
+            assert list(reversed(page)) == scanned
+            print(f"{total:>9,} bookings: last 5 for a user by scanning {scan * 1e3:7.2f} ms, "
+                  f"by index {indexed * 1e6:5.1f} us")
+
+            # Cancelling: one status record appended through the id index
+            victims = iter(rng.sample(range(total), 300))
+            started = time.perf_counter()
+            for _ in range(200):
+                journal.update(f"B{next(victims):07d}", {"status": "cancelled"},
+                               sync=False, expect={"status": None})
+            unsynced = (time.perf_counter() - started) / 200
+            started = time.perf_counter()
+            for _ in range(20):
+                journal.update(f"B{next(victims):07d}", {"status": "cancelled"},
+                               expect={"status": None})
+            synced = (time.perf_counter() - started) / 20
+
+            # The old way: load the whole file, filter it, write it all back
+            victim = f"B{next(victims):07d}"
+            started = time.perf_counter()
+            with open(bookings_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            data["bookings"] = [b for b in data["bookings"] if b["booking_id"] != victim]
+            with open(bookings_file + ".old", 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4)
+            rewrite = time.perf_counter() - started
+            print(f"{'':>19} cancel by rewriting the file {rewrite * 1e3:9.1f} ms, by index "
+                  f"{unsynced * 1e6:5.1f} us (waiting for the fsync: {synced * 1e3:.1f} ms)")
+            journal.close()
+            os.remove(journal.journal_file)
+            os.remove(bookings_file + ".old")
+    finally:
+        shutil.rmtree(directory)
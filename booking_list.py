@@ -0,0 +1,134 @@
+import tkinter as tk
+
+
+class _Row:
+    """One pooled row of widgets and the booking index it is showing"""
+
+    __slots__ = ("item", "frame", "label", "button", "index")
+
+    def __init__(self, item, frame, label, button):
+        self.item = item
+        self.frame = frame
+        self.label = label
+        self.button = button
+        self.index = None
+
+
+class BookingListView:
+    """Scrolling list of bookings that only has widgets for the rows on screen
+
+    fetch_page(before) returns (bookings newest first, cursor or None) as
+    storage.recent_bookings_for_user does; pages are fetched as the list is
+    scrolled towards its end. A fixed pool of row widgets, just enough to fill
+    the viewport, is moved and relabelled on every scroll, so a history of
+    thousands of bookings opens and scrolls as fast as a dozen. refresh()
+    redraws the one row showing a changed booking.
+    """
+
+    ROW_HEIGHT = 150
+    PAGE_SIZE = 50
+
+    def __init__(self, parent, fetch_page, describe, on_cancel, bg="#0f3460"):
+        self.fetch_page = fetch_page
+        self.describe = describe
+        self.on_cancel = on_cancel
+        self.bookings = []
+        self._positions = {}  # booking_id -> index in self.bookings
+        self._cursor = None
+        self._exhausted = False
+        self._rows = []
+
+        self.canvas = tk.Canvas(parent, bg=bg, highlightthickness=0,
+                                yscrollincrement=self.ROW_HEIGHT // 5)
+        self.scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.bind("<Configure>", lambda e: self._layout())
+        self._bind_wheel(self.canvas)
+
+        self._load_more()
+
+    def pack(self):
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    def yview(self, *args):
+        """Scrollbar command: scroll, then re-lay the visible rows"""
+        self.canvas.yview(*args)
+        self._layout()
+
+    def refresh(self, booking):
+        """Show the new state of a booking, e.g. after it was cancelled"""
+        index = self._positions.get(booking.get("booking_id"))
+        if index is None:
+            return
+        self.bookings[index] = booking
+        for row in self._rows:
+            if row.index == index:
+                self._fill(row, index)
+
+    # Internals
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda e: self.yview("scroll", -1 if e.delta > 0 else 1, "units"))
+        widget.bind("<Button-4>", lambda e: self.yview("scroll", -1, "units"))
+        widget.bind("<Button-5>", lambda e: self.yview("scroll", 1, "units"))
+
+    def _load_more(self):
+        """Fetch the next page of older bookings"""
+        if self._exhausted:
+            return
+        page, self._cursor = self.fetch_page(self._cursor)
+        for booking in page:
+            self._positions[booking.get("booking_id")] = len(self.bookings)
+            self.bookings.append(booking)
+        self._exhausted = self._cursor is None
+        self.canvas.configure(scrollregion=(0, 0, 0, len(self.bookings) * self.ROW_HEIGHT))
+
+    def _make_row(self):
+        frame = tk.Frame(self.canvas, bg="#1a1a2e", relief=tk.RAISED, borderwidth=2,
+                         height=self.ROW_HEIGHT - 20)
+        frame.pack_propagate(False)
+        label = tk.Label(frame, font=("Arial", 11), bg="#1a1a2e", fg="#ffffff", justify=tk.LEFT)
+        label.pack(side=tk.LEFT, padx=10, pady=10)
+        button = tk.Button(frame, text="Cancel", bg="#e94560", fg="#ffffff",
+                           font=("Arial", 10, "bold"), relief=tk.FLAT, cursor="hand2")
+        for widget in (frame, label, button):
+            self._bind_wheel(widget)
+        item = self.canvas.create_window(10, -self.ROW_HEIGHT, window=frame, anchor="nw")
+        return _Row(item, frame, label, button)
+
+    def _fill(self, row, index):
+        booking = self.bookings[index]
+        row.label.config(text=self.describe(booking))
+        if booking.get("status") == "cancelled":
+            row.button.pack_forget()
+        else:
+            row.button.config(command=lambda b_id=booking.get("booking_id"): self.on_cancel(b_id))
+            row.button.pack(side=tk.RIGHT, padx=10, pady=10)
+        row.index = index
+
+    def _layout(self):
+        """Place pooled rows over the visible part of the list"""
+        height = self.canvas.winfo_height()
+        visible = height // self.ROW_HEIGHT + 2
+        first = max(int(self.canvas.canvasy(0)) // self.ROW_HEIGHT, 0)
+        if first + 2 * visible >= len(self.bookings):
+            # Fetch ahead so the next screenful is ready before it is reached
+            self._load_more()
+
+        while len(self._rows) < visible:
+            self._rows.append(self._make_row())
+
+        width = max(self.canvas.winfo_width() - 20, 1)
+        for slot, row in enumerate(self._rows):
+            # Each row keeps its slot modulo the pool size, so a scroll by one row
+            # only moves and relabels the row that wrapped around
+            index = first + (slot - first) % len(self._rows)
+            if index < len(self.bookings):
+                self.canvas.coords(row.item, 10, index * self.ROW_HEIGHT + 10)
+                self.canvas.itemconfigure(row.item, width=width)
+                if row.index != index:
+                    self._fill(row, index)
+            elif row.index is not None:
+                self.canvas.coords(row.item, 10, -self.ROW_HEIGHT)
+                row.index = None
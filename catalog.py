@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+from fuzzy_matcher import FuzzyMatcher
+from recommender import Recommender
+from schedule import build_schedule
+from title_matcher import TitleMatcher
+
+# Everything built from one version of movies.json. Readers take the tuple
+# once, so a lookup never mixes a matcher from one reload with the tables of
+# another; a reload swaps in a new tuple and never touches the old one.
+Indexes = namedtuple("Indexes", [
+    "data", "movies", "theaters", "showtimes",
+    "movies_by_id", "movies_by_title", "theaters_by_id", "theaters_by_name",
+    "movie_matcher", "theater_matcher", "movie_fuzzy", "theater_fuzzy",
+])
+
+
+class MovieCatalog:
+    """In-memory view of movies.json that reloads only when the file changes"""
+
+    def __init__(self, movies_file="movies.json", check_interval=1.0):
+        self.movies_file = movies_file
+        self.check_interval = check_interval
+        self.version = 0
+
+        self._lock = threading.Lock()
+        self._signature = None
+        self._last_check = 0.0
+        self._listeners = []
+
+        self._indexes = self._build_indexes({})
+        self._schedule = None  # built on first use, per day
+        self._recommender = None  # built on first use
+
+    def add_listener(self, callback):
+        """Call callback(catalog) after every reload"""
+        self._listeners.append(callback)
+
+    def refresh(self, force=False):
+        """Reload the file if its mtime or size changed, return True on reload"""
+        now = time.monotonic()
+        if not force and self._signature is not None and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+
+        try:
+            stat = os.stat(self.movies_file)
+        except OSError:
+            return False
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return False
+
+        with self._lock:
+            if signature == self._signature:
+                return False
+            try:
+                with open(self.movies_file, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                # Half-written file, keep serving the previous catalog
+                return False
+            self._indexes = self._build_indexes(data)
+            self._schedule = None
+            self._recommender = None
+            self._signature = signature
+            self.version += 1
+
+        for callback in list(self._listeners):
+            callback(self)
+        return True
+
+    @staticmethod
+    def _build_indexes(data):
+        """Return the Indexes for a freshly parsed catalog"""
+        movies = data.get("movies", [])
+        theaters = data.get("theaters", [])
+
+        movies_by_title = {}
+        for movie in movies:
+            title = movie.get("title", "").lower()
+            # Keep the first entry for duplicated titles, like the old linear scans did
+            movies_by_title.setdefault(title, movie)
+
+        theaters_by_name = {}
+        for theater in theaters:
+            theaters_by_name.setdefault(theater.get("name", "").lower(), theater)
+
+        # Fresh matchers every reload: server threads may be reading the old ones
+        movie_titles = {m.get("id"): m.get("title", "") for m in movies}
+        theater_names = {t.get("id"): t.get("name", "") for t in theaters}
+
+        return Indexes(data, movies, theaters, data.get("showtimes", []),
+                       {m.get("id"): m for m in movies}, movies_by_title,
+                       {t.get("id"): t for t in theaters}, theaters_by_name,
+                       TitleMatcher(movie_titles), TitleMatcher(theater_names),
+                       FuzzyMatcher(movie_titles), FuzzyMatcher(theater_names))
+
+    def movies(self):
+        """Return all movies (shared list, do not mutate)"""
+        self.refresh()
+        return self._indexes.movies
+
+    def theaters(self):
+        """Return all theaters (shared list, do not mutate)"""
+        self.refresh()
+        return self._indexes.theaters
+
+    def showtimes(self, day=None, movie_id=None, theater_id=None):
+        """Return the global showtimes list, or a day's scheduled showtimes"""
+        self.refresh()
+        if day is None:
+            return self._indexes.showtimes
+        return self.schedule().showtimes(day, movie_id, theater_id)
+
+    def schedule(self):
+        """Return the Schedule of screenings expanded from the catalog
+
+        Rebuilt when the catalog reloads and when the date changes, since rules
+        without an end date run for a fixed number of days from today.
+        """
+        self.refresh()
+        today = date.today()
+        schedule = self._schedule
+        if schedule is None or schedule.today != today:
+            with self._lock:
+                schedule = self._schedule
+                if schedule is None or schedule.today != today:
+                    schedule = self._schedule = build_schedule(self._indexes.data, today)
+        return schedule
+
+    def recommender(self):
+        """Return the Recommender over the current movies, rebuilt when the catalog reloads"""
+        self.refresh()
+        recommender = self._recommender
+        if recommender is None:
+            with self._lock:
+                recommender = self._recommender
+                if recommender is None:
+                    recommender = self._recommender = Recommender(self._indexes.movies)
+        return recommender
+
+    def get_movie(self, movie_id):
+        """Look up a movie by id"""
+        self.refresh()
+        return self._indexes.movies_by_id.get(movie_id)
+
+    def find_movie(self, title):
+        """Look up a movie by title, case-insensitive"""
+        self.refresh()
+        return self._indexes.movies_by_title.get((title or "").lower())
+
+    def get_theater(self, theater_id):
+        """Look up a theater by id"""
+        self.refresh()
+        return self._indexes.theaters_by_id.get(theater_id)
+
+    def find_theater(self, name):
+        """Look up a theater by name, case-insensitive"""
+        self.refresh()
+        return self._indexes.theaters_by_name.get((name or "").lower())
+
+    def match_movie(self, text, fuzzy=False):
+        """Return the movie whose title is mentioned in text, preferring the longest
+
+        With fuzzy=True a misspelled title is accepted when no exact one is found.
+        """
+        self.refresh()
+        indexes = self._indexes
+        key = indexes.movie_matcher.find(text)
+        if key is None and fuzzy:
+            found = indexes.movie_fuzzy.find(text)
+            key = found[0] if found else None
+        return indexes.movies_by_id.get(key)
+
+    def match_theater(self, text, fuzzy=False):
+        """Return the theater whose name is mentioned in text, preferring the longest
+
+        With fuzzy=True a misspelled name is accepted when no exact one is found.
+        """
+        self.refresh()
+        indexes = self._indexes
+        key = indexes.theater_matcher.find(text)
+        if key is None and fuzzy:
+            found = indexes.theater_fuzzy.find(text)
+            key = found[0] if found else None
+        return indexes.theaters_by_id.get(key)
+
+    def mentions(self, tokens):
+        """Return the movies and theaters named in a tokenized message
+
+        Both are lists of (entry, start, end) token spans, for tokens as split
+        by title_matcher.tokenize.
+        """
+        self.refresh()
+        indexes = self._indexes
+        movies = [(indexes.movies_by_id[key], start, end)
+                  for key, start, end in indexes.movie_matcher.find_all_tokens(tokens)]
+        theaters = [(indexes.theaters_by_id[key], start, end)
+                    for key, start, end in indexes.theater_matcher.find_all_tokens(tokens)]
+        return movies, theaters
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(movies_file="movies.json"):
+    """Return the shared catalog for a movies file"""
+    key = os.path.abspath(movies_file)
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = MovieCatalog(movies_file)
+            _catalogs[key] = catalog
+    return catalog
@@ -0,0 +1,229 @@
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+from file_locks import atomic_write_json
+
+MAX_USER_MOVIES = 200  # a user's most recent distinct movies; pairs grow as the square
+SHRINKAGE = 2  # pulls similarities backed by few shared viewers towards zero
+
+
+def train(bookings, k=20):
+    """Build the item-item neighbor table from an iterable of bookings
+
+    Bookings are read one at a time, so a generator such as
+    storage.iter_bookings() is never held in memory; what is kept is the
+    sparse user x movie matrix, as each user's set of movie numbers.
+    Similarity is the cosine of two movies' viewer sets, shrunk by
+    shared / (shared + SHRINKAGE), and each movie keeps its k nearest.
+    Returns the table as a JSON-ready dict.
+    """
+    numbers = {}  # title -> movie number
+    titles = []
+    users = {}  # username -> {movie number: None}, least recent first
+    count = 0
+    for booking in bookings:
+        title, username = booking.get("movie"), booking.get("username")
+        if not title or username is None or booking.get("status") == "cancelled":
+            continue
+        count += 1
+        number = numbers.get(title)
+        if number is None:
+            number = numbers[title] = len(titles)
+            titles.append(title)
+        watched = users.setdefault(username, {})
+        watched.pop(number, None)
+        watched[number] = None
+        if len(watched) > MAX_USER_MOVIES:
+            del watched[next(iter(watched))]
+
+    width = len(titles)
+    viewers = [0] * width
+    shared = defaultdict(int)  # i * width + j with i < j -> users who booked both
+    for watched in users.values():
+        movies = sorted(watched)
+        for a, i in enumerate(movies):
+            viewers[i] += 1
+            row = i * width
+            for j in movies[a + 1:]:
+                shared[row + j] += 1
+
+    nearest = [[] for _ in titles]  # min-heaps of each movie's k best (similarity, j) so far
+    for pair, both in shared.items():
+        i, j = divmod(pair, width)
+        similarity = both / math.sqrt(viewers[i] * viewers[j]) * both / (both + SHRINKAGE)
+        for movie, other in ((i, j), (j, i)):
+            heap = nearest[movie]
+            if len(heap) < k:
+                heapq.heappush(heap, (similarity, other))
+            elif similarity > heap[0][0]:
+                heapq.heapreplace(heap, (similarity, other))
+    return {
+        "built": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "bookings": count,
+        "users": len(users),
+        "movies": titles,
+        "viewers": viewers,
+        # neighbors[i] is [[j, similarity], ...], most similar first
+        "neighbors": [[[j, round(similarity, 4)] for similarity, j in sorted(heap, reverse=True)]
+                      for heap in nearest],
+    }
+
+
+def write_table(table, table_file="movie_neighbors.json"):
+    """Write a trained table where NeighborTable readers will pick it up"""
+    atomic_write_json(table_file, table, indent=None)
+
+
+class NeighborTable:
+    """Read side of the table train() writes, reloaded when the file changes
+
+    similar() reads one precomputed list per movie it is given, so answering
+    costs the number of movies times the table's k, however many bookings
+    the table was trained on.
+
+    Nothing here retrains the table: it is as fresh as the last run of the
+    offline job (python collaborative.py, see the bottom of this file), so
+    schedule that, e.g. nightly from cron with the server's data directory
+    as the working directory. Readers pick the new file up within
+    check_interval; until the first run the table is empty and loaded()
+    is False.
+    """
+
+    def __init__(self, table_file="movie_neighbors.json", check_interval=5.0):
+        self.table_file = table_file
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._last_check = None
+        self._neighbors = {}  # lowercased title -> [(title, similarity)], most similar first
+
+    def refresh(self, force=False):
+        """Reload the file if its mtime or size changed, return True on reload"""
+        now = time.monotonic()
+        # Checked at most every check_interval, missing file or not
+        if not force and self._last_check is not None and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        try:
+            stat = os.stat(self.table_file)
+        except OSError:
+            return False
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature == self._signature:
+                return False
+            try:
+                with open(self.table_file, 'r', encoding='utf-8') as f:
+                    table = json.load(f)
+            except (OSError, ValueError):
+                return False
+            titles = table.get("movies", [])
+            self._neighbors = {title.lower(): [(titles[j], similarity) for j, similarity in found]
+                               for title, found in zip(titles, table.get("neighbors", []))}
+            self._signature = signature
+        return True
+
+    def loaded(self):
+        """True once a table with any neighbors has been read"""
+        self.refresh()
+        return bool(self._neighbors)
+
+    def similar(self, titles, k=3, exclude=()):
+        """Return up to k (title, score) pairs booked by viewers of titles, best first
+
+        A movie near several of titles scores the sum of its similarities.
+        """
+        self.refresh()
+        neighbors = self._neighbors
+        skip = {title.lower() for title in exclude}
+        scores = defaultdict(float)
+        for title in titles:
+            for other, similarity in neighbors.get((title or "").lower(), ()):
+                if other.lower() not in skip:
+                    scores[other] += similarity
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_neighbor_table(table_file="movie_neighbors.json"):
+    """Return the shared NeighborTable for a table file"""
+    key = os.path.abspath(table_file)
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is None:
+            table = _tables[key] = NeighborTable(table_file)
+    return table
+
+
+def synthetic_bookings(count, users=50_000, movies=2_000, seed=0):
+    """Yield count bookings from users with genre-like tastes, for benchmarks"""
+    import random
+
+    rng = random.Random(seed)
+    tastes = [rng.sample(range(movies), 40) for _ in range(30)]
+    for n in range(count):
+        user = rng.randrange(users)
+        taste = tastes[user % len(tastes)]
+        movie = rng.choice(taste) if rng.random() < 0.8 else rng.randrange(movies)
+        yield {"booking_id": f"BK{n}", "username": f"user{user}", "movie": f"Movie {movie}",
+               "seat_type": rng.choice(["Standard", "VIP"]), "time": "7:00 PM", "status": "confirmed"}
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] != ["--benchmark"]:
+        # The offline job: python collaborative.py [table file]. Run it from
+        # the data directory on a schedule, e.g. nightly from cron:
+        #   30 4 * * *  cd /srv/moviebot && python collaborative.py
+        # Training streams every booking, so run it off-peak; the table is
+        # replaced atomically and servers reload it on their own.
+        from storage import open_storage
+
+        table_file = sys.argv[1] if len(sys.argv) > 1 else "movie_neighbors.json"
+        started = time.perf_counter()
+        table = train(open_storage().iter_bookings())
+        write_table(table, table_file)
+        print(f"{table['bookings']:,} bookings by {table['users']:,} users, {len(table['movies']):,} movies:"
+              f" {table_file} written in {time.perf_counter() - started:.2f} s")
+        sys.exit()
+
+    import tempfile
+    import tracemalloc
+
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    started = time.perf_counter()
+    table = train(synthetic_bookings(count))
+    trained = time.perf_counter() - started
+    tracemalloc.start()
+    train(synthetic_bookings(count))
+    streamed_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    loaded = list(synthetic_bookings(count))
+    loaded_peak = tracemalloc.get_traced_memory()[1]
+    del loaded
+    tracemalloc.stop()
+    print(f"{count:,} bookings, {table['users']:,} users, {len(table['movies']):,} movies")
+    print(f"  trained in {trained:.1f} s, peak {streamed_peak / 2**20:.0f} MB"
+          f" (holding the bookings as a list alone: {loaded_peak / 2**20:.0f} MB)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        table_file = os.path.join(directory, "movie_neighbors.json")
+        write_table(table, table_file)
+        print(f"  table: {os.path.getsize(table_file) / 2**10:.0f} KB")
+        neighbors = NeighborTable(table_file)
+        recent = ["Movie 1", "Movie 5", "Movie 9", "Movie 13", "Movie 17"]
+        neighbors.similar(recent)
+        runs = 10_000
+        started = time.perf_counter()
+        for _ in range(runs):
+            neighbors.similar(recent, 3, exclude=recent)
+        print(f"  similar() for a user's 5 recent movies: {(time.perf_counter() - started) / runs * 1e6:.0f} µs")
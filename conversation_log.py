@@ -0,0 +1,271 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+from file_locks import JSONDocument, atomic_write_json
+
+try:
+    import zstandard
+except ImportError:  # segments are gzipped instead
+    zstandard = None
+
+
+def _compress(data):
+    if zstandard:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(name, data):
+    if name.endswith(".zst"):
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class ConversationLog:
+    """Every conversation turn, streamed to compressed JSON-lines segments
+
+    write() only queues a turn, so the reply path never touches the disk. A
+    writer thread appends everything queued each flush_interval to the current
+    segment in directory, as compressed frames of up to frame_turns turns (zstd
+    if the zstandard module is installed, else gzip), and rolls over to a new
+    segment after segment_bytes or segment_seconds. Each segment has a small ".idx" file
+    mapping session ids to the frames holding their turns, so replay() only
+    decompresses those frames.
+
+    index_file lists the segments and when they were last written; segments
+    idle for retention_days are deleted. Segment names carry the process id,
+    so several processes can log into the same directory.
+    """
+
+    def __init__(self, directory="conversation_log", index_file="conversation_history.json",
+                 flush_interval=1.0, frame_turns=500, segment_bytes=4 << 20,
+                 segment_seconds=3600, retention_days=30):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.frame_turns = frame_turns
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.retention = retention_days * 86400
+        self.index = JSONDocument(index_file, {"segments": []})
+        os.makedirs(directory, exist_ok=True)
+
+        self._queue = queue.Queue()
+        self._queued = threading.Event()  # set by write(), cleared by the writer thread
+        self._write_lock = threading.Lock()  # one frame write at a time
+        self._segment = None  # name of the segment being written
+        self._file = None
+        self._started = 0.0
+        self._sessions = {}  # session id -> [[offset, length], ...] in the current segment
+        self._indexes = {}  # segment name -> JSONDocument of its .idx file
+        self._closed = False
+        self.frames = 0  # frames written
+
+        self.expire()
+        self._writer = threading.Thread(target=self._write_loop, name="conversation-log", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def write(self, session_id, sender, message, username=None):
+        """Queue one turn of a conversation"""
+        self._queue.put({"time": time.time(), "session": session_id, "user": username,
+                         "sender": sender, "message": message})
+        if not self._queued.is_set():
+            self._queued.set()
+
+    def _write_loop(self):
+        while not self._closed:
+            if not self._queued.wait(timeout=1.0):
+                continue
+            self._queued.clear()
+            # Gather the turns of a whole interval into one write; they stay
+            # queued meanwhile, so flush() still finds them
+            time.sleep(self.flush_interval)
+            try:
+                self._write([])
+            except OSError:
+                pass
+
+    def flush(self):
+        """Write every queued turn now"""
+        self._write([])
+
+    def _write(self, turns):
+        with self._write_lock:
+            while True:
+                try:
+                    turns.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not turns:
+                return
+            now = time.time()
+            if (self._file is None or self._file.tell() >= self.segment_bytes
+                    or now - self._started >= self.segment_seconds):
+                self._roll(now)
+
+            for start in range(0, len(turns), self.frame_turns):
+                chunk = turns[start:start + self.frame_turns]
+                frame = _compress(b"".join(json.dumps(turn).encode("utf-8") + b"\n" for turn in chunk))
+                offset = self._file.tell()
+                self._file.write(frame)
+                self.frames += 1
+                for session_id in {turn["session"] for turn in chunk}:
+                    self._sessions.setdefault(session_id, []).append([offset, len(frame)])
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            atomic_write_json(self._path(self._segment) + ".idx", {"sessions": self._sessions})
+            self._record_segment(now, self._file.tell())
+
+    def _roll(self, now):
+        """Close the current segment and start a new one; caller holds the write lock"""
+        if self._file is not None:
+            self._file.close()
+            self.expire(now)
+        extension = ".jsonl.zst" if zstandard else ".jsonl.gz"
+        self._segment = f"{int(now * 1000):013d}-{os.getpid()}{extension}"
+        self._file = open(self._path(self._segment), 'ab')
+        self._started = now
+        self._sessions = {}
+
+    def _record_segment(self, now, size):
+        name, started = self._segment, self._started
+
+        def change(data):
+            segments = data.setdefault("segments", [])
+            for entry in segments:
+                if entry["name"] == name:
+                    entry.update(last=now, bytes=size)
+                    return
+            segments.append({"name": name, "started": started, "last": now, "bytes": size})
+        self.index.update(change)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def expire(self, now=None):
+        """Delete segments not written to for retention_days, return how many"""
+        cutoff = (now or time.time()) - self.retention
+        if not any(entry["last"] < cutoff for entry in self.index.read().get("segments", [])):
+            return 0
+        expired = []
+
+        def change(data):
+            expired[:] = [entry for entry in data.get("segments", []) if entry["last"] < cutoff]
+            data["segments"] = [entry for entry in data.get("segments", []) if entry["last"] >= cutoff]
+        self.index.update(change)
+        for entry in expired:
+            self._indexes.pop(entry["name"], None)
+            segment = self._path(entry["name"])
+            for path in (segment, segment + ".idx", segment + ".idx.lock"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return len(expired)
+
+    def replay(self, session_id):
+        """Return every logged turn of a session, oldest first"""
+        self.flush()
+        turns = []
+        for entry in self.index.read().get("segments", []):
+            name = entry["name"]
+            if name.endswith(".zst") and not zstandard:
+                continue
+            segment_index = self._indexes.get(name)
+            if segment_index is None:
+                segment_index = self._indexes[name] = JSONDocument(self._path(name) + ".idx", {"sessions": {}})
+            frames = segment_index.read().get("sessions", {}).get(session_id)
+            if not frames:
+                continue
+            try:
+                with open(self._path(name), 'rb') as f:
+                    for offset, length in frames:
+                        f.seek(offset)
+                        for line in _decompress(name, f.read(length)).splitlines():
+                            turn = json.loads(line)
+                            if turn["session"] == session_id:
+                                turns.append(turn)
+            except (OSError, ValueError, EOFError):
+                continue  # expired or damaged under us
+        turns.sort(key=lambda turn: turn["time"])
+        return turns
+
+    def close(self):
+        """Write what is queued and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._writer.join()
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def get_conversation_log(directory="conversation_log", index_file="conversation_history.json"):
+    """Return the shared conversation log for a directory"""
+    key = (os.path.abspath(directory), os.path.abspath(index_file))
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = _logs[key] = ConversationLog(directory, index_file)
+    return log
+
+
+if __name__ == "__main__":
+    import random
+    import shutil
+    import tempfile
+
+    # A busy server: 32 connection threads each running many short conversations
+    directory = tempfile.mkdtemp()
+    threads, sessions_per_thread, turns_per_session = 32, 50, 40
+    log = ConversationLog(os.path.join(directory, "conversation_log"),
+                          os.path.join(directory, "conversation_history.json"), flush_interval=0.2)
+    latencies = []
+
+    def connection(n):
+        rng = random.Random(n)
+        worst = 0.0
+        for s in range(sessions_per_thread):
+            for t in range(turns_per_session):
+                started = time.perf_counter()
+                log.write(f"ws-{n}-{s}", "user" if t % 2 == 0 else "bot",
+                          rng.choice(["Book 2 tickets for Dune tonight", "Which theater?", "Cinema City",
+                                      "✅ Booking confirmed! Enjoy the movie."]), f"user{n}")
+                worst = max(worst, time.perf_counter() - started)
+        latencies.append(worst)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=connection, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    queued = time.perf_counter() - started
+    log.close()
+    written = time.perf_counter() - started
+
+    turns = threads * sessions_per_thread * turns_per_session
+    size = sum(os.path.getsize(os.path.join(log.directory, name)) for name in os.listdir(log.directory)
+               if not name.endswith(".idx"))
+    replay_started = time.perf_counter()
+    replayed = log.replay("ws-7-25")
+    replay_time = time.perf_counter() - replay_started
+    assert len(replayed) == turns_per_session
+    print(f"{turns} turns from {threads} threads: queued in {queued:.2f} s "
+          f"({turns / queued:,.0f} turns/s, worst write() {max(latencies) * 1000:.1f} ms), "
+          f"on disk after {written:.2f} s in {log.frames} frames")
+    print(f"  {size / 1e6:.2f} MB compressed ({size / turns:.1f} bytes per turn); "
+          f"replaying one session took {replay_time * 1000:.1f} ms")
+    shutil.rmtree(directory)
@@ -0,0 +1,1000 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from booking_ids import new_booking_id, normalize_booking_id
+from catalog import get_catalog
+from collaborative import get_neighbor_table
+from conversation_log import get_conversation_log
+from events import BOOKING_FLOW, CATALOG, HOLD_EXPIRED, SUGGESTION, EventBus
+from intents import IntentClassifier
+from preference_cache import get_preference_cache
+from schedule import format_showtime
+from seating import booking_show, get_inventory
+from slots import SlotExtractor
+from storage import open_storage
+from temporal import format_day, parse_when
+from transcript import Transcript
+
+# text: the reply. intent: the intent that produced it, "booking_flow" for a
+# booking step, or None. form: quick booking form fields the dialogue filled in.
+# booking: the booking record when this reply confirmed one.
+Response = namedtuple("Response", ["text", "intent", "form", "booking"])
+
+SAMPLE_MOVIES = {
+    "movies": [
+        {
+            "id": 1,
+            "title": "The Last Adventure",
+            "genre": "Action/Adventure",
+            "duration": "2h 15m",
+            "rating": "PG-13",
+            "description": "An epic journey through uncharted territories.",
+            "director": "Alex Rivera",
+            "cast": ["Chris Evans", "Zendaya", "Idris Elba"],
+            "imdb": 7.8,
+            "popularity": 95,
+            "showtimes": ["10:00 AM", "1:30 PM", "4:00 PM", "6:30 PM", "9:00 PM"]
+        },
+        {
+            "id": 2,
+            "title": "Cosmic Dreams",
+            "genre": "Sci-Fi",
+            "duration": "2h 30m",
+            "rating": "PG",
+            "description": "A mind-bending journey through space and time.",
+            "director": "Lisa Chen",
+            "cast": ["Tom Hanks", "Millie Bobby Brown", "Keanu Reeves"],
+            "imdb": 8.2,
+            "popularity": 98,
+            "showtimes": ["11:00 AM", "2:30 PM", "5:00 PM", "8:30 PM"]
+        },
+        {
+            "id": 3,
+            "title": "Heartstrings",
+            "genre": "Romance/Drama",
+            "duration": "1h 50m",
+            "rating": "PG-13",
+            "description": "A love story that transcends time.",
+            "director": "Sophia Lee",
+            "cast": ["Emma Stone", "Timothée Chalamet", "Viola Davis"],
+            "imdb": 7.5,
+            "popularity": 88,
+            "showtimes": ["12:00 PM", "3:30 PM", "7:00 PM", "10:00 PM"]
+        },
+        {
+            "id": 4,
+            "title": "Midnight Mystery",
+            "genre": "Thriller/Mystery",
+            "duration": "2h 5m",
+            "rating": "R",
+            "description": "A detective races against time to solve a century-old mystery.",
+            "director": "James Nolan",
+            "cast": ["Daniel Craig", "Ana de Armas", "Anthony Hopkins"],
+            "imdb": 8.0,
+            "popularity": 92,
+            "showtimes": ["1:00 PM", "4:30 PM", "9:00 PM"]
+        },
+        {
+            "id": 5,
+            "title": "Laugh Out Loud",
+            "genre": "Comedy",
+            "duration": "1h 45m",
+            "rating": "PG",
+            "description": "The funniest movie of the year!",
+            "director": "Kevin Hart",
+            "cast": ["Ryan Reynolds", "Tiffany Haddish", "Jack Black"],
+            "imdb": 6.9,
+            "popularity": 85,
+            "showtimes": ["10:30 AM", "2:00 PM", "5:30 PM", "9:30 PM"]
+        }
+    ],
+    "theaters": [
+        {"id": 1, "name": "City Center Cinemas", "location": "Downtown", "vip": True, "popularity": 95},
+        {"id": 2, "name": "Starlight Theater", "location": "Westside Mall", "vip": True, "popularity": 88},
+        {"id": 3, "name": "Grand Arena", "location": "Eastgate Complex", "vip": False, "popularity": 82},
+        {"id": 4, "name": "Royal IMAX", "location": "North Plaza", "vip": True, "popularity": 92}
+    ]
+}
+
+
+# Booking flow step n is waiting for FLOW_SLOTS[n]; step 5 for confirmation
+FLOW_SLOTS = ["movie", "date", "time", "tickets", "theater"]
+
+
+def new_booking_flow():
+    """Return an idle booking flow"""
+    return {
+        "step": 0,  # 0: idle, 1: movie selected, 2: date selected, 3: time selected, 4: tickets selected, 5: theater selected, 6: confirmation
+        "movie": None,
+        "date": None,
+        "time": None,
+        "tickets": 1,
+        "theater": None,
+        "seat_type": "Standard",
+        "auto_fill": False
+    }
+
+
+class Session:
+    """Dialogue state for one conversation"""
+
+    def __init__(self, session_id, username="guest", preferences=None, remember=True):
+        self.session_id = session_id
+        self.username = username
+        self.remember = remember  # save what is learned of the user's preferences
+        self.booking_flow = new_booking_flow()
+        self.preferences = preferences or {
+            "genre": None,
+            "time_preference": "evening",
+            "theater_preference": None,
+            "seat_type": "Standard",
+            "favorite_movies": []
+        }
+        self.history = Transcript(capacity=200)  # recent messages only
+        self.last_suggestion = None
+        self.hold = None  # seats held for the booking in progress
+        self.bookings_cursor = None  # where "older bookings" continues from
+        # Replies for one session are computed one at a time
+        self.lock = threading.Lock()
+        self._form = {}
+
+
+class ChatEngine:
+    """The booking dialogue without any GUI, serving any number of sessions
+
+    respond(session_id, text) runs one turn of a conversation and returns a
+    Response. Everything the dialogue knows about a conversation lives on its
+    Session, so one engine can be shared by a Tk window, a server, or both.
+    State changes are published on events (see events.py) rather than polled.
+    Seats are held from theater selection until confirmation; a hold left for
+    hold_ttl seconds is released and HOLD_EXPIRED is published.
+    """
+
+    # Intent keywords, in priority order
+    INTENTS = [
+        ("greeting", ["hello", "hi", "hey"]),
+        ("book", ["book", "ticket", "reserve"]),
+        ("show_movies", ["show", "movie", "available", "playing"]),
+        ("view_bookings", ["my booking", "view booking", "bookings"]),
+        ("cancel", ["cancel", "delete"]),
+        ("price", ["price", "cost", "how much"]),
+        ("recommend", ["recommend", "suggestion"]),
+        ("help", ["help", "what can you do"]),
+        ("thanks", ["thank", "thanks"])
+    ]
+
+    def __init__(self, movies_file="movies.json", bookings_file="bookings.json",
+                 users_file="users.json", preferences_file="preferences.json",
+                 neighbors_file="movie_neighbors.json", events=None, suggestion_interval=10.0, hold_ttl=300.0,
+                 log_directory=None):
+        self.movies_file = movies_file
+        self.bookings_file = bookings_file
+        self.users_file = users_file
+        self.preferences_file = preferences_file
+        self.neighbors_file = neighbors_file
+        # Conversation segments and their index live beside the bookings
+        data_dir = os.path.dirname(bookings_file) or "."
+        self.log_directory = log_directory or os.path.join(data_dir, "conversation_log")
+
+        # Pricing
+        self.ticket_price = 12.50
+        self.vip_upcharge = 5.00
+        self.tax_rate = 0.08
+
+        self.events = events or EventBus()
+        self.suggestion_interval = suggestion_interval
+        self.hold_ttl = hold_ttl
+
+        self.initialize_data()
+        self.catalog = get_catalog(self.movies_file)
+        self.catalog.add_listener(lambda catalog: self.events.publish(CATALOG, catalog))
+        self.storage = open_storage(self.bookings_file, self.users_file, self.preferences_file)
+        self.preference_cache = get_preference_cache(self.storage)
+        self.conversation_log = get_conversation_log(
+            self.log_directory, os.path.join(data_dir, "conversation_history.json"))
+        self.inventory = get_inventory(self.storage, self.catalog)
+        self.slot_extractor = SlotExtractor(self.catalog)
+        self.neighbors = get_neighbor_table(self.neighbors_file)  # written by python collaborative.py
+
+        self.intent_classifier = IntentClassifier(self.INTENTS)
+        self.intent_handlers = {
+            "greeting": self.handle_greeting,
+            "book": self.handle_book_ticket,
+            "show_movies": self.handle_show_movies,
+            "view_bookings": self.handle_view_bookings,
+            "cancel": self.handle_cancel_booking,
+            "price": self.handle_price_query,
+            "recommend": self.handle_recommendation,
+            "help": self.handle_help,
+            "thanks": self.handle_thanks
+        }
+
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    def initialize_data(self):
+        """Initialize data files with sample data"""
+        if not os.path.exists(self.movies_file):
+            with open(self.movies_file, 'w') as f:
+                json.dump(SAMPLE_MOVIES, f, indent=4)
+
+        if not os.path.exists(self.bookings_file):
+            with open(self.bookings_file, 'w') as f:
+                json.dump({"bookings": []}, f, indent=4)
+
+        if not os.path.exists(self.preferences_file):
+            with open(self.preferences_file, 'w') as f:
+                json.dump({"preferences": {}}, f, indent=4)
+
+    # Sessions
+
+    def session(self, session_id, username="guest", remember=True):
+        """Return the session for session_id, starting it if needed
+
+        A session started with remember=False learns preferences for the
+        conversation only, e.g. for a one-off anonymous user.
+        """
+        with self._sessions_lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                preferences = self.preference_cache.load(username) if remember else None
+                session = Session(session_id, username, preferences, remember)
+                self._sessions[session_id] = session
+        return session
+
+    def end_session(self, session_id):
+        """Forget a session's dialogue state"""
+        with self._sessions_lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            with session.lock:
+                self._release_hold(session)
+
+    def respond(self, session_id, text):
+        """Run one turn of the conversation and return a Response"""
+        session = self.session(session_id)
+        with session.lock:
+            flow_before = dict(session.booking_flow)
+            session._form = {}
+            self._record(session, "user", text)
+            self.learn_from_input(session, text)
+
+            match = self.intent_classifier.classify(text)
+            booking = None
+            if match:
+                intent = match.intent
+                reply = self.intent_handlers[intent](session, text)
+            elif session.booking_flow["step"] > 0:
+                intent = "booking_flow"
+                reply, booking = self.handle_booking_flow_response(session, text)
+            else:
+                intent = None
+                reply = "I'm not sure I understand. You can ask me to book tickets, show movies, or check your bookings. 😊"
+
+            self._record(session, "bot", reply)
+            flow_after = dict(session.booking_flow)
+            suggestion = self._due_suggestion(session)
+
+        if flow_after != flow_before:
+            self.events.publish(BOOKING_FLOW, session_id, flow_after)
+        if suggestion:
+            self.events.publish(SUGGESTION, session_id, suggestion)
+        return Response(reply, intent, session._form, booking)
+
+    def _record(self, session, sender, message):
+        """Add a message to the session's history and the conversation log"""
+        session.history.append({"sender": sender, "message": message})
+        self.conversation_log.write(session.session_id, sender, message, session.username)
+
+    def record(self, session_id, sender, message):
+        """Log a message a front end showed without a respond() turn, e.g. a greeting
+
+        Only queues the message, so it doesn't wait for a turn in progress.
+        """
+        self.conversation_log.write(session_id, sender, message, self.session(session_id).username)
+
+    def _due_suggestion(self, session):
+        """Return a new suggestion if the session hasn't had one for suggestion_interval"""
+        now = time.monotonic()
+        if session.last_suggestion is not None and now - session.last_suggestion < self.suggestion_interval:
+            return None
+        session.last_suggestion = now
+        return self.generate_smart_suggestion()
+
+    # Seat holds
+
+    def _hold_seats(self, session):
+        """Hold seats for the session's chosen show, return the Hold or None if they don't fit"""
+        self._release_hold(session)
+        flow = session.booking_flow
+        session_id = session.session_id
+        session.hold = self.inventory.hold(
+            booking_show(flow), flow["tickets"], ttl=self.hold_ttl,
+            on_expire=lambda hold: self._hold_expired(session_id, hold))
+        return session.hold
+
+    def _release_hold(self, session):
+        if session.hold is not None:
+            self.inventory.release(session.hold.hold_id)
+            session.hold = None
+
+    def _hold_expired(self, session_id, hold):
+        """Timer thread: tell a session its seats went back on sale"""
+        with self._sessions_lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            return
+        with session.lock:
+            if session.hold is None or session.hold.hold_id != hold.hold_id:
+                return
+            session.hold = None
+            message = (f"⏰ Your seats ({', '.join(hold.seats)}) for **{hold.show[0]}** were released "
+                       f"after {self.hold_ttl / 60:g} minutes. Type 'confirm' and I'll look for seats again.")
+            self._record(session, "bot", message)
+        self.events.publish(HOLD_EXPIRED, session_id, message)
+
+    def quick_book(self, session_id, movie, date, time, tickets):
+        """Start a booking from the quick form, skipping straight to confirmation"""
+        session = self.session(session_id)
+        with session.lock:
+            day = parse_when(date).day
+            date_str = day.isoformat() if day else date
+            start = parse_when(time).time
+            time = format_showtime(start) if start else time
+
+            session.booking_flow = {
+                "step": 5,  # Skip to confirmation
+                "movie": movie,
+                "date": date_str,
+                "time": time,
+                "tickets": int(tickets),
+                "theater": "City Center Cinemas",  # Default
+                "seat_type": "Standard",
+                "auto_fill": True
+            }
+
+            response = f"⚡ **Quick Booking Summary**\n\n"
+            response += self.generate_booking_summary(session)
+            if self._hold_seats(session) is None:
+                response += "\n\n⚠️ Not enough seats are left for that show right now."
+            response += "\n\n**Type 'confirm' to book or 'cancel' to start over.**"
+            flow = dict(session.booking_flow)
+            self._record(session, "bot", response)
+
+        self.events.publish(BOOKING_FLOW, session_id, flow)
+        return Response(response, "booking_flow", {}, None)
+
+    def show_bookings(self, session_id):
+        """Return a Response listing the session user's latest bookings, for a bookings button"""
+        session = self.session(session_id)
+        with session.lock:
+            text = self.view_my_bookings(session)
+            self._record(session, "bot", text)
+        return Response(text, "view_bookings", {}, None)
+
+    # Canned messages
+
+    def greeting(self):
+        """Return the opening message for a new conversation"""
+        current_hour = datetime.now().hour
+
+        if 5 <= current_hour < 12:
+            greeting = "Good morning! "
+        elif 12 <= current_hour < 17:
+            greeting = "Good afternoon! "
+        elif 17 <= current_hour < 22:
+            greeting = "Good evening! "
+        else:
+            greeting = "Hello! "
+
+        greeting += "I'm your AI Movie Assistant. 🤖\n\n"
+        greeting += "I can help you:\n"
+        greeting += "• Book movie tickets 🎫\n"
+        greeting += "• Show available movies 🎬\n"
+        greeting += "• Manage your bookings 📋\n"
+        greeting += "• Get recommendations ⭐\n\n"
+        greeting += "What would you like to do today?"
+        return greeting
+
+    def generate_smart_suggestion(self):
+        """Generate smart suggestion"""
+        suggestions = [
+            "Looking for something to watch? Try 'Get recommendations'!",
+            "Ready to book? Use the quick booking form on the right!",
+            "Check out the latest movies with 'Show movies'",
+            "Need help? Just type 'Help' for all available commands",
+            "View your booking history with 'View my bookings'"
+        ]
+
+        return random.choice(suggestions)
+
+    def auto_book_suggestion(self, session=None):
+        """Suggest a booking for the movie that best fits the session's preferences"""
+        try:
+            preferences = session.preferences if session else None
+            movies = self.catalog.recommender().recommend(preferences, 1)
+            if not movies:
+                return "No movies available. Please check back later."
+
+            best_movie = movies[0]
+
+            response = f"🚀 **AUTO-BOOKING SUGGESTION**\n\n"
+            response += f"Based on {'your preferences' if preferences and preferences.get('genre') else 'popularity'}, I recommend:\n\n"
+            response += f"🎬 **{best_movie.get('title')}**\n"
+            response += f"Genre: {best_movie.get('genre')}\n"
+            response += f"Rating: {best_movie.get('rating')}\n"
+            response += f"⭐ IMDb: {best_movie.get('imdb')}/10\n\n"
+            response += f"**Suggested Booking:**\n"
+            response += f"• Date: Tomorrow\n"
+            response += f"• Time: 6:30 PM\n"
+            response += f"• Theater: City Center Cinemas\n"
+            response += f"• Tickets: 2\n\n"
+            response += f"Use the quick booking form or type 'Book {best_movie.get('title')}'!"
+            return response
+        except Exception:
+            return "Error getting movie suggestions. Please try again."
+
+    # Dialogue
+
+    def learn_from_input(self, session, user_text):
+        """Learn from user input"""
+        text_lower = user_text.lower()
+        preferences = session.preferences
+        before = dict(preferences)
+
+        # Learn genre preferences
+        genres = ["action", "comedy", "drama", "sci-fi", "thriller", "romance", "mystery"]
+        for genre in genres:
+            if genre in text_lower:
+                preferences["genre"] = genre.capitalize()
+
+        # Learn time preferences
+        if "morning" in text_lower:
+            preferences["time_preference"] = "morning"
+        elif "afternoon" in text_lower:
+            preferences["time_preference"] = "afternoon"
+        elif "evening" in text_lower or "night" in text_lower:
+            preferences["time_preference"] = "evening"
+
+        if preferences != before and session.remember:
+            self.preference_cache.save(session.username, preferences)
+
+    def handle_greeting(self, session, message):
+        """Handle greeting intent"""
+        return "Hello again! How can I assist you with movie booking today? 🎬"
+
+    def handle_thanks(self, session, message):
+        """Handle thanks intent"""
+        return random.choice([
+            "You're welcome! 😊",
+            "Happy to help! 🎬",
+            "My pleasure! Enjoy your movie! 🍿"
+        ])
+
+    def handle_book_ticket(self, session, message):
+        """Handle book ticket intent"""
+        slots = self.slot_extractor.extract(message)
+        if slots.movie is None and 1 <= session.booking_flow["step"] <= 4:
+            # "4 tickets at 7 pm" mid-booking adds to the booking under way
+            return self.handle_booking_flow_response(session, message)[0]
+        movie = slots.movie or self.catalog.match_movie(message, fuzzy=True)
+
+        if not movie:
+            return "I'd love to help you book tickets! 🎫 Which movie would you like to watch? You can also select from the quick booking form on the right."
+
+        # Start booking flow, with everything the message already said
+        self._release_hold(session)
+        session.booking_flow = new_booking_flow()
+        return self._advance_flow(session, self._fill_flow(session, slots._replace(movie=movie)))
+
+    def _fill_flow(self, session, slots):
+        """Copy the slots a message filled into the booking flow, return their names"""
+        flow = session.booking_flow
+        filled = []
+        if slots.movie:
+            flow["movie"] = session._form["movie"] = slots.movie.get("title")
+            filled.append("movie")
+        if slots.date:
+            flow["date"] = session._form["date"] = slots.date.isoformat()
+            filled.append("date")
+        if slots.time:
+            flow["time"] = session._form["time"] = format_showtime(slots.time)
+            filled.append("time")
+        if slots.tickets:
+            flow["tickets"] = slots.tickets
+            session._form["tickets"] = str(slots.tickets)
+            filled.append("tickets")
+        if slots.seat_type:
+            flow["seat_type"] = slots.seat_type
+        if slots.theater:
+            flow["theater"] = slots.theater.get("name")
+            filled.append("theater")
+        return filled
+
+    def _advance_flow(self, session, filled):
+        """Move the flow to its first missing detail and return the reply asking for it"""
+        flow = session.booking_flow
+        dropped, problem = self._drop_unscheduled(flow, filled)
+        known = (set(FLOW_SLOTS[:flow["step"]]) | set(filled)) - {dropped}
+        known |= {name for name in ("movie", "date", "time", "theater") if flow[name]}
+        flow["step"] = next((step for step, name in enumerate(FLOW_SLOTS) if name not in known), 5)
+
+        acks = {
+            "movie": f"🎬 **{flow['movie']}**",
+            "date": f"📅 **{format_day(date.fromisoformat(flow['date']))}**" if flow["date"] else "",
+            "time": f"🕐 **{flow['time']}**",
+            "tickets": f"🎫 **{flow['tickets']}{' VIP' if flow['seat_type'] == 'VIP' else ''} ticket(s)**",
+            "theater": f"🏢 **{flow['theater']}**",
+        }
+        if len(filled) > 1:
+            response = "Got it! " + " · ".join(acks[name] for name in filled) + "\n\n"
+        elif filled == ["movie"]:
+            movie_info = self.catalog.find_movie(flow["movie"]) or {}
+            response = f"Great choice! {acks['movie']}\n\n"
+            response += f"Genre: {movie_info.get('genre', 'N/A')}\n"
+            response += f"Rating: {movie_info.get('rating', 'N/A')}\n"
+            response += f"Duration: {movie_info.get('duration', 'N/A')}\n\n"
+        elif filled == ["date"]:
+            response = f"Perfect! 📅 You've selected {acks['date'][2:]}.\n\n"
+        elif filled == ["time"]:
+            response = f"Excellent! 🕐 You've selected {acks['time'][2:]}.\n\n"
+        elif filled == ["tickets"]:
+            response = f"Got it! {acks['tickets']}\n\n"
+        elif filled == ["theater"]:
+            response = f"Great choice! {acks['theater']}\n\n"
+        else:
+            response = ""
+        response = problem + response
+
+        step = flow["step"]
+        if step == 1:
+            response += "**When would you like to watch it?**\n"
+            response += "You can:\n"
+            response += "• Select a date from the quick booking form\n"
+            response += "• Say 'tomorrow', 'this weekend', or a specific date\n"
+            response += "• Click the 'Quick Book' button after filling the form"
+        elif step == 2:
+            response += "**What time would you prefer?**\n"
+            times = self._flow_showtimes(flow)
+            if times:
+                response += f"Showtimes: {', '.join(times)}\n"
+            response += "You can select from the quick booking form or say a time like '6:30 PM'."
+        elif step == 3:
+            response += "**How many tickets would you like?**\n"
+            response += "Use the spinner in the quick booking form or tell me a number."
+        elif step == 4:
+            response += "**Now, which theater would you prefer?**\n"
+            response += "Available theaters:\n"
+            for theater in self._flow_theaters(flow):
+                name = theater.get("name", "Unknown Theater")
+                location = theater.get("location", "Unknown Location")
+                response += f"• {name} ({location})\n"
+        else:
+            hold = self._hold_seats(session)
+            if hold is None:
+                left = self.inventory.available(booking_show(flow))
+                theater_name, flow["theater"], flow["step"] = flow["theater"], None, 4
+                return (f"😞 Sorry, only {left} seat(s) are left at **{theater_name}** for that show. "
+                        "Please pick another theater.")
+            response += self.generate_booking_summary(session)
+            response += f"\n💺 Seats {', '.join(hold.seats)} are held for you for {self.hold_ttl / 60:g} minutes."
+            response += "\n**Type 'confirm' to book or 'cancel' to start over.**"
+        return response
+
+    def handle_booking_flow_response(self, session, message):
+        """Handle responses during booking flow, return (reply, confirmed booking or None)"""
+        flow = session.booking_flow
+        step = flow["step"]
+
+        if 1 <= step <= 4:
+            # Take every detail the message gives, not just the one asked for
+            slots = self.slot_extractor.extract(message)
+            if step == 3 and slots.tickets is None and message.strip().isdigit():
+                slots = slots._replace(tickets=int(message.strip()))
+            if step == 2 and slots.time is None and message.strip().isdigit():
+                # A bare hour, if it picks out one of the showtimes offered
+                offered = [start for start in self._flow_showtimes(flow)
+                           if int(start.split(":")[0]) == int(message.strip())]
+                if len(offered) == 1:
+                    slots = slots._replace(time=parse_when(offered[0]).time)
+            if step == 4 and slots.theater is None:
+                slots = slots._replace(theater=self.catalog.match_theater(message, fuzzy=True))
+            filled = self._fill_flow(session, slots)
+            if filled:
+                return self._advance_flow(session, filled), None
+            response = [
+                "Please select a date. You can use the quick booking form or tell me a date.",
+                "Please select a showtime. Available times are in the quick booking form.",
+                "How many tickets would you like? Please enter a number.",
+                "Please select a theater from the list above.",
+            ][step - 1]
+
+        elif step == 5:  # Need confirmation
+            if message.lower() in ["confirm", "yes", "book it", "proceed"]:
+                return self.confirm_booking(session)
+            elif message.lower() in ["cancel", "no", "stop"]:
+                self._release_hold(session)
+                session.booking_flow = new_booking_flow()
+                return "Booking cancelled. Let me know if you'd like to book another movie! 😊", None
+            else:
+                response = self.generate_booking_summary(session)
+                response += "\n\n**Type 'confirm' to book or 'cancel' to start over.**"
+
+        else:
+            response = "Let's start a new booking! What movie would you like to watch?"
+
+        return response, None
+
+    def extract_movie_title(self, message):
+        """Extract movie title from message"""
+        movie = self.catalog.match_movie(message, fuzzy=True)
+        return movie.get("title") if movie else None
+
+    def generate_booking_summary(self, session):
+        """Generate booking summary"""
+        flow = session.booking_flow
+        summary = "📋 **BOOKING SUMMARY**\n"
+        summary += "═" * 30 + "\n"
+        summary += f"🎬 Movie: {flow['movie']}\n"
+        summary += f"📅 Date: {flow['date']}\n"
+        summary += f"🕐 Time: {flow['time']}\n"
+        summary += f"🎫 Tickets: {flow['tickets']}\n"
+        summary += f"🏢 Theater: {flow['theater']}\n"
+        summary += f"💺 Seat Type: {flow['seat_type']}\n"
+
+        # Calculate price
+        total_price = self.calculate_total_price(session)
+        summary += f"💰 Total Price: ${total_price:.2f}\n"
+        summary += "═" * 30
+
+        return summary
+
+    def calculate_total_price(self, session):
+        """Calculate total price"""
+        tickets = session.booking_flow["tickets"]
+        seat_type = session.booking_flow["seat_type"]
+
+        base_price = self.ticket_price
+        if seat_type == "VIP":
+            base_price += self.vip_upcharge
+
+        subtotal = base_price * tickets
+        tax = subtotal * self.tax_rate
+        total = subtotal + tax
+
+        return round(total, 2)
+
+    def confirm_booking(self, session):
+        """Confirm and save booking, return (reply, booking or None)"""
+        flow = session.booking_flow
+        booking_id = new_booking_id(os.path.dirname(self.bookings_file) or ".")
+        total_price = self.calculate_total_price(session)
+
+        booking_data = {
+            "booking_id": booking_id,
+            "username": session.username,
+            "movie": flow["movie"],
+            "date": flow["date"],
+            "time": flow["time"],
+            "tickets": flow["tickets"],
+            "theater": flow["theater"],
+            "seat_type": flow["seat_type"],
+            "total_price": total_price,
+            "booking_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "confirmed"
+        }
+
+        show = booking_show(booking_data)
+        # Keep the hold from expiring while the booking is saved
+        hold = session.hold and self.inventory.keep(session.hold.hold_id)
+        session.hold = None
+        if hold is not None and (hold.show != show or len(hold.seats) != flow["tickets"]):
+            self.inventory.release(hold.hold_id)
+            hold = None
+        if hold is None:
+            # The hold expired (or the flow skipped it), so try for seats again
+            hold = self.inventory.hold(show, flow["tickets"])
+            if hold is None:
+                left = self.inventory.available(show)
+                return (f"😞 Sorry, only {left} seat(s) are left for that show. "
+                        "Please choose fewer tickets or another showtime."), None
+        booking_data["seats"] = hold.seats
+
+        try:
+            added = self.storage.add_booking(booking_data, check=self.inventory.fits)
+        except Exception as e:
+            self.inventory.release(hold.hold_id)
+            return f"❌ Error saving booking: {str(e)}\nPlease try again.", None
+        if not added:
+            # Another process sold these seats since they were held
+            self.inventory.release(hold.hold_id)
+            self.inventory.refresh(show)
+            return ("😞 Sorry, those seats were just booked by someone else. "
+                    "Type 'confirm' to try for other seats or 'cancel' to start over."), None
+        self.inventory.commit(hold.hold_id, booking_data)
+
+        session.booking_flow = new_booking_flow()
+
+        response = f"✅ **BOOKING CONFIRMED!**\n\n"
+        response += f"**Booking ID:** {booking_id}\n"
+        response += f"**Movie:** {booking_data['movie']}\n"
+        response += f"**Date & Time:** {booking_data['date']} at {booking_data['time']}\n"
+        response += f"**Theater:** {booking_data['theater']}\n"
+        response += f"**Tickets:** {booking_data['tickets']} ({booking_data['seat_type']})\n"
+        response += f"**Seats:** {', '.join(hold.seats)}\n"
+        response += f"**Total Paid:** ${total_price:.2f}\n\n"
+        response += "🎬 Enjoy your movie! Don't forget the popcorn! 🍿\n\n"
+        response += "Would you like to book another movie or check your bookings?"
+
+        return response, booking_data
+
+    def view_my_bookings(self, session, older=False):
+        """Describe a session user's latest bookings, or the page before the last one shown"""
+        try:
+            before = session.bookings_cursor if older else None
+            if older and before is None:
+                return "That's all of your bookings. 🎬"
+            user_bookings, session.bookings_cursor = self.storage.recent_bookings_for_user(
+                session.username, 5, before)
+
+            if not user_bookings:
+                return "You don't have any bookings yet. Would you like to book your first movie? 🎬"
+
+            response = "📋 **YOUR BOOKINGS**\n\n" if not older else "📋 **OLDER BOOKINGS**\n\n"
+
+            for i, booking in enumerate(reversed(user_bookings), 1):  # Show 5 bookings, oldest first
+                response += f"**Booking #{i}**\n"
+                response += f"ID: {booking.get('booking_id', 'N/A')}\n"
+                response += f"Movie: {booking.get('movie', 'N/A')}\n"
+                response += f"Date: {booking.get('date', 'N/A')} at {booking.get('time', 'N/A')}\n"
+                response += f"Theater: {booking.get('theater', 'N/A')}\n"
+                response += f"Tickets: {booking.get('tickets', 'N/A')}\n"
+                response += f"Total: ${booking.get('total_price', '0.00')}\n"
+                response += f"Status: {booking.get('status', 'confirmed')}\n"
+                response += "-" * 30 + "\n\n"
+
+            if session.bookings_cursor:
+                response += "Say 'older bookings' to see earlier ones.\n"
+            response += "To cancel a booking, say: 'Cancel booking [Booking ID]'"
+
+            return response
+
+        except Exception:
+            return "Could not load bookings. Please try again later."
+
+    def handle_view_bookings(self, session, message):
+        """Handle view bookings intent"""
+        text = message.lower()
+        return self.view_my_bookings(session, older="older" in text or "more" in text)
+
+    def handle_cancel_booking(self, session, message):
+        """Handle cancel booking intent"""
+        id_match = re.search(r'booking\s*#?\s*(\w+)', message)
+        booking_id = normalize_booking_id(id_match.group(1)) if id_match else None
+
+        if not booking_id:
+            return "Please specify which booking to cancel. For example: 'Cancel booking BK0N0TVS8700'"
+
+        try:
+            booking = self.storage.get_booking(booking_id)
+
+            if booking and booking.get("username") == session.username:
+                if booking.get("status") == "cancelled" or not self.storage.update_booking(
+                        booking_id, {"status": "cancelled"}, expect={"status": booking.get("status")}):
+                    return f"Booking {booking_id} is already cancelled."
+                # The seats go back on sale as the inventory reads the cancellation back
+                self.inventory.refresh(booking_show(booking))
+
+                return f"✅ Booking {booking_id} has been cancelled. Refund will be processed within 5-7 business days."
+            else:
+                return f"❌ Booking {booking_id} not found or you don't have permission to cancel it."
+
+        except Exception:
+            return "Error cancelling booking. Please try again later."
+
+    def _flow_showtimes(self, flow):
+        """Return the scheduled times of the flow's movie on its date"""
+        movie = self.catalog.find_movie(flow["movie"])
+        day = parse_when(flow["date"]).day
+        if movie is None or day is None:
+            return []
+        return self.catalog.showtimes(day, movie_id=movie.get("id"))
+
+    def _flow_theaters(self, flow):
+        """Return the theaters showing the flow's movie at its date and time
+
+        All of them while the movie, date or time is still unknown.
+        """
+        theaters = self.catalog.theaters()
+        movie = self.catalog.find_movie(flow["movie"])
+        day, start = parse_when(flow["date"]).day, parse_when(flow["time"]).time
+        if movie is None or day is None or start is None:
+            return theaters
+        showing = self.catalog.schedule().theaters_showing(movie.get("id"), datetime.combine(day, start))
+        return [theater for theater in theaters if theater.get("id") in showing]
+
+    def _drop_unscheduled(self, flow, filled):
+        """Clear a date, time or theater the schedule rules out
+
+        Returns (the cleared slot, the reply saying so), or (None, "") when
+        everything chosen is scheduled. The slot is taken out of filled so
+        the flow asks for it again.
+        """
+        if not flow["movie"] or not flow["date"]:
+            return None, ""
+        times = self._flow_showtimes(flow)
+        day = parse_when(flow["date"]).day
+        when = format_day(day) if day else flow["date"]
+        if not when.startswith(("today", "tomorrow")):
+            when = "on " + when
+        if not times:
+            slot, reason = "date", f"**{flow['movie']}** isn't showing {when}."
+        elif flow["time"] and flow["time"] not in times:
+            slot, reason = "time", f"**{flow['movie']}** isn't showing at {flow['time']} {when}."
+        elif flow["time"] and flow["theater"] and flow["theater"] not in [
+                theater.get("name") for theater in self._flow_theaters(flow)]:
+            slot, reason = "theater", f"**{flow['theater']}** isn't showing **{flow['movie']}** at {flow['time']}."
+        else:
+            return None, ""
+        flow[slot] = None
+        if slot in filled:
+            filled.remove(slot)
+        return slot, f"😕 Sorry, {reason}\n\n"
+
+    def handle_show_movies(self, session, message):
+        """Handle show movies intent"""
+        theater = self.catalog.match_theater(message)
+        when = parse_when(message)
+        if theater or when.day or when.after:
+            return self.whats_playing(theater, when)
+
+        movies = self.catalog.movies()
+        schedule = self.catalog.schedule()
+        now = datetime.now()
+
+        response = "🎬 **NOW SHOWING**\n\n"
+
+        for movie in movies:
+            response += f"**{movie.get('title', 'Unknown Movie')}**\n"
+            response += f"Genre: {movie.get('genre', 'N/A')} | "
+            response += f"Rating: {movie.get('rating', 'N/A')} | "
+            response += f"Duration: {movie.get('duration', 'N/A')}\n"
+            response += f"⭐ IMDb: {movie.get('imdb', 'N/A')}/10\n"
+            response += f"{movie.get('description', 'No description available.')}\n"
+            # The next few screenings anywhere, from now on
+            upcoming = schedule.starting(now, now + timedelta(days=2), movie_id=movie.get("id"))
+            times = []
+            for screening in upcoming:
+                label = format_showtime(screening.start)
+                if screening.start.date() != now.date():
+                    label += " tomorrow"
+                if label not in times:
+                    times.append(label)
+            response += f"Showtimes: {', '.join(times[:3]) or 'N/A'}\n\n"
+
+        response += "Which movie would you like to book?"
+
+        return response
+
+    def whats_playing(self, theater, when):
+        """Answer "what's playing at <theater> after <time> <day>" from the schedule"""
+        now = datetime.now()
+        day = when.day or now.date()
+        after = when.after
+        if day == now.date() and (after is None or after < now.time()):
+            after = now.time()
+
+        theater_id = theater.get("id") if theater else None
+        screenings = self.catalog.schedule().on_day(day, theater_id=theater_id, after=after)
+        where = f" at {theater.get('name')}" if theater else ""
+        label = format_day(day)
+        if day > now.date() + timedelta(days=1):
+            label = f"on {label}"
+        if when.after:
+            label += f" after {format_showtime(when.after)}"
+        if not screenings:
+            return f"Nothing is scheduled{where} {label}. 😞 Try another day or theater."
+
+        response = f"🎬 **Playing{where} {label}**\n\n"
+        by_movie = {}
+        for screening in screenings:
+            by_movie.setdefault((screening.movie_id, screening.theater_id), []).append(screening)
+        for (movie_id, theater_id), shows in by_movie.items():
+            movie = self.catalog.get_movie(movie_id) or {}
+            times = ", ".join(format_showtime(s.start) for s in shows)
+            if theater:
+                response += f"• **{movie.get('title', 'Unknown Movie')}**: {times}\n"
+            else:
+                name = (self.catalog.get_theater(theater_id) or {}).get("name", "Unknown Theater")
+                response += f"• **{movie.get('title', 'Unknown Movie')}** at {name}: {times}\n"
+        response += "\nWhich one would you like to book?"
+        return response
+
+    def handle_price_query(self, session, message):
+        """Handle price query intent"""
+        response = "💰 **TICKET PRICES**\n\n"
+        response += f"Standard Ticket: ${self.ticket_price:.2f}\n"
+        response += f"VIP Ticket: ${self.ticket_price + self.vip_upcharge:.2f}\n"
+        response += f"Tax: {self.tax_rate * 100}%\n\n"
+        response += "Would you like to book tickets?"
+
+        return response
+
+    def handle_recommendation(self, session, message):
+        """Handle recommendation intent"""
+        # Movies booked by people who booked what this user recently booked,
+        # once the offline job has written a table and only for a signed-in user
+        watched, liked = [], []
+        if session.username != "guest" and self.neighbors.loaded():
+            recent, _ = self.storage.recent_bookings_for_user(session.username, limit=5)
+            watched = [b.get("movie") for b in recent if b.get("movie") and b.get("status") != "cancelled"]
+            liked = [movie for movie in (self.catalog.find_movie(title)
+                                         for title, _ in self.neighbors.similar(watched, 3, exclude=watched))
+                     if movie]
+        # Then the best fits for the learned preferences
+        recommender = self.catalog.recommender()
+        movies = liked + recommender.recommend(
+            session.preferences, 3 - len(liked), exclude=watched + [movie.get("title", "") for movie in liked])
+        movies = movies or recommender.recommend(session.preferences, 3)  # seen them all
+
+        response = "⭐ **RECOMMENDATIONS**\n\n"
+        if liked:
+            response += f"Moviegoers who booked **{watched[0]}** also booked:\n\n"
+        elif session.preferences.get("genre"):
+            response += f"Picked for a {session.preferences['genre']} fan:\n\n"
+
+        for i, movie in enumerate(movies, 1):
+            response += f"{i}. **{movie.get('title', 'Unknown Movie')}**\n"
+            response += f"   Genre: {movie.get('genre', 'N/A')}\n"
+            response += f"   Rating: {movie.get('rating', 'N/A')} | "
+            response += f"IMDb: {movie.get('imdb', 'N/A')}/10\n"
+            response += f"   {movie.get('description', '')[:100]}...\n\n"
+
+        response += "Which one interests you?"
+
+        return response
+
+    def handle_help(self, session, message):
+        """Handle help intent"""
+        response = "🤖 **HOW I CAN HELP**\n\n"
+        response += "**Booking Tickets:**\n"
+        response += "• 'Book tickets for [movie name]'\n"
+        response += "• Use the quick booking form on the right\n"
+        response += "• 'Auto-book' for AI suggestions\n\n"
+
+        response += "**Viewing Information:**\n"
+        response += "• 'Show movies'\n"
+        response += "• 'View my bookings'\n"
+        response += "• 'Get recommendations'\n\n"
+
+        response += "**Managing Bookings:**\n"
+        response += "• 'Cancel booking [ID]'\n"
+        response += "• 'Check booking status'\n\n"
+
+        response += "**Other Commands:**\n"
+        response += "• 'Help' - Show this message\n"
+        response += "• 'Price' - Check ticket prices\n"
+        response += "• 'Hello' - Greet me\n\n"
+
+        response += "What would you like to do?"
+
+        return response
+
+
+if __name__ == "__main__":
+    # Chat with the engine in a terminal, no display needed
+    engine = ChatEngine()
+    print(engine.greeting())
+    while True:
+        try:
+            text = input("> ").strip()
+        except EOFError:
+            break
+        if text:
+            print(engine.respond("console", text).text)
@@ -0,0 +1,42 @@
+import threading
+from collections import defaultdict
+
+# Topics published by ChatEngine
+BOOKING_FLOW = "booking_flow"  # (session_id, booking flow copy) after a turn changed it
+CATALOG = "catalog"            # (catalog,) after movies.json was reloaded
+SUGGESTION = "suggestion"      # (session_id, text) when a fresh suggestion is due
+HOLD_EXPIRED = "hold_expired"  # (session_id, text) after a session's seat hold timed out
+
+
+class EventBus:
+    """Thread-safe publish/subscribe hub
+
+    Callbacks run on the publishing thread, or are handed to the dispatch
+    function given at subscribe time, e.g. a Tk root's after(0, ...) so a GUI
+    only touches widgets from its own thread. Nothing runs unless something is
+    published, so an idle bus costs nothing.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)  # topic -> [(callback, dispatch)]
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, callback, dispatch=None):
+        """Call callback(*args) for every publish(topic, *args)"""
+        with self._lock:
+            self._subscribers[topic].append((callback, dispatch))
+
+    def unsubscribe(self, topic, callback):
+        """Stop delivering topic to callback"""
+        with self._lock:
+            self._subscribers[topic] = [s for s in self._subscribers[topic] if s[0] != callback]
+
+    def publish(self, topic, *args):
+        """Deliver an event to every subscriber of topic"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for callback, dispatch in subscribers:
+            if dispatch is None:
+                callback(*args)
+            else:
+                dispatch(lambda callback=callback: callback(*args))
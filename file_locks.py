@@ -0,0 +1,241 @@
+import copy
+import json
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover the threads of this process
+    fcntl = None
+
+# Read once: os.umask can only be read by setting it, which races other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class FileLock:
+    """Reader/writer lock shared by every thread and process using a file
+
+    Backed by fcntl.flock on path + ".lock". Each thread locks through its own
+    descriptor, so threads exclude each other just as processes do. A thread
+    already holding the lock can take it again (shared inside exclusive is
+    fine), but cannot upgrade shared to exclusive.
+    """
+
+    def __init__(self, path):
+        self.lock_file = path + ".lock"
+        self._local = threading.local()
+        self._fallback = threading.RLock()
+
+    def _state(self):
+        state = self._local
+        if not hasattr(state, "depth"):
+            state.depth = 0
+            state.mode = None
+            state.file = open(self.lock_file, 'a+b') if fcntl else None
+        return state
+
+    @contextmanager
+    def _locked(self, mode):
+        state = self._state()
+        if state.depth:
+            if mode == "exclusive" and state.mode == "shared":
+                raise RuntimeError(f"cannot upgrade a shared lock on {self.lock_file}")
+        elif fcntl:
+            fcntl.flock(state.file.fileno(), fcntl.LOCK_EX if mode == "exclusive" else fcntl.LOCK_SH)
+            state.mode = mode
+        else:
+            self._fallback.acquire()
+            state.mode = mode
+        state.depth += 1
+        try:
+            yield
+        finally:
+            state.depth -= 1
+            if not state.depth:
+                state.mode = None
+                if fcntl:
+                    fcntl.flock(state.file.fileno(), fcntl.LOCK_UN)
+                else:
+                    self._fallback.release()
+
+    def shared(self):
+        """Context manager holding the lock for reading"""
+        return self._locked("shared")
+
+    def exclusive(self):
+        """Context manager holding the lock for writing"""
+        return self._locked("exclusive")
+
+
+def fsync_dir(path):
+    """Fsync the directory holding path so a rename survives a crash"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def file_mode(path):
+    """Return the permission bits for a file replacing path
+
+    Those of path itself, so other users sharing the data files keep their
+    access, or 0666 less the umask for a new file, as open() would give.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_json(path, data, indent=4):
+    """Write JSON to a temp file and rename it over path
+
+    Readers see either the old file or the new one, never a partial write.
+    The new file keeps path's permissions (mkstemp would leave it 0600).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_file = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        os.chmod(temp_file, file_mode(path))
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+    except BaseException:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+    fsync_dir(path)
+
+
+class JSONDocument:
+    """A JSON file that several processes read and update
+
+    read() parses the file only when it changed on disk (by inode, size and
+    mtime). update(change) applies change(data) to a copy made outside the
+    lock, then writes it only if the document's "version" is still the one it
+    was read at, retrying otherwise, so concurrent updates never overwrite
+    each other.
+    """
+
+    retries = 3
+
+    def __init__(self, path, default):
+        self.path = path
+        self.default = default
+        self.lock = FileLock(path)
+        self._cache = (None, copy.deepcopy(default))  # (stat key, data)
+        self._cache_lock = threading.Lock()
+
+    def _stat_key(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def read(self):
+        """Return the current data; treat it as read-only"""
+        key = self._stat_key()
+        with self._cache_lock:
+            if key is not None and key == self._cache[0]:
+                return self._cache[1]
+        with self.lock.shared():
+            key = self._stat_key()
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = copy.deepcopy(self.default)
+        with self._cache_lock:
+            self._cache = (key, data)
+        return data
+
+    def update(self, change):
+        """Apply change(data) in place and save it, return the saved data"""
+        for attempt in range(self.retries + 1):
+            current = self.read()
+            data = copy.deepcopy(current)
+            version = data.get("version", 0)
+            if attempt < self.retries:
+                change(data)
+            with self.lock.exclusive():
+                if attempt == self.retries:
+                    # Still contended: finish pessimistically under the lock
+                    data = copy.deepcopy(self.read())
+                    version = data.get("version", 0)
+                    change(data)
+                elif self.read().get("version", 0) != version:
+                    continue
+                data["version"] = version + 1
+                atomic_write_json(self.path, data)
+                with self._cache_lock:
+                    self._cache = (self._stat_key(), data)
+            return data
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    import shutil
+    import sys
+    import time
+
+    # Several chatbot processes booking and learning preferences against the same files
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_process = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+
+    def worker(directory, n):
+        from booking_ids import BookingIds
+        from booking_journal import BookingJournal
+        from storage import JSONStorage
+
+        os.chdir(directory)
+        # A low threshold makes the processes compact under each other
+        journal = BookingJournal("bookings.json", compact_threshold=100)
+        storage = JSONStorage()
+        ids = BookingIds(directory=directory)  # each process leases its own node
+        for i in range(per_process):
+            journal.add({"booking_id": ids.new_id(), "username": f"user{n}", "tickets": 1})
+            if i % 10 == 0:
+                storage.save_preferences(f"user{n}-{i}", {"genre": "Sci-Fi"})
+        journal.close()
+
+    directory = tempfile.mkdtemp()
+    try:
+        context = multiprocessing.get_context("fork" if fcntl else "spawn")
+        workers = [context.Process(target=worker, args=(directory, n)) for n in range(processes)]
+        started = time.perf_counter()
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+            assert process.exitcode == 0, "worker failed"
+        elapsed = time.perf_counter() - started
+
+        from booking_journal import BookingJournal
+        journal = BookingJournal(os.path.join(directory, "bookings.json"))
+        bookings = journal.all()
+        journal.close()
+        ids = [b["booking_id"] for b in bookings]
+        expected = processes * per_process
+        assert len(ids) == len(set(ids)) == expected, f"{len(set(ids))} of {expected} bookings survived"
+        preferences = JSONDocument(os.path.join(directory, "preferences.json"), {}).read()
+        saved = len(preferences.get("preferences", {}))
+        assert saved == processes * len(range(0, per_process, 10)), f"only {saved} preference saves survived"
+        print(f"{processes} processes made {expected} bookings and {saved} preference saves "
+              f"in {elapsed:.2f} s; none lost")
+    finally:
+        shutil.rmtree(directory)
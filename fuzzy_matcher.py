@@ -0,0 +1,189 @@
+from collections import Counter, defaultdict
+
+from title_matcher import tokenize
+
+GRAM = 3
+
+# Leading words users tend to leave off a title
+ARTICLES = {"a", "an", "the"}
+
+
+def trigrams(text):
+    """Return the set of character trigrams of text, padded with one space each side"""
+    padded = f" {text} "
+    return {padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)}
+
+
+def edit_distance(a, b, limit):
+    """Damerau (optimal string alignment) distance between a and b, or limit + 1 if larger
+
+    Rows are abandoned as soon as every cell exceeds limit, so far-off pairs
+    cost a few rows rather than the full len(a) * len(b) table.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Shared ends never change the distance, and typos are usually one spot
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    a, b = a[start:], b[start:]
+    while a and b and a[-1] == b[-1]:
+        a, b = a[:-1], b[:-1]
+    if not a or not b:
+        return len(a) + len(b)
+    previous = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + cost)
+            if previous is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous, row = row, current
+    return row[-1] if row[-1] <= limit else limit + 1
+
+
+def allowed_edits(title, max_distance):
+    """How many typos a title of this length tolerates"""
+    if len(title) < 4:
+        return 0
+    if len(title) <= 8:
+        return min(1, max_distance)
+    return max_distance
+
+
+class FuzzyMatcher:
+    """Finds misspelled catalog titles in a message without scanning every title
+
+    Titles are indexed by character trigram. A title within k edits of some
+    part of the message shares at least len(grams) - 3k trigrams with the
+    message, so titles below that count are pruned before any edit distance is
+    computed. Survivors are compared against message windows of about the
+    title's word count with a bounded Damerau-Levenshtein check. A title that
+    starts with an article is also indexed without it. Like TitleMatcher, a
+    matcher is built once and only read after that.
+    """
+
+    def __init__(self, items=(), max_distance=2):
+        self.max_distance = max_distance
+        self._names = {}                   # key -> name
+        self._entries = {}                 # key -> entry ids, one per spelling
+        self._postings = defaultdict(set)  # trigram -> entry ids
+        # Per entry id, in plain lists so the hot filter loop indexes instead of hashing
+        self._keys = []
+        self._forms = []
+        self._edits = []                   # edits allowed
+        self._minimum = []                 # trigrams it must share with a message
+        for key, name in dict(items).items():
+            self.add(key, name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, key, name):
+        """Index a title under a key not used yet"""
+        tokens = tokenize(name)
+        if not tokens:
+            return
+        forms = [" ".join(tokens)]
+        if len(tokens) > 1 and tokens[0] in ARTICLES:
+            forms.append(" ".join(tokens[1:]))
+
+        self._names[key] = name
+        entries = self._entries[key] = []
+        for form in forms:
+            grams = trigrams(form)
+            edits = allowed_edits(form, self.max_distance)
+            entry = len(self._keys)
+            self._keys.append(key)
+            self._forms.append(form)
+            self._edits.append(edits)
+            self._minimum.append(len(grams) - GRAM * edits)
+            entries.append(entry)
+            for gram in grams:
+                self._postings[gram].add(entry)
+
+    def title(self, key):
+        """Return the normalized title stored under key"""
+        return self._forms[self._entries[key][0]]
+
+    def candidates(self, text):
+        """Return the entry ids of titles that pass the trigram count filter"""
+        shared = Counter()
+        for gram in trigrams(text):
+            entries = self._postings.get(gram)
+            if entries:
+                shared.update(entries)
+
+        minimum = self._minimum
+        return [entry for entry, count in shared.items() if count >= minimum[entry]]
+
+    def find(self, text):
+        """Return (key, distance) for the title covering most of text, or None
+
+        Like TitleMatcher.find the longest title wins, so a typo in a long title is
+        not beaten by a shorter title spelled exactly inside it.
+        """
+        tokens = tokenize(text)
+        windows = {}  # word count -> message windows of that many words
+        best = None
+        for entry in self.candidates(" ".join(tokens)):
+            form = self._forms[entry]
+            edits = self._edits[entry]
+            width = form.count(" ") + 1
+            for size in (width - 1, width, width + 1):
+                if size not in windows:
+                    windows[size] = [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)] if size else []
+                for window in windows[size]:
+                    if abs(len(window) - len(form)) > edits:
+                        continue
+                    distance = edit_distance(form, window, edits)
+                    if distance > edits:
+                        continue
+                    rank = (distance - len(form), distance)
+                    if best is None or rank < best[0]:
+                        best = (rank, self._keys[entry])
+        return (best[1], best[0][1]) if best else None
+
+if __name__ == "__main__":
+    import random
+    import string
+    import timeit
+
+    random.seed(1)
+    words = ["".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9))) for _ in range(8000)]
+    words += ["the", "of", "and", "night", "love", "dark", "return"]
+    titles = {i: " ".join(random.choices(words, k=random.randint(1, 4))) for i in range(50000)}
+
+    started = timeit.default_timer()
+    matcher = FuzzyMatcher(titles)
+    print(f"index {len(titles)} titles {(timeit.default_timer() - started) * 1e3:8.1f} ms")
+
+    def typo(title):
+        i = random.randrange(len(title) - 1)
+        return title[:i] + title[i + 1] + title[i] + title[i + 2:]
+
+    targets = [titles[i] for i in random.sample(range(len(titles)), 50) if len(titles[i]) > 8]
+    messages = [f"book two tickets for {typo(title)} tomorrow night" for title in targets]
+    hits = sum(matcher.title(found[0]) == title
+               for title, found in zip(targets, map(matcher.find, messages)) if found)
+    print(f"recovered {hits}/{len(messages)} transposed titles")
+
+    def scan(message):
+        tokens = tokenize(message)
+        best = None
+        for title in titles.values():
+            width = title.count(" ") + 1
+            for start in range(len(tokens) - width + 1):
+                distance = edit_distance(title, " ".join(tokens[start:start + width]), 2)
+                if distance <= 2 and (best is None or distance < best[0]):
+                    best = (distance, title)
+        return best
+
+    for name, func, rounds in (("full scan", scan, 1), ("trigram index", matcher.find, 20)):
+        elapsed = timeit.timeit(lambda: [func(m) for m in messages[:5]], number=rounds)
+        print(f"{name:13s} {elapsed / (rounds * 5) * 1e3:10.3f} ms/message")
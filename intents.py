@@ -0,0 +1,156 @@
+import re
+from collections import namedtuple
+
+IntentMatch = namedtuple("IntentMatch", ["intent", "spans"])
+
+
+def trie_pattern(words):
+    """Build a regex matching any of words, factored by shared prefixes
+
+    A flat a|b|c alternation makes the regex engine try every word at every
+    position; the trie form rejects a position after one character. Greedy
+    optional groups make it prefer the longest word at a position.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if "" in node else "")
+
+    return build(trie)
+
+
+class IntentClassifier:
+    """Keyword intent matcher compiled into a single regular expression
+
+    intents is an ordered list of (intent, keywords). classify() makes one pass
+    over the message and returns the first intent in table order that has a
+    keyword anywhere in it, the same answer as an if/elif chain of
+    any(word in message ...) checks.
+    """
+
+    def __init__(self, intents):
+        self.intents = [name for name, _ in intents]
+        self._priority = {}
+        keyword_intents = {}
+        for rank, (name, keywords) in enumerate(intents):
+            self._priority.setdefault(name, rank)
+            for keyword in keywords:
+                keyword_intents.setdefault(keyword.lower(), set()).add(name)
+
+        # The regex reports the longest keyword at a position and then skips past
+        # it, so each keyword also carries the intents of every keyword found inside
+        # it (as (offset, length) spans), plus the first offset where a keyword that
+        # only partly overlaps it could begin, which is where the scan resumes.
+        self._implied = {}
+        self._resume = {}
+        for keyword in keyword_intents:
+            implied = {}
+            for other, names in keyword_intents.items():
+                offset = keyword.find(other)
+                if offset != -1:
+                    for name in names:
+                        implied.setdefault(name, (offset, len(other)))
+            self._implied[keyword] = implied
+
+            resume = len(keyword)
+            for offset in range(1, len(keyword)):
+                rest = keyword[offset:]
+                if any(len(other) > len(rest) and other.startswith(rest) for other in keyword_intents):
+                    resume = offset
+                    break
+            self._resume[keyword] = resume
+
+        self._pattern = re.compile(trie_pattern(keyword_intents))
+
+    def classify(self, message):
+        """Return IntentMatch(intent, spans) for the best intent, or None"""
+        text = message.lower()
+        search = self._pattern.search
+        best = None
+        best_rank = len(self.intents)
+        hits = []
+        pos = 0
+        while True:
+            match = search(text, pos)
+            if match is None:
+                break
+            keyword = match.group()
+            start = match.start()
+            implied = self._implied[keyword]
+            hits.append((start, implied))
+            for name in implied:
+                rank = self._priority[name]
+                if rank < best_rank:
+                    best, best_rank = name, rank
+            pos = start + self._resume[keyword]
+
+        if best is None:
+            return None
+        spans = []
+        for start, implied in hits:
+            if best in implied:
+                offset, length = implied[best]
+                span = (start + offset, start + offset + length)
+                if span not in spans:
+                    spans.append(span)
+        return IntentMatch(best, spans)
+
+
+if __name__ == "__main__":
+    import random
+    import string
+    import timeit
+
+    from engine import ChatEngine
+
+    messages = [
+        "hello there",
+        "I want to book 2 tickets for cosmic dreams tomorrow",
+        "what movies are playing tonight",
+        "please cancel booking BK12345",
+        "how much does a vip seat cost",
+        "can you recommend something funny",
+        "tomorrow at 6:30 pm works for me, at the grand arena if possible",
+        "confirm",
+    ]
+
+    def make_cascade(table):
+        def cascade(message):
+            message_lower = message.lower()
+            for name, keywords in table:
+                if any(word in message_lower for word in keywords):
+                    return name
+            return None
+        return cascade
+
+    # The real table, then the same table with synthetic intents added
+    random.seed(1)
+    tables = [("chatbot table", ChatEngine.INTENTS)]
+    for extra in (50, 500):
+        synthetic = [
+            (f"intent_{i}", ["".join(random.choices(string.ascii_lowercase, k=9)) for _ in range(4)])
+            for i in range(extra)
+        ]
+        tables.append((f"+{extra} intents", ChatEngine.INTENTS + synthetic))
+
+    rounds = 5000
+    for label, table in tables:
+        cascade = make_cascade(table)
+        classifier = IntentClassifier(table)
+        for message in messages:
+            match = classifier.classify(message)
+            assert (match.intent if match else None) == cascade(message), message
+
+        for name, func in (("cascade", cascade), ("classifier", classifier.classify)):
+            elapsed = timeit.timeit(lambda: [func(m) for m in messages], number=rounds)
+            print(f"{label:14s} {name:10s} {elapsed / (rounds * len(messages)) * 1e6:8.2f} us/message")
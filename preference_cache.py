@@ -0,0 +1,165 @@
+import atexit
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class PreferenceCache:
+    """Write-behind cache of user preferences in front of a storage
+
+    load() serves profiles from a bounded LRU, reading the storage only on a
+    miss. save() just updates the cache and marks the user dirty; a background
+    thread writes every dirty profile in one batch at most once per
+    flush_interval seconds, and close() (also run at exit) writes what is
+    left. Dirty profiles are never evicted before they are written.
+    """
+
+    def __init__(self, storage, flush_interval=2.0, capacity=1024):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+
+        self._profiles = OrderedDict()  # username -> preferences or None, least recent first
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # one batch write at a time
+        self._closed = False
+        self.loads = self.writes = 0  # storage calls made
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="preference-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def load(self, username):
+        """Return a copy of a user's preferences, or None if they have none"""
+        with self._lock:
+            if username in self._profiles:
+                self._profiles.move_to_end(username)
+                return copy.deepcopy(self._profiles[username])
+        try:
+            preferences = self.storage.load_preferences(username)
+        except Exception:
+            return None
+        with self._lock:
+            self.loads += 1
+            # A save may have raced the load; it is newer
+            preferences = self._profiles.setdefault(username, preferences)
+            self._profiles.move_to_end(username)
+            self._evict()
+            return copy.deepcopy(preferences)
+
+    def save(self, username, preferences):
+        """Remember a user's preferences and write them soon"""
+        with self._lock:
+            self._profiles[username] = copy.deepcopy(preferences)
+            self._profiles.move_to_end(username)
+            if not self._dirty:
+                self._cond.notify()
+            self._dirty.add(username)
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used clean profiles past capacity; caller holds the lock"""
+        if len(self._profiles) <= self.capacity:
+            return
+        for username in list(self._profiles):
+            if len(self._profiles) <= self.capacity:
+                break
+            if username not in self._dirty:
+                del self._profiles[username]
+
+    def flush(self):
+        """Write every dirty profile now"""
+        with self._flush_lock:
+            with self._lock:
+                batch = {username: copy.deepcopy(self._profiles[username]) for username in self._dirty}
+                self._dirty.clear()
+            if not batch:
+                return
+            try:
+                self.storage.save_many_preferences(batch)
+            except Exception:
+                with self._lock:
+                    # Try again next round, keeping any newer save
+                    for username, preferences in batch.items():
+                        self._profiles.setdefault(username, preferences)
+                    self._dirty.update(batch)
+                raise
+            with self._lock:
+                self.writes += 1
+                self._evict()
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # Coalesce every save made during the interval into one write
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def close(self):
+        """Write what is left and stop the flush thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self.flush()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_preference_cache(storage):
+    """Return the shared preference cache for a storage"""
+    with _caches_lock:
+        cache = _caches.get(id(storage))
+        if cache is None:
+            cache = _caches[id(storage)] = PreferenceCache(storage)
+    return cache
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import tempfile
+
+    from storage import JSONStorage
+
+    # A busy evening: 200 users chatting, a few messages in each change a preference
+    directory = tempfile.mkdtemp()
+    storage = JSONStorage(*(os.path.join(directory, name) for name in
+                            ("bookings.json", "users.json", "preferences.json")))
+    rng = random.Random(3)
+    genres = ["Action", "Comedy", "Drama", "Sci-fi", "Thriller"]
+    messages = 3000
+
+    def chat(load, save):
+        changes = 0
+        started = time.perf_counter()
+        for n in range(messages):
+            username = f"user{rng.randrange(200)}"
+            preferences = load(username) or {"genre": None}
+            if rng.random() < 0.2:
+                preferences["genre"] = rng.choice(genres)
+                save(username, preferences)
+                changes += 1
+        return time.perf_counter() - started, changes
+
+    direct, changes = chat(storage.load_preferences, storage.save_preferences)
+    cache = PreferenceCache(storage, flush_interval=0.05)
+    cached, _ = chat(cache.load, cache.save)
+    cache.close()
+    print(f"{messages} messages from 200 users, {changes} changing a preference")
+    print(f"  storage directly: {direct:.2f} s, {(messages + changes) / messages:.2f} storage calls per message")
+    print(f"  write-behind cache: {cached:.2f} s, {cache.loads} loads and {cache.writes} batched writes "
+          f"({(cache.loads + cache.writes) / messages:.3f} storage calls per message)")
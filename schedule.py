@@ -0,0 +1,233 @@
+import re
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+from temporal import parse_when
+
+# One screening: movie and theater ids, the screen (auditorium) number, and
+# start and end datetimes
+Screening = namedtuple("Screening", ["movie_id", "theater_id", "screen", "start", "end"])
+
+EPOCH = datetime(2024, 1, 1)  # screenings are stored as minutes since EPOCH
+DEFAULT_DURATION = 120
+
+
+def _minutes(moment):
+    return (moment - EPOCH) // timedelta(minutes=1)
+
+
+def _moment(minutes):
+    return EPOCH + timedelta(minutes=minutes)
+
+
+def format_showtime(moment):
+    """Format a time or datetime the way the catalog writes showtimes, e.g. "6:30 PM" """
+    return f"{moment.hour % 12 or 12}:{moment.minute:02d} {'AM' if moment.hour < 12 else 'PM'}"
+
+
+def parse_duration(text):
+    """Parse a duration like "2h 15m" into minutes"""
+    match = re.match(r'\s*(?:(\d+)\s*h)?\s*(?:(\d+)\s*m)?', text or "")
+    minutes = int(match.group(1) or 0) * 60 + int(match.group(2) or 0)
+    return minutes or DEFAULT_DURATION
+
+
+class Schedule:
+    """Every screening of a season, in start order, held in flat arrays
+
+    Screenings are five parallel int arrays (start and end in minutes since
+    EPOCH, movie, theater, screen) sorted by start, plus a per-movie and a
+    per-theater posting list of positions with their starts. A query bisects
+    the smallest matching list for its start and reads just the screenings it
+    returns. Screenings running at a moment are found by searching starts back
+    as far as the longest screening, as an interval tree would.
+    """
+
+    def __init__(self, screenings=(), today=None):
+        self.today = today  # the day open-ended rules were expanded from
+        rows = sorted(screenings)  # (start, end, movie_id, theater_id, screen) in minutes
+        self._start = array('i', (row[0] for row in rows))
+        self._end = array('i', (row[1] for row in rows))
+        self._movie = array('i', (row[2] for row in rows))
+        self._theater = array('i', (row[3] for row in rows))
+        self._screen = array('h', (row[4] for row in rows))
+        self._longest = max((row[1] - row[0] for row in rows), default=0)
+        self._by_movie = self._postings(self._movie)
+        self._by_theater = self._postings(self._theater)
+
+    def _postings(self, keys):
+        """Return key -> (starts, positions), both in start order"""
+        postings = {}
+        for position, key in enumerate(keys):
+            if key not in postings:
+                postings[key] = (array('i'), array('i'))
+            starts, positions = postings[key]
+            starts.append(self._start[position])
+            positions.append(position)
+        return postings
+
+    def __len__(self):
+        return len(self._start)
+
+    def _screening(self, position):
+        return Screening(self._movie[position], self._theater[position], self._screen[position],
+                         _moment(self._start[position]), _moment(self._end[position]))
+
+    def _positions(self, low, high, movie_id, theater_id):
+        """Yield positions of screenings starting in [low, high) minutes"""
+        candidates = []
+        if movie_id is not None:
+            candidates.append(self._by_movie.get(movie_id, (array('i'), array('i'))))
+        if theater_id is not None:
+            candidates.append(self._by_theater.get(theater_id, (array('i'), array('i'))))
+        if candidates:
+            starts, positions = min(candidates, key=lambda posting: len(posting[0]))
+        else:
+            starts, positions = self._start, None
+        for i in range(bisect_left(starts, low), bisect_left(starts, high)):
+            position = positions[i] if positions is not None else i
+            if movie_id is not None and self._movie[position] != movie_id:
+                continue
+            if theater_id is not None and self._theater[position] != theater_id:
+                continue
+            yield position
+
+    def starting(self, start, end, movie_id=None, theater_id=None):
+        """Return screenings starting in [start, end), in start order"""
+        positions = self._positions(_minutes(start), _minutes(end), movie_id, theater_id)
+        return [self._screening(p) for p in positions]
+
+    def playing_at(self, moment, movie_id=None, theater_id=None):
+        """Return screenings running at moment"""
+        minute = _minutes(moment)
+        return [self._screening(p)
+                for p in self._positions(minute - self._longest, minute + 1, movie_id, theater_id)
+                if self._end[p] > minute]
+
+    def on_day(self, day, movie_id=None, theater_id=None, after=None):
+        """Return a day's screenings, only those starting at or after the time after if given"""
+        start = datetime.combine(day, after or time())
+        return self.starting(start, datetime.combine(day + timedelta(days=1), time()), movie_id, theater_id)
+
+    def showtimes(self, day, movie_id=None, theater_id=None):
+        """Return a day's distinct showtimes as "6:30 PM" strings, earliest first"""
+        times = sorted({screening.start.time() for screening in self.on_day(day, movie_id, theater_id)})
+        return [format_showtime(t) for t in times]
+
+    def theaters_showing(self, movie_id, start):
+        """Return ids of theaters starting movie_id at the datetime start"""
+        return sorted({screening.theater_id
+                       for screening in self.starting(start, start + timedelta(minutes=1), movie_id)})
+
+
+def default_rules(data):
+    """Rules for a catalog without a "schedule"
+
+    Every movie plays daily in every theater, at its own showtimes if it has
+    them and at the catalog's global ones otherwise.
+    """
+    rules = []
+    for screen, movie in enumerate(data.get("movies", []), 1):
+        times = movie.get("showtimes") or data.get("showtimes", [])
+        for theater in data.get("theaters", []):
+            rules.append({"movie": movie.get("id"), "theater": theater.get("id"), "screen": screen, "times": times})
+    return rules
+
+
+def build_schedule(data, today=None, horizon_days=28):
+    """Expand a catalog's schedule rules into a Schedule
+
+    Each rule is {"movie", "theater", "screen", "times"} with optional "from"
+    and "to" dates (inclusive, "YYYY-MM-DD") and "days" (weekday numbers,
+    Monday is 0). A rule without "to" runs for horizon_days from today.
+    """
+    today = today or date.today()
+    durations = {movie.get("id"): parse_duration(movie.get("duration")) for movie in data.get("movies", [])}
+    rules = data.get("schedule")
+    if rules is None:
+        rules = default_rules(data)
+
+    screenings = []
+    for rule in rules:
+        first = parse_when(rule["from"]).day if rule.get("from") else today
+        last = parse_when(rule["to"]).day if rule.get("to") else today + timedelta(days=horizon_days - 1)
+        if first is None or last is None:
+            continue
+        times = [t for t in (parse_when(text).time for text in rule.get("times", [])) if t is not None]
+        days = set(rule.get("days", range(7)))
+        movie_id, theater_id, screen = rule.get("movie"), rule.get("theater"), rule.get("screen", 1)
+        length = durations.get(movie_id, DEFAULT_DURATION)
+        day = first
+        while day <= last:
+            if day.weekday() in days:
+                base = _minutes(datetime.combine(day, time()))
+                for t in times:
+                    start = base + t.hour * 60 + t.minute
+                    screenings.append((start, start + length, movie_id, theater_id, screen))
+            day += timedelta(days=1)
+    return Schedule(screenings, today)
+
+
+def synthetic_catalog(movies=40, theaters=50, screens=8, days=120, first_day=None, seed=0):
+    """Return a movies.json-style catalog with a season of schedule rules, for benchmarks"""
+    import random
+
+    rng = random.Random(seed)
+    first_day = first_day or date.today()
+    catalog = {
+        "movies": [{"id": m, "title": f"Movie {m}", "genre": rng.choice(["Action", "Comedy", "Drama", "Sci-Fi"]),
+                    "duration": f"{rng.randint(1, 2)}h {rng.choice([0, 15, 30, 45])}m"}
+                   for m in range(1, movies + 1)],
+        "theaters": [{"id": t, "name": f"Theater {t}", "location": f"District {t % 12}"}
+                     for t in range(1, theaters + 1)],
+        "schedule": [],
+    }
+    # Each screen shows one movie per two-week run, five times a day
+    for theater in range(1, theaters + 1):
+        for screen in range(1, screens + 1):
+            for run in range(0, days, 14):
+                catalog["schedule"].append({
+                    "movie": rng.randint(1, movies), "theater": theater, "screen": screen,
+                    "from": (first_day + timedelta(days=run)).isoformat(),
+                    "to": (first_day + timedelta(days=min(run + 13, days - 1))).isoformat(),
+                    "times": ["11:00 AM", "2:00 PM", "5:00 PM", "8:00 PM", "10:45 PM"],
+                })
+    return catalog
+
+
+if __name__ == "__main__":
+    import sys
+    import timeit
+
+    # A season for a regional chain: 50 theaters x 8 screens x 120 days
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 120
+    first_day = date(2026, 9, 1)
+    catalog = synthetic_catalog(days=days, first_day=first_day)
+    started = datetime.now()
+    schedule = build_schedule(catalog, today=first_day)
+    built = (datetime.now() - started).total_seconds()
+    print(f"{len(schedule):,} screenings built in {built:.2f} s")
+
+    saturday = first_day + timedelta(days=(5 - first_day.weekday()) % 7 + 63)
+    evening = time(18, 0)
+    screenings = [schedule._screening(p) for p in range(len(schedule))]
+
+    def scan():
+        return [s for s in screenings if s.theater_id == 7 and s.start.date() == saturday
+                and s.start.time() >= evening]
+
+    def indexed():
+        return schedule.on_day(saturday, theater_id=7, after=evening)
+
+    assert scan() == indexed()
+    runs = 200
+    scan_time = timeit.timeit(scan, number=5) / 5
+    index_time = timeit.timeit(indexed, number=runs) / runs
+    moment = datetime.combine(saturday, time(21, 0))
+    playing_time = timeit.timeit(lambda: schedule.playing_at(moment, theater_id=7), number=runs) / runs
+    print(f"\"what's playing at Theater 7 after 6 pm Saturday\" ({len(indexed())} screenings):")
+    print(f"  scanning every screening: {scan_time * 1000:.1f} ms")
+    print(f"  sorted index: {index_time * 1e6:.1f} µs")
+    print(f"  playing at 9 pm: {playing_time * 1e6:.1f} µs")
@@ -0,0 +1,540 @@
+import itertools
+import re
+import string
+import threading
+from collections import namedtuple
+from datetime import date, datetime
+from functools import lru_cache
+
+from schedule import format_showtime
+from temporal import parse_when
+from timer_wheel import TimerWheel
+
+# A show is one screening: (movie, theater, "YYYY-MM-DD", "6:30 PM"), see booking_show
+Hold = namedtuple("Hold", ["hold_id", "show", "seats"])
+
+DEFAULT_LAYOUT = (12, 20)  # rows, seats per row
+
+
+def seat_label(row, seat):
+    """Return the printed label of a seat, e.g. (0, 6) -> "A7" """
+    letters = string.ascii_uppercase
+    prefix = letters[row // 26 - 1] if row >= 26 else ""
+    return f"{prefix}{letters[row % 26]}{seat + 1}"
+
+
+def parse_seat_label(label):
+    """Inverse of seat_label"""
+    letters = label.rstrip(string.digits)
+    seat = int(label[len(letters):]) - 1
+    row = string.ascii_uppercase.index(letters[-1])
+    if len(letters) == 2:
+        row += (string.ascii_uppercase.index(letters[0]) + 1) * 26
+    return row, seat
+
+
+class ShowSeats:
+    """Seat bitmap for one show
+
+    Each row is an int whose set bits are taken seats (held or sold), so block
+    searches are a few shifts and ands over the whole row at once. available is
+    kept as a running count.
+    """
+
+    __slots__ = ("rows", "width", "available", "lock", "_taken", "_claims", "_full", "_row_order")
+
+    def __init__(self, rows, width):
+        self.rows = rows
+        self.width = width
+        self.available = rows * width
+        self.lock = threading.Lock()
+        self._taken = [0] * rows
+        self._claims = {}  # (row, seat) -> claims, for the few seats claimed more than once
+        self._full = (1 << width) - 1
+        # Middle rows are the best seats, then outwards
+        middle = (rows - 1) / 2
+        self._row_order = sorted(range(rows), key=lambda r: (abs(r - middle), r))
+
+    def _find_block(self, count):
+        """Return (row, first seat) of the best free run of count seats, or None"""
+        ideal = (self.width - count) // 2
+        for row in self._row_order:
+            free = ~self._taken[row] & self._full
+            # Bit i of starts is set when seats i .. i+count-1 are all free
+            starts = free
+            for shift in range(1, count):
+                starts &= free >> shift
+                if not starts:
+                    break
+            if not starts:
+                continue
+            # Take the start closest to the centre of the row
+            for offset in range(self.width):
+                for start in (ideal - offset, ideal + offset):
+                    if 0 <= start < self.width and starts >> start & 1:
+                        return row, start
+        return None
+
+    def take(self, count, together=False):
+        """Mark count seats taken and return them as [(row, seat)], or None if they don't fit
+
+        Seats come as one contiguous block when possible. Otherwise, unless together
+        is set, the best free seats are taken row by row. Caller holds the lock.
+        """
+        if count <= 0 or count > self.available:
+            return None
+        block = self._find_block(count) if count <= self.width else None
+        if block is not None:
+            row, start = block
+            self._taken[row] |= ((1 << count) - 1) << start
+            self.available -= count
+            return [(row, start + i) for i in range(count)]
+        if together:
+            return None
+
+        seats = []
+        for row in self._row_order:
+            free = ~self._taken[row] & self._full
+            while free and len(seats) < count:
+                bit = free & -free
+                free ^= bit
+                seats.append((row, bit.bit_length() - 1))
+            if len(seats) == count:
+                break
+        for row, seat in seats:
+            self._taken[row] |= 1 << seat
+        self.available -= count
+        return seats
+
+    def mark(self, seats):
+        """Mark specific seats taken, return False (changing nothing) if any is taken already"""
+        for row, seat in seats:
+            if self._taken[row] >> seat & 1:
+                return False
+        for row, seat in seats:
+            self._taken[row] |= 1 << seat
+        self.available -= len(seats)
+        return True
+
+    def claim(self, seats):
+        """Mark seats taken even if some already are
+
+        A seat held here and sold by another process is claimed twice, and
+        stays taken until both claims are freed.
+        """
+        for row, seat in seats:
+            if self._taken[row] >> seat & 1:
+                self._claims[row, seat] = self._claims.get((row, seat), 1) + 1
+            else:
+                self._taken[row] |= 1 << seat
+                self.available -= 1
+
+    def clear(self):
+        """Free every seat"""
+        self._taken = [0] * self.rows
+        self._claims = {}
+        self.available = self.rows * self.width
+
+    def free(self, seats):
+        """Return seats to the pool, or drop one claim on a seat claimed twice"""
+        for row, seat in seats:
+            claims = self._claims.pop((row, seat), 1)
+            if claims > 2:
+                self._claims[row, seat] = claims - 1
+            elif claims == 1 and self._taken[row] >> seat & 1:
+                self._taken[row] &= ~(1 << seat)
+                self.available += 1
+
+    def is_taken(self, row, seat):
+        return bool(self._taken[row] >> seat & 1)
+
+
+class SeatInventory:
+    """Seat availability for every show, with atomic holds
+
+    A hold takes seats out of the pool at once; commit() turns it into a sale
+    and release() puts the seats back. A hold given a ttl is released by the
+    timer wheel when it runs out, and its on_expire(hold) is called. Each show
+    has its own lock, so holds on different shows never contend for seats.
+    layout_for(theater) returns (rows, seats per row) and defaults to
+    DEFAULT_LAYOUT.
+
+    With a storage, the storage is the record of what is sold. A show's seats
+    are read from its stored bookings the first time it is used; after that,
+    before each hold, only the bookings changed since the last look
+    (storage.changes_since) are applied, so sales and cancellations by other
+    processes sharing the storage are seen without rereading anything.
+    Saving with storage.add_booking(booking, check=inventory.fits) refuses,
+    under the storage's write lock, seats another process sold in the
+    meantime. Holds themselves are per process: two processes can hold the
+    same seat, and the second to save it is refused.
+    """
+
+    def __init__(self, layout_for=None, storage=None):
+        self.layout_for = layout_for or (lambda theater: DEFAULT_LAYOUT)
+        self.storage = storage
+        self._shows = {}
+        self._shows_lock = threading.Lock()  # also serializes catching up with the storage
+        self._sold = {}    # booking id -> (show, [(row, seat)]) of sales applied to loaded shows
+        self._seen = None  # storage change sequence applied so far
+        self._holds = {}   # hold id -> Hold
+        self._expiry = {}  # hold id -> (Timer, on_expire)
+        self._ids = itertools.count(1)
+        self.timers = TimerWheel(on_expire=self._expire)
+
+    def show(self, show):
+        """Return the up to date ShowSeats for a (movie, theater, date, showtime) key"""
+        seats = self._shows.get(show)
+        if seats is not None and self.storage is None:
+            return seats
+        with self._shows_lock:
+            if self.storage is not None:
+                self._catch_up()
+            seats = self._shows.get(show)
+            if seats is None:
+                rows, width = self.layout_for(show[1])
+                seats = self._shows[show] = ShowSeats(rows, width)
+                if self.storage is not None:
+                    self._load(show, seats)
+        return seats
+
+    # Keeping up with the storage; callers hold self._shows_lock
+
+    def _catch_up(self):
+        """Apply the bookings changed in the storage since the last look"""
+        changed, self._seen = self.storage.changes_since(self._seen)
+        if changed is None:
+            # Too far behind for the change log: read every loaded show again
+            for show, seats in self._shows.items():
+                self._load(show, seats)
+            return
+        for booking in changed:
+            self._apply(booking)
+
+    def _load(self, show, seats):
+        """Rebuild a show's seats from its stored bookings and this process's holds"""
+        for booking_id in [b for b, (sold_show, _) in self._sold.items() if sold_show == show]:
+            del self._sold[booking_id]
+        with seats.lock:
+            seats.clear()
+            for hold in list(self._holds.values()):
+                if hold.show == show:
+                    seats.claim([parse_seat_label(label) for label in hold.seats])
+        for booking in self.storage.bookings_for_show(show):
+            self._apply(booking)
+
+    def _apply(self, booking):
+        """Bring a stored booking's seats up to date; applying it twice changes nothing
+
+        Older bookings carry no seat numbers; their ticket count is taken from
+        the best free seats so capacity stays right.
+        """
+        booking_id = booking.get("booking_id")
+        sold = self._sold.pop(booking_id, None)
+        if sold is not None:
+            seats = self._shows[sold[0]]
+            with seats.lock:
+                seats.free(sold[1])
+        if booking.get("status", "confirmed") != "confirmed":
+            return
+        show = booking_show(booking)
+        seats = self._shows.get(show)
+        if seats is None:
+            return  # read in full if it is ever used
+        with seats.lock:
+            if booking.get("seats"):
+                taken = [parse_seat_label(label) for label in booking["seats"]]
+                seats.claim(taken)
+            else:
+                taken = seats.take(min(int(booking.get("tickets") or 0), seats.available)) or []
+        if booking_id is not None:
+            self._sold[booking_id] = (show, taken)
+
+    def refresh(self, show):
+        """Catch up with sales and cancellations in the storage, return the show's ShowSeats"""
+        return self.show(show)
+
+    def fits(self, booking, others):
+        """True if none of booking's seats is sold in others and the show has room
+
+        others are the stored bookings for its show; meant as the check of
+        storage.add_booking.
+        """
+        sold = set()
+        count = 0
+        for other in others:
+            if other.get("status", "confirmed") != "confirmed":
+                continue
+            labels = other.get("seats") or ()
+            sold.update(labels)
+            count += len(labels) or int(other.get("tickets") or 0)
+        rows, width = self.layout_for(booking.get("theater"))
+        return sold.isdisjoint(booking.get("seats") or ()) and count + int(booking.get("tickets") or 0) <= rows * width
+
+    def available(self, show):
+        """Number of seats still free for a show"""
+        return self.show(show).available
+
+    def hold(self, show, count, together=False, ttl=None, on_expire=None):
+        """Take count seats for a show, return a Hold or None if they don't fit
+
+        With ttl (seconds) the hold is released automatically unless committed or
+        released first, and on_expire(hold) is called from the timer thread.
+        """
+        seats = self.show(show)
+        with seats.lock:
+            taken = seats.take(count, together)
+            if taken is None:
+                return None
+            hold = Hold(next(self._ids), show, [seat_label(r, s) for r, s in taken])
+            self._holds[hold.hold_id] = hold
+        if ttl is not None:
+            self._expiry[hold.hold_id] = (self.timers.schedule(ttl, hold.hold_id), on_expire)
+            self.timers.start()
+        return hold
+
+    def _take_hold(self, hold_id):
+        """Remove a hold and its expiry timer, return the Hold or None"""
+        hold = self._holds.pop(hold_id, None)
+        if hold is not None:
+            self._stop_expiry(hold_id)
+        return hold
+
+    def _stop_expiry(self, hold_id):
+        expiry = self._expiry.pop(hold_id, None)
+        if expiry is not None:
+            self.timers.cancel(expiry[0])
+
+    def keep(self, hold_id):
+        """Stop a hold from expiring, return its Hold or None if it is gone
+
+        The hold then lasts until it is committed or released, e.g. while its
+        booking is being saved.
+        """
+        self._stop_expiry(hold_id)
+        return self._holds.get(hold_id)
+
+    def release(self, hold_id):
+        """Put a hold's seats back, return False if the hold is gone"""
+        hold = self._holds.get(hold_id)
+        if hold is None:
+            return False
+        seats = self._shows[hold.show]
+        with seats.lock:
+            # Under the show lock, so reloading the show never sees it half gone
+            if self._take_hold(hold_id) is None:
+                return False
+            seats.free([parse_seat_label(label) for label in hold.seats])
+        return True
+
+    def commit(self, hold_id, booking=None):
+        """Turn a hold into a sale, return its Hold or None if it is gone
+
+        booking is the stored booking the hold was saved as; its seats then
+        stay taken until the storage says it was cancelled. Without one the
+        seats stay taken for good. Commit only once the booking is stored.
+        """
+        if booking is None:
+            return self._take_hold(hold_id)
+        with self._shows_lock:
+            hold = self._holds.get(hold_id)
+            if hold is not None:
+                seats = self._shows[hold.show]
+                with seats.lock:
+                    hold = self._take_hold(hold_id)
+                    if hold is not None:
+                        taken = [parse_seat_label(label) for label in hold.seats]
+                        if booking["booking_id"] in self._sold:
+                            seats.free(taken)  # already read back from the storage
+                        else:
+                            self._sold[booking["booking_id"]] = (hold.show, taken)
+                        return hold
+            # The hold expired while the booking was saved: its seats are sold all the same
+            if booking["booking_id"] not in self._sold:
+                self._apply(booking)
+        return None
+
+    def _expire(self, hold_id):
+        expiry = self._expiry.get(hold_id)
+        hold = self._holds.get(hold_id)
+        # release() fails if a commit got there first
+        if hold is not None and self.release(hold_id) and expiry and expiry[1]:
+            expiry[1](hold)
+
+    def holds(self):
+        """Number of outstanding holds"""
+        return len(self._holds)
+
+
+ISO_DAY = re.compile(r"(\d{4})-(\d{2})-(\d{2})\b")
+
+
+@lru_cache(maxsize=4096)
+def _show_day(day, made):
+    """Normalize a booking's date, relative dates counting from made, a "YYYY-MM-DD" day"""
+    iso = ISO_DAY.match(day)
+    if iso:
+        try:
+            return date(*map(int, iso.groups())).isoformat()
+        except ValueError:
+            return day
+    try:
+        made = datetime.strptime(made, "%Y-%m-%d")
+    except ValueError:
+        made = None
+    parsed = parse_when(day, made).day
+    return parsed.isoformat() if parsed is not None else day
+
+
+@lru_cache(maxsize=1024)
+def _show_time(start):
+    parsed = parse_when(start).time
+    return format_showtime(parsed) if parsed is not None else start
+
+
+def booking_show(booking):
+    """Return the show key a booking belongs to
+
+    The date is normalized to "YYYY-MM-DD" and the time to "6:30 PM", so the
+    form's "2026-10-18 (Sunday)" and the dialogue's "2026-10-18" are one
+    show. Relative dates in old bookings ("this saturday") count from the day
+    the booking was made. Values that don't parse are kept as they are.
+    """
+    day, start = booking.get("date"), booking.get("time")
+    if isinstance(day, str):
+        made = booking.get("booking_date")
+        # Cached per day made, so dates like "tomorrow" in undated bookings still follow the clock
+        made = made[:10] if isinstance(made, str) and ISO_DAY.match(made) else date.today().isoformat()
+        day = _show_day(day, made)
+    if isinstance(start, str):
+        start = _show_time(start)
+    return (booking.get("movie"), booking.get("theater"), day, start)
+
+
+_inventories = {}
+_inventories_lock = threading.Lock()
+
+
+def get_inventory(storage, catalog=None):
+    """Return the shared seat inventory for a storage, which it reads sold seats from"""
+    with _inventories_lock:
+        inventory = _inventories.get(id(storage))
+        if inventory is None:
+            layout_for = None
+            if catalog is not None:
+                def layout_for(theater_name):
+                    theater = catalog.find_theater(theater_name) or {}
+                    return (theater.get("rows", DEFAULT_LAYOUT[0]),
+                            theater.get("seats_per_row", DEFAULT_LAYOUT[1]))
+            inventory = SeatInventory(layout_for, storage)
+            _inventories[id(storage)] = inventory
+    return inventory
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    # Premiere night: most buyers hit one show, the rest spread over the evening
+    inventory = SeatInventory(lambda theater: (40, 60))
+    premiere = ("Cosmic Dreams", "Royal IMAX", "2026-11-20", "8:30 PM")
+    shows = [premiere] + [("Cosmic Dreams", f"Screen {n}", "2026-11-20", t)
+                          for n in range(1, 9) for t in ("5:00 PM", "8:30 PM")]
+    capacity = 40 * 60
+
+    threads_count = 16
+    attempts = 5000
+    sold = [[] for _ in range(threads_count)]
+    counts = [[0, 0, 0] for _ in range(threads_count)]  # holds, sold out, released
+
+    def buyer(n):
+        rng = random.Random(n)
+        for _ in range(attempts):
+            show = premiere if rng.random() < 0.6 else rng.choice(shows)
+            hold = inventory.hold(show, rng.randint(1, 6))
+            if hold is None:
+                counts[n][1] += 1
+                continue
+            counts[n][0] += 1
+            if rng.random() < 0.3:
+                inventory.release(hold.hold_id)
+                counts[n][2] += 1
+            else:
+                inventory.commit(hold.hold_id)
+                sold[n].append(hold)
+
+    workers = [threading.Thread(target=buyer, args=(n,)) for n in range(threads_count)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    holds = sum(c[0] for c in counts)
+    print(f"{threads_count} threads, {threads_count * attempts} hold attempts in {elapsed:.2f} s "
+          f"({threads_count * attempts / elapsed:,.0f}/s)")
+    print(f"{holds} holds ({holds / elapsed:,.0f}/s), {sum(c[2] for c in counts)} released, "
+          f"{sum(c[1] for c in counts)} refused as sold out")
+
+    # Every show must be consistent: no seat sold twice, counts add up
+    by_show = {}
+    for hold in (h for per_thread in sold for h in per_thread):
+        by_show.setdefault(hold.show, []).extend(hold.seats)
+    for show in shows:
+        labels = by_show.get(show, [])
+        assert len(labels) == len(set(labels)), f"double-sold seat in {show}"
+        assert inventory.available(show) == capacity - len(labels), show
+    print(f"premiere: {len(by_show[premiere])}/{capacity} seats sold, no seat sold twice")
+
+    # A busy storage: 20,000 bookings for one movie at one theater over two months
+    import os
+    import shutil
+    import tempfile
+    from datetime import timedelta
+
+    from storage import JSONStorage, SQLiteStorage
+
+    directory = tempfile.mkdtemp()
+    try:
+        rng = random.Random(7)
+        first_day = date(2026, 11, 1)
+        times = ["1:00 PM", "4:00 PM", "7:00 PM", "9:30 PM"]
+        history = [{"booking_id": f"BK{n:06d}", "username": f"user{rng.randrange(500)}",
+                    "movie": "Cosmic Dreams", "theater": "Grand Arena",
+                    "date": (first_day + timedelta(days=rng.randrange(60))).isoformat(),
+                    "time": rng.choice(times), "tickets": 1, "status": "confirmed"}
+                   for n in range(20_000)]
+        show = ("Cosmic Dreams", "Grand Arena", first_day.isoformat(), "7:00 PM")
+        for name, storage in [("json", JSONStorage(*(os.path.join(directory, f) for f in
+                                                      ("bookings.json", "users.json", "preferences.json")))),
+                              ("sqlite", SQLiteStorage(os.path.join(directory, "moviebot.db")))]:
+            if name == "json":
+                for booking in history:
+                    storage.journal.add(booking, sync=False)
+            else:
+                storage.add_bookings(history)
+            inventory = SeatInventory(storage=storage)
+            inventory.available(show)
+            repeats = 2000
+            started = time.perf_counter()
+            for _ in range(repeats):
+                inventory.release(inventory.hold(show, 2).hold_id)
+            held = (time.perf_counter() - started) / repeats
+            sales = 100
+            started = time.perf_counter()
+            for n in range(sales):
+                hold = inventory.hold(show, 1)
+                booking = {"booking_id": f"BN{n:06d}", "username": "demo", "movie": show[0],
+                           "theater": show[1], "date": show[2], "time": show[3], "tickets": 1,
+                           "seats": hold.seats, "status": "confirmed"}
+                assert storage.add_booking(booking, check=inventory.fits)
+                inventory.commit(hold.hold_id, booking)
+            sold = (time.perf_counter() - started) / sales
+            rows, width = DEFAULT_LAYOUT
+            assert inventory.available(show) == rows * width - sales - sum(
+                1 for b in history if booking_show(b) == show)
+            print(f"{name:>6}, 20,000 stored bookings: hold and release {held * 1e6:6.1f} us, "
+                  f"hold, save and commit {sold * 1e3:5.2f} ms")
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,435 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import struct
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from engine import ChatEngine
+from events import HOLD_EXPIRED
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    """An HTTP error response to send back to the client"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ChatServer:
+    """Asyncio HTTP and WebSocket front end for a shared ChatEngine
+
+    One event loop holds every connection. Engine turns touch the catalog and
+    the booking storage, so they run on a thread pool and the loop only parses
+    requests and writes replies. Dialogue state lives on engine sessions keyed by
+    the client's session id; sessions idle for longer than session_ttl seconds
+    are dropped. A session books as the user whose /login issued its id; any
+    id the client made up is an anonymous guest's, named guest-<id>, so it
+    sees and cancels only its own bookings. A username sent with a message is
+    never trusted. Once a login session is dropped its id is refused with 401
+    (or a session_expired event on a WebSocket) for another session_ttl, so
+    the client knows to log in again rather than carry on as a guest.
+
+    Endpoints:
+        GET  /health           {"status": "ok", "sessions": n}
+        POST /login            {"username": ..., "password": ...} -> {"session": id, "username": ...}
+        POST /chat             {"session": id, "text": ...}
+        GET  /ws?session=id    WebSocket, one JSON reply per text frame;
+                               {"event": "hold_expired", "text": ...} is
+                               pushed when the session's seat hold runs out,
+                               {"event": "session_expired", "text": ...} when
+                               its login runs out, {"error": ...} if a turn fails
+    """
+
+    max_body = 64 * 1024
+    backlog = 4096
+
+    def __init__(self, engine=None, host="127.0.0.1", port=8765, workers=8, session_ttl=1800):
+        self.engine = engine or ChatEngine()
+        self.host = host
+        self.port = port
+        self.session_ttl = session_ttl
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat")
+        self._last_seen = {}  # session id -> monotonic time of last message
+        self._sockets = {}    # session id -> writer of its open WebSocket
+        self._logins = {}     # session id issued by /login -> username
+        self._expired = {}    # login session id dropped by the sweep -> monotonic time dropped
+        self._server = None
+        self._sweeper = None
+
+    async def start(self):
+        """Start listening, return the bound (host, port)"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  backlog=self.backlog)
+        self._sweeper = asyncio.create_task(self._sweep_sessions())
+        loop = asyncio.get_running_loop()
+        self.engine.events.subscribe(HOLD_EXPIRED, self._push_hold_expired,
+                                     lambda callback: loop.call_soon_threadsafe(callback))
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """Start the server and run until cancelled"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop accepting connections and release the worker threads"""
+        self.engine.events.unsubscribe(HOLD_EXPIRED, self._push_hold_expired)
+        self.engine.preference_cache.flush()
+        self.engine.conversation_log.flush()
+        if self._sweeper:
+            self._sweeper.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    # Dialogue
+
+    async def login(self, username, password):
+        """Check a user's password, return a new session id bound to them or None"""
+        loop = asyncio.get_running_loop()
+        user = await loop.run_in_executor(self.executor, self.engine.storage.get_user, username)
+        if user is None or not hmac.compare_digest(str(user.get("password", "")).encode(), password.encode()):
+            return None
+        session_id = secrets.token_urlsafe(24)
+        self._logins[session_id] = username
+        self._last_seen[session_id] = time.monotonic()
+        return session_id
+
+    async def respond(self, session_id, text):
+        """Run one engine turn on the thread pool and return the reply as a dict
+
+        Raises HTTPError(401) for a login session the sweep has dropped.
+        """
+        if session_id in self._expired:
+            raise HTTPError(401, "Session expired, please log in again")
+        self._last_seen[session_id] = time.monotonic()
+        loop = asyncio.get_running_loop()
+        username = self._logins.get(session_id)
+        response = await loop.run_in_executor(self.executor, self._respond, session_id, text, username)
+        return response._asdict()
+
+    def _respond(self, session_id, text, username):
+        if username is None:
+            self.engine.session(session_id, f"guest-{session_id}", remember=False)
+        else:
+            self.engine.session(session_id, username)
+        return self.engine.respond(session_id, text)
+
+    def _push_hold_expired(self, session_id, message):
+        writer = self._sockets.get(session_id)
+        if writer is not None and not writer.is_closing():
+            payload = {"event": "hold_expired", "text": message}
+            writer.write(encode_frame(0x1, json.dumps(payload).encode("utf-8")))
+
+    async def _sweep_sessions(self):
+        """Drop engine sessions that have been idle for longer than session_ttl"""
+        while True:
+            await asyncio.sleep(min(60, self.session_ttl))
+            self.sweep()
+
+    def sweep(self, now=None):
+        """Drop idle sessions, telling the WebSocket of a dropped login session"""
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.session_ttl
+        for session_id in [s for s, seen in self._expired.items() if seen < cutoff]:
+            del self._expired[session_id]
+        for session_id in [s for s, seen in self._last_seen.items() if seen < cutoff]:
+            del self._last_seen[session_id]
+            if self._logins.pop(session_id, None) is not None:
+                self._expired[session_id] = now
+                writer = self._sockets.get(session_id)
+                if writer is not None and not writer.is_closing():
+                    payload = {"event": "session_expired", "text": "Session expired, please log in again"}
+                    writer.write(encode_frame(0x1, json.dumps(payload).encode("utf-8")))
+            self.engine.end_session(session_id)
+
+    # HTTP
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                url = urlsplit(target)
+
+                if url.path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(reader, writer, headers, parse_qs(url.query))
+                    break
+
+                try:
+                    status, payload = await self._route(method, url.path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception:
+                    # A failed engine turn costs this request, not the connection
+                    traceback.print_exc()
+                    status, payload = 500, {"error": "Internal error"}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_json(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            self._write_json(writer, e.status, {"error": str(e)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Read one request, return (method, target, headers, body) or None at EOF"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HTTPError(400, "Incomplete request")
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Request headers too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Malformed Content-Length")
+        if length > self.max_body:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+    async def _route(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok", "sessions": len(self._last_seen)}
+        if path == "/login":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            try:
+                message = json.loads(body)
+                username = str(message["username"])
+                password = str(message["password"])
+            except (ValueError, KeyError, TypeError):
+                raise HTTPError(400, "Expected JSON with 'username' and 'password'")
+            session_id = await self.login(username, password)
+            if session_id is None:
+                raise HTTPError(401, "Wrong username or password")
+            return 200, {"session": session_id, "username": username}
+        if path == "/chat":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            try:
+                message = json.loads(body)
+                session_id = str(message["session"])
+                text = str(message["text"])
+            except (ValueError, KeyError, TypeError):
+                raise HTTPError(400, "Expected JSON with 'session' and 'text'")
+            return 200, await self.respond(session_id, text)
+        raise HTTPError(404, f"No route for {path}")
+
+    def _write_json(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+    # WebSocket
+
+    async def _websocket(self, reader, writer, headers, query):
+        key = headers.get("sec-websocket-key")
+        session_id = (query.get("session") or [None])[0]
+        if not key or not session_id:
+            self._write_json(writer, 400, {"error": "Expected Sec-WebSocket-Key and ?session="}, False)
+            return
+
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+
+        self._sockets[session_id] = writer
+        try:
+            await self._websocket_loop(reader, writer, session_id)
+        finally:
+            if self._sockets.get(session_id) is writer:
+                del self._sockets[session_id]
+
+    async def _websocket_loop(self, reader, writer, session_id):
+        while True:
+            try:
+                opcode, payload = await read_frame(reader)
+            except HTTPError:
+                writer.write(encode_frame(0x8, struct.pack("!H", 1009)))
+                break
+            if opcode == 0x1:  # text
+                try:
+                    text = payload.decode("utf-8")
+                except UnicodeDecodeError:
+                    writer.write(encode_frame(0x8, struct.pack("!H", 1007)))
+                    break
+                try:
+                    reply = await self.respond(session_id, text)
+                except HTTPError as e:
+                    reply = {"event": "session_expired", "text": str(e)}
+                except Exception:
+                    traceback.print_exc()
+                    reply = {"error": "Internal error"}
+                writer.write(encode_frame(0x1, json.dumps(reply).encode("utf-8")))
+            elif opcode == 0x9:  # ping
+                writer.write(encode_frame(0xA, payload))
+            elif opcode == 0x8:  # close
+                writer.write(encode_frame(0x8, payload[:2]))
+                break
+            elif opcode != 0xA:
+                # Binary and fragmented messages are not part of this protocol
+                writer.write(encode_frame(0x8, struct.pack("!H", 1003)))
+                break
+            await writer.drain()
+        await writer.drain()
+
+
+async def read_frame(reader, max_size=64 * 1024):
+    """Read one WebSocket frame, return (opcode, unmasked payload)"""
+    first, second = await reader.readexactly(2)
+    if not first & 0x80:
+        return None, b""  # fragment, rejected by the caller
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if length > max_size:
+        raise HTTPError(413, "WebSocket frame too large")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def encode_frame(opcode, payload, mask=None):
+    """Encode a single-frame WebSocket message, masked when mask (4 bytes) is given"""
+    head = bytes([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if len(payload) < 126:
+        head += bytes([mask_bit | len(payload)])
+    elif len(payload) < 1 << 16:
+        head += bytes([mask_bit | 126]) + struct.pack("!H", len(payload))
+    else:
+        head += bytes([mask_bit | 127]) + struct.pack("!Q", len(payload))
+    if mask:
+        head += mask
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return head + payload
+
+
+async def run_load_test(sessions, turns, workers):
+    """Drive concurrent WebSocket conversations against a private server on localhost"""
+    import os
+    import random
+    import shutil
+    import tempfile
+
+    script = ["hello", "book cosmic dreams", "tomorrow", "6:30 pm", "show movies", "how much", "thanks"]
+    data_dir = tempfile.mkdtemp(prefix="moviebot-load-")
+    shutil.copy("movies.json", data_dir)
+    engine = ChatEngine(*(os.path.join(data_dir, name) for name in
+                          ("movies.json", "bookings.json", "users.json", "preferences.json")))
+    server = ChatServer(engine, port=0, workers=workers)
+    host, port = await server.start()
+
+    latencies = []
+
+    async def converse(n):
+        reader, writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write(f"GET /ws?session=load-{n} HTTP/1.1\r\nHost: {host}\r\nUpgrade: websocket\r\n"
+                     f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                     f"Sec-WebSocket-Version: 13\r\n\r\n".encode())
+        await reader.readuntil(b"\r\n\r\n")
+        for text in script[:turns]:
+            start = time.perf_counter()
+            writer.write(encode_frame(0x1, text.encode(), mask=os.urandom(4)))
+            opcode, payload = await read_frame(reader, max_size=1 << 20)
+            latencies.append(time.perf_counter() - start)
+            assert opcode == 0x1 and json.loads(payload)["text"]
+            await asyncio.sleep(random.random() * 0.01)
+        writer.write(encode_frame(0x8, struct.pack("!H", 1000), mask=os.urandom(4)))
+        await writer.drain()
+        writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(converse(n) for n in range(sessions)))
+    elapsed = time.perf_counter() - started
+    await server.close()
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+    latencies.sort()
+    print(f"{sessions} concurrent sessions, {len(latencies)} turns in {elapsed:.2f} s "
+          f"({len(latencies) / elapsed:.0f} turns/s)")
+    print(f"latency p50 {latencies[len(latencies) // 2] * 1e3:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the movie booking chatbot over HTTP and WebSocket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--load-test", type=int, metavar="SESSIONS",
+                        help="run SESSIONS concurrent conversations against a private localhost server and exit")
+    parser.add_argument("--turns", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.load_test:
+        asyncio.run(run_load_test(args.load_test, args.turns, args.workers))
+    else:
+        server = ChatServer(host=args.host, port=args.port, workers=args.workers)
+        print(f"Movie chatbot listening on http://{args.host}:{args.port}")
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
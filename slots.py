@@ -0,0 +1,126 @@
+from collections import namedtuple
+
+from temporal import parse_when
+from title_matcher import token_spans
+
+# The booking details found in one message, None where it doesn't say.
+# movie and theater are catalog entries, date a date, time a time,
+# tickets an int and seat_type "VIP" or "Standard".
+Slots = namedtuple("Slots", ["movie", "theater", "date", "time", "tickets", "seat_type"])
+
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+                "eight": 8, "nine": 9, "ten": 10, "a": 1, "an": 1, "single": 1, "pair": 2, "couple": 2}
+TICKET_WORDS = {"ticket", "tickets", "seat", "seats", "people", "persons", "adults", "us"}
+SEAT_TYPES = {"vip": "VIP", "premium": "VIP", "recliner": "VIP", "standard": "Standard", "regular": "Standard"}
+# May sit between a count and its noun, as in "3 VIP tickets" or "a pair of seats"
+FILLER = {"vip", "premium", "recliner", "standard", "regular", "adult", "more", "of"}
+MAX_TICKETS = 20
+
+
+class SlotExtractor:
+    """Pulls every booking detail out of a message in one pass over its tokens
+
+    "book 3 VIP tickets for Cosmic Dreams at Grand Arena tomorrow 9pm" gives
+    all six slots at once. The message is tokenized once: the catalog's title
+    tries find movies and theaters in the token list, and the same walk picks
+    up the ticket count and seat type. The date and time come from the cached
+    temporal grammar, run over the message with the names cut out so "Mystery
+    at Midnight" isn't a showtime.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def extract(self, message, now=None):
+        """Return the Slots of a message"""
+        spans = token_spans(message)
+        tokens = [token for token, _, _ in spans]
+        movie, theater, named = self._names(tokens)
+
+        tickets = seat_type = None
+        for i, token in enumerate(tokens):
+            if token in SEAT_TYPES:
+                seat_type = seat_type or SEAT_TYPES[token]
+            if tickets is not None:
+                continue
+            count = int(token) if token.isdigit() else NUMBER_WORDS.get(token)
+            if count is None or not 0 < count <= MAX_TICKETS:
+                continue
+            # The count must lead to a ticket noun, skipping words like "VIP"
+            for following in tokens[i + 1:i + 4]:
+                if following in TICKET_WORDS:
+                    tickets = count
+                if following not in FILLER:
+                    break
+            if i >= 2 and tokens[i - 2] in ("party", "group") and tokens[i - 1] == "of":
+                tickets = count
+
+        rest = message
+        for start, end in sorted(named, reverse=True):
+            rest = rest[:spans[start][1]] + " " + rest[spans[end - 1][2]:]
+        when = parse_when(rest, now)
+        return Slots(movie, theater, when.day, when.time, tickets, seat_type)
+
+    def _names(self, tokens):
+        """Return the movie and theater named and their token spans
+
+        Longer names win where names overlap.
+        """
+        movies, theaters = self.catalog.mentions(tokens)
+        spans = [(end - start, "movie", entry, start, end) for entry, start, end in movies]
+        spans += [(end - start, "theater", entry, start, end) for entry, start, end in theaters]
+        spans.sort(key=lambda span: -span[0])
+        chosen = {}
+        taken = []
+        for _, kind, entry, start, end in spans:
+            if kind in chosen or any(start < other_end and other_start < end for other_start, other_end in taken):
+                continue
+            chosen[kind] = entry
+            taken.append((start, end))
+        return chosen.get("movie"), chosen.get("theater"), taken
+
+
+if __name__ == "__main__":
+    import random
+    import timeit
+
+    from catalog import get_catalog
+
+    catalog = get_catalog()
+    extractor = SlotExtractor(catalog)
+    utterances = [
+        "book 3 VIP tickets for Cosmic Dreams at Grand Arena tomorrow 9pm",
+        "2 tickets for Heartstrings this saturday at 7",
+        "can I get a pair of seats for the last adventure at starlight theater tonight",
+        "Laugh Out Loud, party of 4, next friday evening",
+        "I want to see mystery at midnight",
+    ]
+    for text in utterances:
+        print(f"{text}\n  {extractor.extract(text)}")
+
+    # Turns per booking: the old flow asked for one detail per turn
+    rng = random.Random(2)
+    movies = [m["title"] for m in catalog.movies()]
+    theaters = [t["name"] for t in catalog.theaters()]
+    parts = [lambda: f"for {rng.choice(movies)}",
+             lambda: f"at {rng.choice(theaters)}",
+             lambda: rng.choice(["tomorrow", "this saturday", "tonight"]),
+             lambda: rng.choice(["at 7", "9pm", "at 6:30 PM"]),
+             lambda: f"{rng.randint(1, 6)} tickets"]
+    requests = []
+    for _ in range(1000):
+        chosen = [part() for part in parts if rng.random() < 0.6]
+        rng.shuffle(chosen)
+        requests.append("book " + " ".join(chosen))
+    old_turns = turns = 0
+    for text in requests:
+        slots = extractor.extract(text)
+        missing = [value for value in (slots.movie, slots.date, slots.time, slots.tickets, slots.theater)
+                   if value is None]
+        # The request, one turn per missing detail, then "confirm"
+        turns += 1 + len(missing) + 1
+        # The request (plus the movie if it wasn't named), then date, time, tickets, theater, confirm
+        old_turns += 1 + (slots.movie is None) + 5
+    elapsed = timeit.timeit(lambda: [extractor.extract(text) for text in requests], number=5) / 5
+    print(f"1000 booking requests naming some details: {turns / 1000:.1f} turns per booking, "
+          f"was {old_turns / 1000:.1f}; {elapsed / 1000 * 1e6:.0f} µs per extraction")
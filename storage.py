@@ -0,0 +1,482 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+
+from booking_ids import id_range
+from booking_journal import get_journal
+from file_locks import JSONDocument
+from seating import booking_show
+
+
+class JSONStorage:
+    """Storage backed by the JSON data files and the bookings journal"""
+
+    def __init__(self, bookings_file="bookings.json", users_file="users.json",
+                 preferences_file="preferences.json"):
+        self.bookings_file = bookings_file
+        self.users_file = users_file
+        self.preferences_file = preferences_file
+        self.journal = get_journal(bookings_file)
+        # Shared with other processes; updates never overwrite each other
+        self._users = JSONDocument(users_file, {"users": []})
+        self._preferences = JSONDocument(preferences_file, {"preferences": {}})
+
+    # Bookings
+
+    def add_booking(self, booking, check=None):
+        """Store a new booking, return False if check refused it
+
+        check(booking, others) gets every stored booking for the same show
+        (see seating.booking_show) as others while no other writer can add
+        one, and the booking is only stored if it returns true.
+        """
+        return self.journal.add(booking, check=check)
+
+    def update_booking(self, booking_id, fields, expect=None):
+        """Update fields of a booking, return False if it doesn't exist or doesn't match expect"""
+        return self.journal.update(booking_id, fields, expect=expect)
+
+    def delete_booking(self, booking_id):
+        """Remove a booking, return False if it doesn't exist"""
+        return self.journal.delete(booking_id)
+
+    def get_booking(self, booking_id):
+        """Return a booking by id, or None"""
+        return self.journal.get(booking_id)
+
+    def bookings_for_user(self, username):
+        """Return a user's bookings in booking order"""
+        return self.journal.for_user(username)
+
+    def bookings_for_show(self, show):
+        """Return the bookings for a show (see seating.booking_show), in booking order"""
+        return self.journal.for_show(show)
+
+    def changes_since(self, seq):
+        """Return (bookings changed after seq, oldest first, the seq to ask from next)
+
+        Deleted bookings come back with status "deleted". The bookings are None
+        when seq is None or too old to answer, and the caller must reread
+        what it needs.
+        """
+        return self.journal.changes_since(seq)
+
+    def recent_bookings_for_user(self, username, limit=5, before=None):
+        """Return (a page of a user's bookings, newest first, cursor for the next page or None)"""
+        return self.journal.recent_for_user(username, limit, before)
+
+    def all_bookings(self):
+        """Return all bookings in booking order"""
+        return self.journal.all()
+
+    def iter_bookings(self, batch=1000):
+        """Yield all bookings in booking order without building a list of them"""
+        return self.journal.scan(batch)
+
+    def bookings_between(self, start, end):
+        """Return bookings made in [start, end), oldest first (see booking_ids.id_range)"""
+        return self.journal.between(*id_range(start, end))
+
+    # Users
+
+    def get_user(self, username):
+        """Return a user record, or None"""
+        for user in self._users.read().get("users", []):
+            if user.get("username") == username:
+                return copy.deepcopy(user)
+        return None
+
+    def all_users(self):
+        """Return all user records"""
+        return copy.deepcopy(self._users.read().get("users", []))
+
+    def add_user(self, user):
+        """Store a new user record"""
+        self._users.update(lambda data: data.setdefault("users", []).append(user))
+
+    # Preferences
+
+    def load_preferences(self, username):
+        """Return a user's saved preferences, or None"""
+        return copy.deepcopy(self._preferences.read().get("preferences", {}).get(username))
+
+    def all_preferences(self):
+        """Return a dict of username -> preferences"""
+        return copy.deepcopy(self._preferences.read().get("preferences", {}))
+
+    def save_preferences(self, username, preferences):
+        """Store a user's preferences"""
+        preferences = copy.deepcopy(preferences)
+
+        def change(data):
+            data.setdefault("preferences", {})[username] = preferences
+        self._preferences.update(change)
+
+    def save_many_preferences(self, preferences_by_user):
+        """Store several users' preferences in one write"""
+        batch = copy.deepcopy(preferences_by_user)
+        self._preferences.update(lambda data: data.setdefault("preferences", {}).update(batch))
+
+
+def _show_key(booking):
+    """A booking's show as stored in the show column"""
+    return json.dumps(booking_show(booking))
+
+
+class SQLiteStorage:
+    """Storage backed by a SQLite database in WAL mode
+
+    Every write also appends the booking id to booking_changes, which
+    changes_since() reads; only the last CHANGE_LOG rows of it are kept.
+    """
+
+    CHANGE_LOG = 10000
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS bookings (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_id TEXT NOT NULL,
+            username TEXT,
+            data TEXT NOT NULL,
+            show TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_bookings_booking_id ON bookings (booking_id);
+        CREATE INDEX IF NOT EXISTS idx_bookings_username ON bookings (username, seq);
+        CREATE TABLE IF NOT EXISTS booking_changes (
+            change INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_id TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS preferences (
+            username TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_file="moviebot.db"):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+        self._migrate()
+
+    def _migrate(self, batch=1000):
+        """Bring a database made by an older version up to date
+
+        Databases from before the show column get it filled in from each
+        booking, batch rows per statement; the show index on json_extract
+        it replaces is dropped.
+        """
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # one process migrates, the others wait and find it done
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(bookings)")]
+            if "show" not in columns:
+                conn.execute("ALTER TABLE bookings ADD COLUMN show TEXT")
+            seq = 0
+            while True:
+                rows = conn.execute(
+                    "SELECT seq, data FROM bookings WHERE seq > ? AND show IS NULL ORDER BY seq LIMIT ?",
+                    (seq, batch),
+                ).fetchall()
+                if not rows:
+                    break
+                seq = rows[-1][0]
+                conn.executemany("UPDATE bookings SET show = ? WHERE seq = ?",
+                                 ((_show_key(json.loads(data)), seq) for seq, data in rows))
+            conn.execute("DROP INDEX IF EXISTS idx_bookings_show")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_show_key ON bookings (show, seq)")
+
+    def _connection(self):
+        """Return this thread's connection (sqlite3 connections are per thread)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Bookings
+
+    def add_booking(self, booking, check=None):
+        """Store a new booking, return False if check refused it (see JSONStorage.add_booking)"""
+        show = _show_key(booking)
+        with self._connection() as conn:
+            if check is not None:
+                # Take the write lock before reading so the check can't go stale
+                conn.execute("BEGIN IMMEDIATE")
+                if not check(booking, self._bookings_for_show(conn, show)):
+                    return False
+            conn.execute(
+                "INSERT INTO bookings (booking_id, username, data, show) VALUES (?, ?, ?, ?)",
+                (booking.get("booking_id"), booking.get("username"), json.dumps(booking), show),
+            )
+            self._log_changes(conn, [booking.get("booking_id")])
+        return True
+
+    def add_bookings(self, bookings):
+        """Store many bookings in one transaction"""
+        bookings = list(bookings)
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO bookings (booking_id, username, data, show) VALUES (?, ?, ?, ?)",
+                ((b.get("booking_id"), b.get("username"), json.dumps(b), _show_key(b)) for b in bookings),
+            )
+            self._log_changes(conn, [b.get("booking_id") for b in bookings])
+
+    def _log_changes(self, conn, booking_ids):
+        """Record changed bookings for changes_since, in the caller's transaction"""
+        conn.executemany("INSERT INTO booking_changes (booking_id) VALUES (?)",
+                         ((booking_id,) for booking_id in booking_ids))
+        last = conn.execute("SELECT MAX(change) FROM booking_changes").fetchone()[0]
+        if last is not None and last % 1000 < len(booking_ids):
+            # Every thousand changes or so, drop the ones past the log's length
+            conn.execute("DELETE FROM booking_changes WHERE change <= ?", (last - self.CHANGE_LOG,))
+
+    def update_booking(self, booking_id, fields, expect=None):
+        """Update fields of a booking, return False if it doesn't exist or doesn't match expect"""
+        with self._connection() as conn:
+            # Take the write lock before reading so the expect check can't go stale
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT seq, data FROM bookings WHERE booking_id = ? ORDER BY seq", (booking_id,)
+            ).fetchall()
+            if rows and expect:
+                first = json.loads(rows[0][1])
+                if any(first.get(k) != v for k, v in expect.items()):
+                    return False
+            for seq, data in rows:
+                booking = json.loads(data)
+                booking.update(fields)
+                conn.execute(
+                    "UPDATE bookings SET username = ?, data = ?, show = ? WHERE seq = ?",
+                    (booking.get("username"), json.dumps(booking), _show_key(booking), seq),
+                )
+            if rows:
+                self._log_changes(conn, [booking_id])
+        return bool(rows)
+
+    def delete_booking(self, booking_id):
+        """Remove a booking, return False if it doesn't exist"""
+        with self._connection() as conn:
+            cursor = conn.execute("DELETE FROM bookings WHERE booking_id = ?", (booking_id,))
+            if cursor.rowcount:
+                self._log_changes(conn, [booking_id])
+        return cursor.rowcount > 0
+
+    def get_booking(self, booking_id):
+        """Return a booking by id, or None"""
+        row = self._connection().execute(
+            "SELECT data FROM bookings WHERE booking_id = ? ORDER BY seq LIMIT 1", (booking_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def bookings_for_user(self, username):
+        """Return a user's bookings in booking order"""
+        rows = self._connection().execute(
+            "SELECT data FROM bookings WHERE username = ? ORDER BY seq", (username,)
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    @staticmethod
+    def _bookings_for_show(conn, show):
+        rows = conn.execute("SELECT data FROM bookings WHERE show = ? ORDER BY seq", (show,))
+        return [json.loads(data) for (data,) in rows]
+
+    def bookings_for_show(self, show):
+        """Return the bookings for a show (see seating.booking_show), in booking order"""
+        return self._bookings_for_show(self._connection(), json.dumps(show))
+
+    def changes_since(self, seq, batch=500):
+        """Return (bookings changed after seq, oldest first, the seq to ask from next)
+
+        See JSONStorage.changes_since. A booking changed several times comes
+        back once, as it is now.
+        """
+        conn = self._connection()
+        # Two queries, as SQLite only answers a lone MIN or MAX from the index
+        first = conn.execute("SELECT MIN(change) FROM booking_changes").fetchone()[0]
+        last = conn.execute("SELECT MAX(change) FROM booking_changes").fetchone()[0] or 0
+        if seq is None or (first is not None and seq < first - 1):
+            return None, last
+        changed_ids = list(dict.fromkeys(booking_id for (booking_id,) in conn.execute(
+            "SELECT booking_id FROM booking_changes WHERE change > ? AND change <= ? ORDER BY change",
+            (seq, last))))
+        changed = []
+        for start in range(0, len(changed_ids), batch):
+            chunk = changed_ids[start:start + batch]
+            found = {}
+            for booking_id, data in conn.execute(
+                    f"SELECT booking_id, data FROM bookings WHERE booking_id IN ({','.join('?' * len(chunk))}) "
+                    "ORDER BY seq", chunk):
+                found.setdefault(booking_id, json.loads(data))
+            changed.extend(found.get(booking_id, {"booking_id": booking_id, "status": "deleted"})
+                           for booking_id in chunk)
+        return changed, last
+
+    def recent_bookings_for_user(self, username, limit=5, before=None):
+        """Return (a page of a user's bookings, newest first, cursor for the next page or None)"""
+        conn = self._connection()
+        end = 2 ** 63 - 1  # largest seq SQLite can hold
+        if before is not None:
+            row = conn.execute(
+                "SELECT seq FROM bookings WHERE booking_id = ? ORDER BY seq LIMIT 1", (before,)
+            ).fetchone()
+            end = row[0] if row else 0
+        rows = conn.execute(
+            "SELECT data FROM bookings WHERE username = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (username, end, limit + 1),
+        ).fetchall()
+        page = [json.loads(data) for (data,) in rows[:limit]]
+        return page, (page[-1].get("booking_id") if len(rows) > limit else None)
+
+    def all_bookings(self):
+        """Return all bookings in booking order"""
+        rows = self._connection().execute("SELECT data FROM bookings ORDER BY seq")
+        return [json.loads(data) for (data,) in rows]
+
+    def iter_bookings(self, batch=1000):
+        """Yield all bookings in booking order, reading batch rows per query"""
+        seq = 0
+        while True:
+            rows = self._connection().execute(
+                "SELECT seq, data FROM bookings WHERE seq > ? ORDER BY seq LIMIT ?", (seq, batch)
+            ).fetchall()
+            if not rows:
+                return
+            seq = rows[-1][0]
+            for _, data in rows:
+                yield json.loads(data)
+
+    def bookings_between(self, start, end):
+        """Return bookings made in [start, end), oldest first (see booking_ids.id_range)"""
+        rows = self._connection().execute(
+            "SELECT data FROM bookings WHERE booking_id >= ? AND booking_id < ? ORDER BY booking_id",
+            id_range(start, end),
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    # Users
+
+    def get_user(self, username):
+        """Return a user record, or None"""
+        row = self._connection().execute(
+            "SELECT data FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def all_users(self):
+        """Return all user records"""
+        rows = self._connection().execute("SELECT data FROM users ORDER BY username")
+        return [json.loads(data) for (data,) in rows]
+
+    def add_user(self, user):
+        """Store a new user record"""
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO users (username, data) VALUES (?, ?)",
+                (user.get("username"), json.dumps(user)),
+            )
+
+    # Preferences
+
+    def load_preferences(self, username):
+        """Return a user's saved preferences, or None"""
+        row = self._connection().execute(
+            "SELECT data FROM preferences WHERE username = ?", (username,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def all_preferences(self):
+        """Return a dict of username -> preferences"""
+        rows = self._connection().execute("SELECT username, data FROM preferences")
+        return {username: json.loads(data) for username, data in rows}
+
+    def save_preferences(self, username, preferences):
+        """Store a user's preferences"""
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO preferences (username, data) VALUES (?, ?)",
+                (username, json.dumps(preferences)),
+            )
+
+    def save_many_preferences(self, preferences_by_user):
+        """Store several users' preferences in one transaction"""
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO preferences (username, data) VALUES (?, ?)",
+                ((username, json.dumps(prefs)) for username, prefs in preferences_by_user.items()),
+            )
+
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def open_storage(bookings_file="bookings.json", users_file="users.json",
+                 preferences_file="preferences.json", backend=None, db_file=None):
+    """Return the shared storage for the given data files
+
+    The backend defaults to the MOVIEBOT_STORAGE environment variable ("json" or
+    "sqlite"), and the SQLite database to MOVIEBOT_DB.
+    """
+    backend = backend or os.environ.get("MOVIEBOT_STORAGE", "json")
+    if backend == "sqlite":
+        db_file = db_file or os.environ.get("MOVIEBOT_DB", "moviebot.db")
+        key = ("sqlite", os.path.abspath(db_file))
+    elif backend == "json":
+        key = ("json", os.path.abspath(bookings_file), os.path.abspath(users_file),
+               os.path.abspath(preferences_file))
+    else:
+        raise ValueError(f"Unknown storage backend: {backend}")
+
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is None:
+            if backend == "sqlite":
+                storage = SQLiteStorage(db_file)
+            else:
+                storage = JSONStorage(bookings_file, users_file, preferences_file)
+            _storages[key] = storage
+    return storage
+
+
+def migrate_json_to_sqlite(bookings_file="bookings.json", users_file="users.json",
+                           preferences_file="preferences.json", db_file="moviebot.db"):
+    """Copy bookings, users and preferences from the JSON files into SQLite"""
+    source = JSONStorage(bookings_file, users_file, preferences_file)
+    target = SQLiteStorage(db_file)
+
+    if target._connection().execute("SELECT 1 FROM bookings LIMIT 1").fetchone():
+        raise ValueError(f"{db_file} already has bookings, refusing to migrate twice")
+
+    bookings = source.all_bookings()
+    target.add_bookings(bookings)
+
+    users = source.all_users()
+    for user in users:
+        target.add_user(user)
+
+    preferences = source.all_preferences()
+    for username, prefs in preferences.items():
+        target.save_preferences(username, prefs)
+
+    return len(bookings), len(users), len(preferences)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate the JSON data files into SQLite")
+    parser.add_argument("--bookings", default="bookings.json")
+    parser.add_argument("--users", default="users.json")
+    parser.add_argument("--preferences", default="preferences.json")
+    parser.add_argument("--db", default="moviebot.db")
+    args = parser.parse_args()
+
+    counts = migrate_json_to_sqlite(args.bookings, args.users, args.preferences, args.db)
+    print("Migrated %d bookings, %d users, %d preference profiles into %s" % (counts + (args.db,)))
@@ -0,0 +1,278 @@
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, time, timedelta
+
+# What a phrase says about when: day is a date, time an exact time, after the
+# time in "after 6 pm"; each is None when the phrase doesn't say
+When = namedtuple("When", ["day", "time", "after"])
+
+NOTHING = When(None, None, None)
+
+WEEKDAYS = {"monday": 0, "mon": 0, "tuesday": 1, "tues": 1, "tue": 1, "wednesday": 2, "wed": 2,
+            "thursday": 3, "thurs": 3, "thu": 3, "friday": 4, "fri": 4, "saturday": 5, "sat": 5,
+            "sunday": 6, "sun": 6}
+MONTHS = {"january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+          "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8, "september": 9,
+          "sept": 9, "sep": 9, "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12}
+RELATIVE_DAYS = {"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}
+# Times of day, as the booking dialogue has always read them
+PERIODS = {"morning": (10, 0), "afternoon": (14, 0), "evening": (18, 30), "night": (21, 0),
+           "noon": (12, 0), "midnight": (0, 0)}
+
+
+def _words(names):
+    return "|".join(sorted(names, key=len, reverse=True))
+
+
+# The whole grammar is one alternation, compiled once and scanned left to right
+GRAMMAR = re.compile(rf"""
+    \b(?P<iso>\d{{4}})-(?P<iso_month>\d{{1,2}})-(?P<iso_day>\d{{1,2}})\b
+  | \b(?P<slash_month>\d{{1,2}})/(?P<slash_day>\d{{1,2}})(?:/(?P<slash_year>\d{{4}}|\d{{2}}))?\b
+  | \b(?P<month>{_words(MONTHS)})\.?\s+(?P<month_day>\d{{1,2}})(?:st|nd|rd|th)?\b
+  | \b(?P<day_month_day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<day_month>{_words(MONTHS)})\b
+  | \b(?P<relative>{_words(RELATIVE_DAYS)})\b
+  | \bin\s+(?P<in_days>\d{{1,3}})\s+days?\b
+  | \b(?:(?P<which>this|next|coming)\s+)?(?:(?P<weekday>{_words(WEEKDAYS)})|(?P<weekend>weekend))\b
+  | (?:\b(?P<after>after|from|past|later\s+than)\s+|\b(?P<at>at|@)\s*)?
+        \b(?P<hour>\d{{1,2}})(?::(?P<minute>\d{{2}}))?\s*(?P<ampm>[ap]\.?m\b\.?)?
+  | \b(?:(?P<period_after>after)\s+)?(?P<period>{_words(PERIODS)})\b
+""", re.IGNORECASE | re.VERBOSE)
+
+
+def _clock_time(hour, minute, ampm):
+    """Return (hour, minute) on the 24 hour clock, or None"""
+    if ampm:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if ampm[0] == "p" else 0)
+    elif 1 <= hour <= 9:
+        hour += 12  # "at 7" at the movies is the evening
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+def _spec(text):
+    """Parse lowercased text into a When whose day is still relative
+
+    The day is ("date", y, m, d), ("offset", n), ("weekday", n, next week?) or
+    ("month_day", m, d); resolving it against a clock is left to _resolve so
+    a cached spec stays right from one day to the next.
+    """
+    day = clock = after = None
+    for match in GRAMMAR.finditer(text):
+        group = match.group
+        if group("hour") is not None:
+            if clock is not None and after is not None:
+                continue
+            minute, ampm = group("minute"), group("ampm")
+            if minute is None and ampm is None and group("after") is None and group("at") is None:
+                continue  # a bare number, like "2 tickets"
+            found = _clock_time(int(group("hour")), int(minute or 0), ampm)
+            if found is None:
+                continue
+            if group("after"):
+                after = after or found
+            else:
+                clock = clock or found
+            continue
+        if group("period") is not None:
+            period = group("period").lower()
+            if group("period_after"):
+                after = after or PERIODS[period]
+            elif clock is None and after is None:
+                clock = PERIODS[period]
+            continue
+        if day is not None:
+            continue
+        if group("iso") is not None:
+            day = ("date", int(group("iso")), int(group("iso_month")), int(group("iso_day")))
+        elif group("slash_month") is not None:
+            year = group("slash_year")
+            if year is None:
+                day = ("month_day", int(group("slash_month")), int(group("slash_day")))
+            else:
+                year = int(year) + (2000 if len(year) == 2 else 0)
+                day = ("date", year, int(group("slash_month")), int(group("slash_day")))
+        elif group("month") is not None:
+            day = ("month_day", MONTHS[group("month").lower()], int(group("month_day")))
+        elif group("day_month") is not None:
+            day = ("month_day", MONTHS[group("day_month").lower()], int(group("day_month_day")))
+        elif group("relative") is not None:
+            day = ("offset", RELATIVE_DAYS[" ".join(group("relative").lower().split())])
+        elif group("in_days") is not None:
+            day = ("offset", int(group("in_days")))
+        else:
+            weekday = WEEKDAYS[group("weekday").lower()] if group("weekday") else 5  # weekend: Saturday
+            day = ("weekday", weekday, (group("which") or "").lower() == "next")
+    return When(day, clock, after)
+
+
+def _resolve(spec, today):
+    """Turn a cached spec into a When of real dates and times"""
+    day, clock, after = spec
+    resolved = None
+    try:
+        if day is None:
+            pass
+        elif day[0] == "date":
+            resolved = date(day[1], day[2], day[3])
+        elif day[0] == "offset":
+            resolved = today + timedelta(days=day[1])
+        elif day[0] == "weekday":
+            ahead = (day[1] - today.weekday()) % 7
+            if day[2] and ahead == 0:
+                ahead = 7
+            resolved = today + timedelta(days=ahead)
+        else:
+            resolved = date(today.year, day[1], day[2])
+            if resolved < today:
+                resolved = date(today.year + 1, day[1], day[2])
+    except ValueError:
+        resolved = None  # February 30th and the like
+    return When(resolved, time(*clock) if clock else None, time(*after) if after else None)
+
+
+class TemporalParser:
+    """Finds the day and time in a phrase, relative to a clock
+
+    "Book 2 for Dune next Friday at 7", "tomorrow evening", "Oct 3rd after
+    6pm", "2026-10-18 (Sunday)" and "6:30 PM" all come back as a When of real
+    date and time values. The grammar is one precompiled pattern, and parsed
+    phrases are kept in an LRU cache of cache_size entries keyed on the
+    normalized phrase, so the same phrase is only ever scanned once; the cache
+    holds relative results, which clock() resolves on every call. parse_many()
+    parses a batch against one reading of the clock.
+    """
+
+    def __init__(self, clock=datetime.now, cache_size=4096):
+        self.clock = clock
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # normalized phrase -> When with a relative day
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _lookup(self, text):
+        key = " ".join(text.lower().split())
+        with self._lock:
+            spec = self._cache.get(key)
+            if spec is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return spec
+        spec = _spec(key)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = spec
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return spec
+
+    def parse(self, text, now=None):
+        """Return the When of a phrase, relative to now (default: the clock)"""
+        if not text:
+            return NOTHING
+        today = (now or self.clock()).date()
+        return _resolve(self._lookup(text), today)
+
+    def parse_many(self, texts, now=None):
+        """Return the When of each phrase, all relative to the same now"""
+        today = (now or self.clock()).date()
+        lookup = self._lookup
+        seen = {"": NOTHING, None: NOTHING}  # logs repeat themselves; resolve each phrase once
+        results = []
+        for text in texts:
+            when = seen.get(text)
+            if when is None:
+                when = seen[text] = _resolve(lookup(text), today)
+            results.append(when)
+        return results
+
+
+def format_day(day, today=None):
+    """Describe a date for the dialogue, e.g. "tomorrow, Sunday 18 October" """
+    today = today or date.today()
+    label = day.strftime("%A %d %B").replace(" 0", " ")
+    if day == today:
+        return f"today, {label}"
+    if day == today + timedelta(days=1):
+        return f"tomorrow, {label}"
+    return label
+
+
+_parser = TemporalParser()
+
+
+def parse_when(text, now=None):
+    """Parse a phrase with the shared parser, see TemporalParser"""
+    return _parser.parse(text, now)
+
+
+def parse_many(texts, now=None):
+    """Parse a batch of phrases with the shared parser"""
+    return _parser.parse_many(texts, now)
+
+
+if __name__ == "__main__":
+    import random
+    import sys
+    import time as timer
+
+    # An offline evaluator re-reading a log of booking utterances
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(5)
+    movies = ["Dune", "Cosmic Dreams", "Heartstrings", "The Last Adventure", "Laugh Out Loud"]
+    days = ["today", "tomorrow", "this weekend", "next friday", "on saturday", "Oct 3rd", "12/24",
+            "2026-11-02", "in 3 days", "tonight", ""]
+    times = ["at 7", "at 6:30 PM", "after 6pm", "in the evening", "9pm", "", "around noon", "at 21:15"]
+    templates = ["Book {n} tickets for {movie} {day} {time}", "{movie} {day} {time} please",
+                 "what's playing {day} {time}", "{n} seats {day} {time}", "hi", "show my bookings"]
+    utterances = [rng.choice(templates).format(n=rng.randint(1, 6), movie=rng.choice(movies),
+                                               day=rng.choice(days), time=rng.choice(times))
+                  for _ in range(count)]
+    now = datetime(2026, 10, 17, 12, 0)
+
+    def legacy(text):
+        # The old engine.extract_date_info and extract_time_info
+        lower = text.lower()
+        day = None
+        if "today" in lower:
+            day = "today"
+        elif "tomorrow" in lower:
+            day = "tomorrow"
+        elif "weekend" in lower:
+            day = "this weekend"
+        else:
+            for name in ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]:
+                if name in lower:
+                    day = f"this {name}"
+                    break
+        found = re.findall(r'(\d{1,2})(?::(\d{2}))?\s*(am|pm|AM|PM)?', text)
+        return day, found[0] if found else None
+
+    sample = utterances[:100_000]
+    started = timer.perf_counter()
+    for text in sample:
+        legacy(text)
+    legacy_rate = len(sample) / (timer.perf_counter() - started)
+
+    def rate(parse, texts):
+        started = timer.perf_counter()
+        for text in texts:
+            parse(text, now)
+        return len(texts) / (timer.perf_counter() - started)
+
+    uncached_rate = rate(TemporalParser(cache_size=0).parse, sample)
+    cached = TemporalParser(cache_size=65536)
+    cached_rate = rate(cached.parse, sample)
+
+    started = timer.perf_counter()
+    parsed = TemporalParser(cache_size=65536).parse_many(utterances, now)
+    batch_rate = count / (timer.perf_counter() - started)
+    dated = sum(1 for when in parsed if when.day)
+    print(f"{count:,} logged utterances, {dated:,} with a day")
+    print(f"  old substring checks (strings only): {legacy_rate:,.0f}/s")
+    print(f"  parse(), no cache: {uncached_rate:,.0f}/s")
+    print(f"  parse() with LRU cache: {cached_rate:,.0f}/s ({cached.hits / len(sample):.0%} hits)")
+    print(f"  parse_many(): {batch_rate:,.0f}/s")
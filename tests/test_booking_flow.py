@@ -0,0 +1,64 @@
+import os
+import shutil
+
+import pytest
+
+from engine import ChatEngine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(__file__)), "movies.json"), tmp_path)
+    return ChatEngine(*(str(tmp_path / name) for name in
+                        ("movies.json", "bookings.json", "users.json", "preferences.json")))
+
+
+# Cosmic Dreams plays City Center Cinemas at 11:00 AM, 2:30, 5:00 and 8:30 PM,
+# and Grand Arena at 1:00, 6:00 and 9:30 PM, every day
+
+
+def test_unscheduled_time_is_refused_and_the_showtimes_offered(engine):
+    reply = engine.respond("s", "Book 2 tickets for Cosmic Dreams tomorrow at 6:30 PM").text
+    assert "isn't showing at 6:30 PM" in reply
+    assert "Showtimes: 11:00 AM, 1:00 PM, 2:30 PM, 5:00 PM, 6:00 PM, 8:30 PM, 9:30 PM" in reply
+    flow = engine.session("s").booking_flow
+    assert flow["time"] is None and flow["step"] == 2
+
+    assert "isn't showing at 7:15 PM" in engine.respond("s", "7:15 pm").text
+    engine.respond("s", "6 pm")
+    assert engine.session("s").booking_flow["time"] == "6:00 PM"
+
+
+def test_only_theaters_showing_the_time_are_offered(engine):
+    reply = engine.respond("s", "Book 2 tickets for Cosmic Dreams tomorrow at 8:30 PM").text
+    assert "City Center Cinemas" in reply and "Grand Arena" not in reply
+    assert "Grand Arena" in engine.respond("s", "Grand Arena").text
+    flow = engine.session("s").booking_flow
+    assert flow["theater"] is None and flow["step"] == 4
+    engine.respond("s", "City Center Cinemas")
+    assert engine.session("s").booking_flow["step"] == 5
+
+
+def test_one_message_booking_checks_the_theater_and_time(engine):
+    reply = engine.respond("s", "Book Cosmic Dreams tomorrow 9 PM at Grand Arena").text
+    assert "isn't showing at 9:00 PM" in reply
+    assert engine.session("s").booking_flow["time"] is None
+
+    reply = engine.respond("t", "Book 2 tickets for Cosmic Dreams tomorrow at 8:30 PM at Grand Arena").text
+    assert "**Grand Arena** isn't showing **Cosmic Dreams** at 8:30 PM" in reply
+    assert engine.session("t").booking_flow["theater"] is None
+
+    engine.respond("u", "Book 2 tickets for Cosmic Dreams tomorrow at 9:30 PM at Grand Arena")
+    assert engine.session("u").booking_flow["step"] == 5
+    assert engine.session("u").hold is not None
+
+
+def test_bare_hour_picks_the_one_showtime_it_matches(engine):
+    engine.respond("s", "Book 2 tickets for Cosmic Dreams tomorrow")
+    assert engine.respond("s", "6").text.startswith("Excellent! 🕐 You've selected **6:00 PM**")
+    assert engine.session("s").booking_flow["step"] == 3
+
+    # 3 is not on the hour of any showtime, so it isn't taken for one
+    engine.respond("t", "Book 2 tickets for Cosmic Dreams tomorrow")
+    assert "Please select a showtime" in engine.respond("t", "3").text
+    assert engine.session("t").booking_flow["time"] is None
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+import booking_ids
+from booking_ids import (BookingIds, id_range, id_time, is_sortable, lease_node,
+                         new_booking_id, normalize_booking_id)
+
+
+def test_ids_increase_and_stay_unique_past_the_per_second_sequence():
+    ids = BookingIds(node=3, clock=lambda: 1_800_000_000)
+    issued = [ids.new_id() for _ in range(5000)]  # several seconds' worth of sequence
+    assert issued == sorted(issued)
+    assert len(set(issued)) == len(issued)
+    assert all(is_sortable(booking_id) for booking_id in issued)
+
+
+def test_ids_are_unique_across_threads():
+    ids = BookingIds(node=1)
+    batches = [[] for _ in range(8)]
+    threads = [threading.Thread(target=lambda batch: batch.extend(ids.new_id() for _ in range(2000)),
+                                args=(batch,)) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    issued = [booking_id for batch in batches for booking_id in batch]
+    assert len(set(issued)) == len(issued)
+
+
+def test_nodes_keep_ids_apart():
+    issued = {BookingIds(node=node, clock=lambda: 1_800_000_000).new_id() for node in range(256)}
+    assert len(issued) == 256
+
+
+def test_id_time_and_range():
+    moment = datetime(2026, 10, 17, 12, 30, tzinfo=timezone.utc)
+    booking_id = BookingIds(node=0, clock=moment.timestamp).new_id()
+    assert id_time(booking_id) == moment
+    low, high = id_range(moment.timestamp(), moment.timestamp() + 1)
+    assert low <= booking_id < high
+    low, high = id_range(moment.timestamp() + 1, moment.timestamp() + 60)
+    assert not low <= booking_id < high
+    assert not is_sortable("BK12345")
+
+
+def test_normalize_reads_look_alikes():
+    booking_id = BookingIds(node=0, clock=lambda: 1_800_000_000).new_id()
+    spoken = "bk " + booking_id[2:].lower().replace("0", "o").replace("1", "l")
+    assert normalize_booking_id(spoken) == booking_id
+    assert normalize_booking_id(" bk12345 ") == "BK12345"
+
+
+def test_lease_is_shared_within_a_process(tmp_path, monkeypatch):
+    monkeypatch.delenv("BOOKING_NODE", raising=False)
+    assert lease_node(str(tmp_path)) == lease_node(str(tmp_path))
+    assert BookingIds(directory=str(tmp_path)).node == lease_node(str(tmp_path))
+
+
+def test_booking_node_variable_wins(tmp_path, monkeypatch):
+    monkeypatch.setenv("BOOKING_NODE", "300")
+    assert BookingIds(directory=str(tmp_path)).node == 300 % 256
+
+
+def issue(directory, count, barrier, queue):
+    """Child process: report its leased node and count new booking ids"""
+    os.environ.pop("BOOKING_NODE", None)
+    node = lease_node(directory)
+    barrier.wait(30)  # every process holds its lease at once
+    queue.put((node, [new_booking_id(directory) for _ in range(count)]))
+
+
+@pytest.mark.skipif(booking_ids.fcntl is None or not hasattr(os, "fork"), reason="needs fcntl and fork")
+def test_processes_lease_distinct_nodes(tmp_path):
+    context = multiprocessing.get_context("fork")
+    queue, barrier = context.Queue(), context.Barrier(6)
+    processes = [context.Process(target=issue, args=(str(tmp_path), 3000, barrier, queue)) for _ in range(6)]
+    for process in processes:
+        process.start()
+    results = [queue.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    nodes = [node for node, _ in results]
+    assert len(set(nodes)) == len(nodes)
+    issued = [booking_id for _, batch in results for booking_id in batch]
+    assert len(set(issued)) == len(issued)
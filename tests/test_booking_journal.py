@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from booking_journal import BookingJournal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = BookingJournal(str(tmp_path / "bookings.json"))
+    yield journal
+    journal.close()
+
+
+def test_failed_fsync_reaches_the_waiting_writer(journal, monkeypatch, capsys):
+    journal.retry_interval = 0.01
+    sync = journal._sync
+    failing = threading.Event()
+    failing.set()
+
+    def flaky_sync():
+        if failing.is_set():
+            raise OSError("disk on fire")
+        sync()
+    monkeypatch.setattr(journal, "_sync", flaky_sync)
+
+    with pytest.raises(OSError, match="disk on fire"):
+        journal.add({"booking_id": "BK0", "username": "demo"})
+    assert "disk on fire" in capsys.readouterr().err
+
+    # The commit thread lives on and syncs everything once the disk recovers
+    failing.clear()
+    assert journal.add({"booking_id": "BK1", "username": "demo"})
+    assert [b["booking_id"] for b in journal.all()] == ["BK0", "BK1"]
+
+
+def wait_for_compaction(journal):
+    for _ in range(500):
+        if not journal._journal_records:
+            return
+        time.sleep(0.01)
+    raise AssertionError("journal was never compacted")
+
+
+def test_compaction_waits_longer_as_the_snapshot_grows(tmp_path):
+    journal = BookingJournal(str(tmp_path / "bookings.json"), compact_threshold=4, compact_ratio=2)
+    for i in range(4):
+        journal.add({"booking_id": f"BK{i}", "username": "demo"})
+    wait_for_compaction(journal)
+
+    # Four rows in the snapshot now, so the next compaction is due at eight records
+    for i in range(4, 11):
+        journal.add({"booking_id": f"BK{i}", "username": "demo"})
+    time.sleep(0.1)
+    assert journal._journal_records == 7
+    journal.add({"booking_id": "BK11", "username": "demo"})
+    wait_for_compaction(journal)
+    journal.close()
+
+    with open(journal.bookings_file) as f:
+        assert len(json.load(f)["bookings"]) == 12
+    assert os.path.getsize(journal.journal_file) == 0
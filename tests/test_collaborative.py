@@ -0,0 +1,92 @@
+import math
+import os
+import shutil
+
+import pytest
+
+from collaborative import NeighborTable, SHRINKAGE, train, write_table
+from engine import ChatEngine
+
+# Who booked what: A and B share three viewers, A and C one, D is booked alone
+BOOKINGS = [
+    ("ann", "A"), ("ann", "B"), ("ann", "C"),
+    ("bob", "A"), ("bob", "B"),
+    ("cat", "A"), ("cat", "B"),
+    ("dan", "D"),
+    ("eve", "C"), ("eve", "C"),  # booking a movie twice counts once
+    ("fay", "B", "cancelled"),   # cancelled bookings don't count
+]
+
+
+def bookings():
+    for n, (username, movie, *status) in enumerate(BOOKINGS):
+        yield {"booking_id": f"BK{n}", "username": username, "movie": movie,
+               "status": status[0] if status else "confirmed"}
+
+
+def similarity(shared, viewers_a, viewers_b):
+    return round(shared / math.sqrt(viewers_a * viewers_b) * shared / (shared + SHRINKAGE), 4)
+
+
+def test_train_builds_shrunk_cosine_neighbors():
+    table = train(bookings())
+    assert table["bookings"] == 10 and table["users"] == 5
+    neighbors = {table["movies"][i]: {table["movies"][j]: s for j, s in found}
+                 for i, found in enumerate(table["neighbors"])}
+    viewers = dict(zip(table["movies"], table["viewers"]))
+    assert viewers == {"A": 3, "B": 3, "C": 2, "D": 1}
+    assert neighbors["A"] == {"B": similarity(3, 3, 3), "C": similarity(1, 3, 2)}
+    assert neighbors["C"] == {"A": similarity(1, 2, 3), "B": similarity(1, 2, 3)}
+    assert neighbors["D"] == {}
+    # Most similar first
+    assert [table["movies"][j] for j, _ in table["neighbors"][table["movies"].index("A")]] == ["B", "C"]
+
+
+def test_train_keeps_the_k_nearest():
+    table = train(bookings(), k=1)
+    assert all(len(found) <= 1 for found in table["neighbors"])
+
+
+def test_similar_sums_over_the_given_movies(tmp_path):
+    table_file = str(tmp_path / "movie_neighbors.json")
+    neighbors = NeighborTable(table_file)
+    assert not neighbors.loaded()
+    write_table(train(bookings()), table_file)
+    neighbors.refresh(force=True)
+    assert neighbors.loaded()
+
+    found = dict(neighbors.similar(["a", "c"], k=3, exclude=["A", "C"]))
+    assert found == {"B": pytest.approx(similarity(3, 3, 3) + similarity(1, 2, 3))}
+    assert neighbors.similar(["D", "unknown"]) == []
+
+
+@pytest.fixture
+def engine(tmp_path):
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(__file__)), "movies.json"), tmp_path)
+    return ChatEngine(*(str(tmp_path / name) for name in
+                        ("movies.json", "bookings.json", "users.json", "preferences.json",
+                         "movie_neighbors.json")))
+
+
+def test_recommendations_skip_storage_for_guests_and_without_a_table(engine, monkeypatch):
+    calls = []
+    recent = engine.storage.recent_bookings_for_user
+    monkeypatch.setattr(engine.storage, "recent_bookings_for_user",
+                        lambda *args, **kwargs: calls.append(args) or recent(*args, **kwargs))
+    engine.session("member", "demo")
+    assert "RECOMMENDATIONS" in engine.handle_recommendation(engine.session("member"), "recommend")
+    assert calls == []  # no table yet
+
+    titles = [movie["title"] for movie in engine.catalog.movies()[:2]]
+    write_table(train({"username": f"user{n}", "movie": title} for n in range(3) for title in titles),
+                engine.neighbors_file)
+    engine.neighbors.refresh(force=True)
+    engine.handle_recommendation(engine.session("guest-session"), "recommend")
+    assert calls == []
+
+    engine.storage.add_booking({"booking_id": "BK1", "username": "demo", "movie": titles[0],
+                                "status": "confirmed"})
+    reply = engine.handle_recommendation(engine.session("member"), "recommend")
+    assert len(calls) == 1
+    assert f"Moviegoers who booked **{titles[0]}** also booked" in reply
+    assert f"1. **{titles[1]}**" in reply
@@ -0,0 +1,46 @@
+import os
+import time
+
+from conversation_log import ConversationLog
+
+
+def open_log(tmp_path, **options):
+    return ConversationLog(str(tmp_path / "log"), str(tmp_path / "conversation_history.json"),
+                           flush_interval=0.01, **options)
+
+
+def test_replay_finds_one_sessions_turns_across_frames_and_segments(tmp_path):
+    log = open_log(tmp_path, frame_turns=3, segment_bytes=1)  # a new segment every write
+    for n in range(10):
+        log.write(f"s{n % 2}", "user", f"message {n}", username="demo")
+        if n % 4 == 3:
+            log.flush()
+    assert [turn["message"] for turn in log.replay("s1")] == [f"message {n}" for n in range(1, 10, 2)]
+    assert len(log.index.read()["segments"]) > 1
+    assert log.replay("nobody") == []
+    log.close()
+
+    log = open_log(tmp_path)  # a later process reads the earlier segments
+    assert [turn["message"] for turn in log.replay("s0")] == [f"message {n}" for n in range(0, 10, 2)]
+    log.close()
+
+
+def test_close_writes_queued_turns(tmp_path):
+    log = open_log(tmp_path)
+    log.write("s", "bot", "bye")
+    log.close()
+    assert os.listdir(tmp_path / "log")
+    log = open_log(tmp_path)
+    assert [turn["message"] for turn in log.replay("s")] == ["bye"]
+    log.close()
+
+
+def test_idle_segments_expire(tmp_path):
+    log = open_log(tmp_path, retention_days=1)
+    log.write("s", "user", "hello")
+    log.flush()
+    assert log.expire() == 0
+    log.close()
+    assert log.expire(time.time() + 2 * 86400) == 1
+    assert log.index.read()["segments"] == []
+    assert os.listdir(tmp_path / "log") == []
@@ -0,0 +1,40 @@
+import os
+import shutil
+
+from engine import ChatEngine
+from events import BOOKING_FLOW, EventBus
+
+
+def test_subscribers_get_their_topic_only():
+    bus = EventBus()
+    seen, queued = [], []
+    bus.subscribe("a", lambda *args: seen.append(("a",) + args))
+    bus.subscribe("b", lambda *args: seen.append(("b",) + args))
+    bus.subscribe("a", lambda *args: seen.append(("dispatched",) + args), dispatch=queued.append)
+    bus.publish("a", 1, 2)
+    assert seen == [("a", 1, 2)]
+    queued.pop()()  # run where the dispatcher chose to
+    assert seen == [("a", 1, 2), ("dispatched", 1, 2)]
+    bus.publish("nobody listens")
+
+
+def test_unsubscribed_callbacks_stop_hearing():
+    bus = EventBus()
+    seen = []
+    bus.subscribe("a", seen.append)
+    bus.publish("a", 1)
+    bus.unsubscribe("a", seen.append)
+    bus.publish("a", 2)
+    assert seen == [1]
+
+
+def test_engine_publishes_booking_flow_changes_only(tmp_path):
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(__file__)), "movies.json"), tmp_path)
+    engine = ChatEngine(*(str(tmp_path / name) for name in
+                          ("movies.json", "bookings.json", "users.json", "preferences.json")))
+    flows = []
+    engine.events.subscribe(BOOKING_FLOW, lambda session_id, flow: flows.append((session_id, flow["step"])))
+    engine.respond("s", "hello there")
+    assert flows == []
+    engine.respond("s", "Book 2 tickets for Cosmic Dreams")
+    assert flows == [("s", 1)]
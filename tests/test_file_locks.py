@@ -0,0 +1,150 @@
+import json
+import multiprocessing
+import os
+import stat
+
+import pytest
+
+import file_locks
+from booking_journal import BookingJournal
+from file_locks import FileLock, JSONDocument, atomic_write_json
+
+needs_fork = pytest.mark.skipif(file_locks.fcntl is None or not hasattr(os, "fork"),
+                                reason="needs fcntl and fork")
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_atomic_write_keeps_the_file_mode(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text("{}")
+    os.chmod(path, 0o640)
+    atomic_write_json(str(path), {"users": []})
+    assert mode(path) == 0o640
+    assert json.loads(path.read_text()) == {"users": []}
+
+
+def test_atomic_write_gives_a_new_file_the_umask_mode(tmp_path):
+    path = tmp_path / "new.json"
+    atomic_write_json(str(path), [])
+    assert mode(path) == 0o666 & ~file_locks._UMASK
+
+
+def test_failed_atomic_write_leaves_the_old_file(tmp_path):
+    path = tmp_path / "users.json"
+    atomic_write_json(str(path), {"users": ["demo"]})
+    with pytest.raises(TypeError):
+        atomic_write_json(str(path), {"users": {"not", "json"}})
+    assert json.loads(path.read_text()) == {"users": ["demo"]}
+    assert os.listdir(tmp_path) == ["users.json"]
+
+
+def test_lock_is_reentrant_but_not_upgradable(tmp_path):
+    lock = FileLock(str(tmp_path / "data.json"))
+    with lock.exclusive():
+        with lock.shared():
+            pass
+    with lock.shared():
+        with pytest.raises(RuntimeError):
+            with lock.exclusive():
+                pass
+
+
+def count(path, times):
+    """Child process: increment a shared counter"""
+    document = JSONDocument(path, {"count": 0})
+    for _ in range(times):
+        document.update(lambda data: data.update(count=data.get("count", 0) + 1))
+
+
+@needs_fork
+def test_document_updates_from_processes_are_never_lost(tmp_path):
+    path = str(tmp_path / "preferences.json")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=count, args=(path, 15)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+    assert JSONDocument(path, {}).read()["count"] == 60
+
+
+def book(bookings_file, n, times):
+    """Child process: add bookings to a journal that compacts often"""
+    journal = BookingJournal(bookings_file, compact_threshold=20)
+    for i in range(times):
+        journal.add({"booking_id": f"BK{n}-{i}", "username": f"user{n}", "tickets": 1})
+    journal.close()
+
+
+@needs_fork
+def test_journal_keeps_every_booking_from_every_process(tmp_path):
+    bookings_file = str(tmp_path / "bookings.json")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=book, args=(bookings_file, n, 60)) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    journal = BookingJournal(bookings_file)
+    ids = [booking["booking_id"] for booking in journal.all()]
+    journal.close()
+    assert sorted(ids) == sorted(f"BK{n}-{i}" for n in range(4) for i in range(60))
+
+
+def test_journal_replays_after_reopening(tmp_path):
+    bookings_file = str(tmp_path / "bookings.json")
+    journal = BookingJournal(bookings_file)
+    for i in range(5):
+        journal.add({"booking_id": f"BK{i}", "username": "demo", "status": "confirmed"})
+    journal.update("BK1", {"status": "cancelled"})
+    journal.delete("BK2")
+    journal.close()
+    # Nothing is in the snapshot yet: the state comes from the journal
+    assert not os.path.exists(bookings_file)
+
+    journal = BookingJournal(bookings_file)
+    assert [b["booking_id"] for b in journal.all()] == ["BK0", "BK1", "BK3", "BK4"]
+    assert journal.get("BK1")["status"] == "cancelled"
+    journal.close()
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    bookings_file = str(tmp_path / "bookings.json")
+    journal = BookingJournal(bookings_file)
+    for i in range(5):
+        journal.add({"booking_id": f"BK{i}", "username": "demo"})
+    journal.delete("BK0")
+    journal.compact()
+    assert os.path.getsize(journal.journal_file) == 0
+    with open(bookings_file) as f:
+        snapshot = json.load(f)
+    assert [b["booking_id"] for b in snapshot["bookings"]] == ["BK1", "BK2", "BK3", "BK4"]
+    journal.add({"booking_id": "BK5", "username": "demo"})
+    journal.close()
+
+    journal = BookingJournal(bookings_file)
+    assert [b["booking_id"] for b in journal.all()] == ["BK1", "BK2", "BK3", "BK4", "BK5"]
+    journal.close()
+
+
+def test_torn_journal_line_is_dropped(tmp_path):
+    bookings_file = str(tmp_path / "bookings.json")
+    journal = BookingJournal(bookings_file)
+    journal.add({"booking_id": "BK0", "username": "demo"})
+    journal.close()
+    with open(journal.journal_file, "ab") as f:
+        f.write(b'{"op":"add","booking":{"booking_id":"BK')  # a writer died mid-line
+
+    journal = BookingJournal(bookings_file)
+    assert [b["booking_id"] for b in journal.all()] == ["BK0"]
+    journal.add({"booking_id": "BK1", "username": "demo"})
+    journal.close()
+    journal = BookingJournal(bookings_file)
+    assert [b["booking_id"] for b in journal.all()] == ["BK0", "BK1"]
+    journal.close()
@@ -0,0 +1,48 @@
+import random
+
+from engine import ChatEngine
+from intents import IntentClassifier
+
+
+def cascade(table, message):
+    """The if/elif chain IntentClassifier replaces"""
+    message = message.lower()
+    for name, keywords in table:
+        if any(word in message for word in keywords):
+            return name
+    return None
+
+
+def test_matches_cascade_on_chatbot_table():
+    classifier = IntentClassifier(ChatEngine.INTENTS)
+    for message in ["hello there", "I want to book 2 tickets", "what movies are playing",
+                    "show my bookings", "please cancel booking BK12345", "how much is VIP",
+                    "recommend something", "what can you do", "thanks!", "", "zzz",
+                    "THIS is it", "view bookings and cancel one"]:
+        match = classifier.classify(message)
+        assert (match.intent if match else None) == cascade(ChatEngine.INTENTS, message), message
+
+
+def test_matches_cascade_with_overlapping_keywords():
+    # Keywords inside and overlapping others, in both priority orders
+    table = [("a", ["abc", "cd"]), ("b", ["bcde", "b"]), ("c", ["de", "e"]), ("d", ["abcdef"])]
+    rng = random.Random(0)
+    for reverse in (False, True):
+        ordered = table[::-1] if reverse else table
+        classifier = IntentClassifier(ordered)
+        for _ in range(2000):
+            message = "".join(rng.choice("abcdef ") for _ in range(rng.randrange(12)))
+            match = classifier.classify(message)
+            assert (match.intent if match else None) == cascade(ordered, message), message
+
+
+def test_spans_point_at_the_keywords():
+    classifier = IntentClassifier(ChatEngine.INTENTS)
+    message = "Cancel my order, then cancel the other. How much?"
+    match = classifier.classify(message)
+    assert match.intent == "cancel"
+    assert [message[start:end] for start, end in match.spans] == ["Cancel", "cancel"]
+    message = "What does a VIP seat cost, how much?"
+    match = classifier.classify(message)
+    assert match.intent == "price"
+    assert [message[start:end] for start, end in match.spans] == ["cost", "how much"]
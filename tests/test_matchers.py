@@ -0,0 +1,33 @@
+import os
+import shutil
+
+from engine import ChatEngine
+from fuzzy_matcher import FuzzyMatcher
+from title_matcher import TitleMatcher
+
+TITLES = {1: "Cosmic Dreams", 2: "The Last Horizon", 3: "Dreams", 4: "Cosmic Dreams"}
+
+
+def test_title_matcher_finds_every_title_and_prefers_the_longest():
+    matcher = TitleMatcher(TITLES)
+    assert len(matcher) == 4
+    assert matcher.find_all("two for cosmic dreams tonight") == [(1, 2, 4), (4, 2, 4), (3, 3, 4)]
+    assert matcher.find("Cosmic Dreams please") == 1
+    assert matcher.find("the last horizon") == 2
+    assert matcher.find("nothing here") is None
+
+
+def test_fuzzy_matcher_forgives_typos_and_articles():
+    matcher = FuzzyMatcher(TITLES)
+    assert len(matcher) == 4
+    assert matcher.find("one ticket for cosmic draems") == (1, 1)
+    assert matcher.find("last horizon at 7") == (2, 0)
+    assert matcher.find("completely unrelated") is None
+
+
+def test_misspelled_titles_start_a_booking(tmp_path):
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(__file__)), "movies.json"), tmp_path)
+    engine = ChatEngine(*(str(tmp_path / name) for name in
+                          ("movies.json", "bookings.json", "users.json", "preferences.json")))
+    engine.respond("s", "book 2 tickets for cosmic draems")
+    assert engine.session("s").booking_flow["movie"] == "Cosmic Dreams"
@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from preference_cache import PreferenceCache
+
+
+class Storage:
+    """In-memory stand-in that counts calls and can be made to fail"""
+
+    def __init__(self, saved=None):
+        self.saved = dict(saved or {})
+        self.batches = []
+        self.fail = False
+        self.written = threading.Event()
+
+    def load_preferences(self, username):
+        return self.saved.get(username)
+
+    def save_many_preferences(self, batch):
+        if self.fail:
+            raise OSError("disk full")
+        self.batches.append(batch)
+        self.saved.update(batch)
+        self.written.set()
+
+
+def test_loads_are_cached_and_copied():
+    storage = Storage({"demo": {"genre": "Drama"}})
+    cache = PreferenceCache(storage, flush_interval=60)
+    preferences = cache.load("demo")
+    preferences["genre"] = "Comedy"
+    assert cache.load("demo") == {"genre": "Drama"}
+    assert cache.load("nobody") is None
+    assert cache.loads == 2
+    cache.close()
+
+
+def test_saves_in_an_interval_coalesce_into_one_write():
+    storage = Storage()
+    cache = PreferenceCache(storage, flush_interval=0.2)
+    for n in range(20):
+        cache.save(f"user{n % 4}", {"genre": f"genre{n}"})
+    assert storage.written.wait(5)
+    assert storage.batches == [{f"user{n}": {"genre": f"genre{16 + n}"} for n in range(4)}]
+    cache.close()
+
+
+def test_dirty_profiles_outlive_eviction():
+    storage = Storage({f"user{n}": {} for n in range(5)})
+    cache = PreferenceCache(storage, flush_interval=60, capacity=2)
+    cache.save("demo", {"genre": "Drama"})
+    for n in range(5):
+        cache.load(f"user{n}")
+    assert cache.load("demo") == {"genre": "Drama"}
+    assert "demo" not in storage.saved
+    cache.close()
+    assert storage.saved["demo"] == {"genre": "Drama"}
+
+
+def test_a_failed_write_is_retried_keeping_newer_saves():
+    storage = Storage()
+    cache = PreferenceCache(storage, flush_interval=60)
+    cache.save("demo", {"genre": "Drama"})
+    storage.fail = True
+    with pytest.raises(OSError):
+        cache.flush()
+    storage.fail = False
+    cache.save("ann", {"genre": "Comedy"})
+    cache.close()
+    assert storage.saved == {"demo": {"genre": "Drama"}, "ann": {"genre": "Comedy"}}
@@ -0,0 +1,56 @@
+import pytest
+
+import recommender
+from recommender import Recommender, synthetic_movies
+
+MOVIES = [
+    {"title": "Cosmic Dreams", "genre": "Sci-Fi", "rating": "PG-13", "imdb": 7.0, "popularity": 60,
+     "duration": "2h"},
+    {"title": "Love in Paris", "genre": "Romance/Drama", "rating": "PG", "imdb": 6.5, "popularity": 50,
+     "duration": "1h 45m"},
+    {"title": "The Heist", "genre": "Thriller", "rating": "R", "imdb": 8.5, "popularity": 90,
+     "duration": "2h 10m"},
+    {"title": "Quiet Hours", "genre": "Drama", "imdb": 5.0, "popularity": 20, "duration": "1h 30m"},
+]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(recommender, "np", None)
+    elif recommender.np is None:
+        pytest.skip("needs NumPy")
+
+
+def titles(movies):
+    return [movie["title"] for movie in movies]
+
+
+def test_without_preferences_good_popular_movies_lead(backend):
+    assert titles(Recommender(MOVIES).recommend(None, k=2)) == ["The Heist", "Cosmic Dreams"]
+
+
+def test_the_learned_genre_and_favorites_pull_movies_up(backend):
+    ranker = Recommender(MOVIES)
+    assert titles(ranker.recommend({"genre": "sci-fi"}, k=1)) == ["Cosmic Dreams"]
+    # Love in Paris shares Drama with the favorite
+    assert titles(ranker.recommend({}, k=1, exclude=["Quiet Hours"])) == ["The Heist"]
+    assert titles(ranker.recommend({"favorite_movies": ["Quiet Hours"]}, k=1,
+                                   exclude=["quiet hours"])) == ["Love in Paris"]
+
+
+def test_exclude_and_k_are_clamped(backend):
+    ranker = Recommender(MOVIES)
+    assert titles(ranker.recommend({}, k=10, exclude=["The Heist", "Unknown"])) == [
+        "Cosmic Dreams", "Love in Paris", "Quiet Hours"]
+    assert ranker.recommend({}, k=3, exclude=titles(MOVIES)) == []
+    assert Recommender([]).recommend({}) == []
+
+
+def test_many_users_rank_as_one_at_a_time(backend, monkeypatch):
+    monkeypatch.setattr(recommender, "BATCH_CELLS", 1000)  # several blocks of users
+    ranker = Recommender(synthetic_movies(300, seed=2))
+    users = [{}, {"genre": "Horror"}, {"favorite_movies": ["Movie 7", "Movie 42"]},
+             {"genre": "comedy", "favorite_movies": ["Movie 1"]}] * 3
+    assert [titles(found) for found in ranker.recommend_many(users, k=5)] == [
+        titles(ranker.recommend(user, k=5)) for user in users]
@@ -0,0 +1,76 @@
+from datetime import date, datetime, time, timedelta
+
+from schedule import build_schedule, format_showtime, parse_duration, synthetic_catalog
+
+FIRST_DAY = date(2026, 9, 1)  # a Tuesday
+
+
+def catalog(rules, **movie):
+    return {"movies": [dict({"id": 1, "title": "Cosmic Dreams", "duration": "2h"}, **movie)],
+            "theaters": [{"id": 1, "name": "Grand Arena"}, {"id": 2, "name": "Royal IMAX"}],
+            "schedule": rules}
+
+
+def test_parse_duration_and_format_showtime():
+    assert parse_duration("2h 15m") == 135
+    assert parse_duration("95m") == 95
+    assert parse_duration("") == 120
+    assert format_showtime(time(18, 30)) == "6:30 PM"
+    assert format_showtime(time(0, 5)) == "12:05 AM"
+
+
+def test_rules_expand_between_their_dates_on_their_weekdays():
+    schedule = build_schedule(catalog([
+        {"movie": 1, "theater": 1, "times": ["7:00 PM", "1:30 PM"], "from": "2026-09-01",
+         "to": "2026-09-14", "days": [5, 6]},
+    ]), today=FIRST_DAY)
+    days = sorted({s.start.date() for s in schedule.starting(datetime(2026, 8, 1), datetime(2026, 10, 1))})
+    assert days == [date(2026, 9, 5), date(2026, 9, 6), date(2026, 9, 12), date(2026, 9, 13)]
+    assert schedule.showtimes(date(2026, 9, 5)) == ["1:30 PM", "7:00 PM"]
+    assert schedule.showtimes(date(2026, 9, 7)) == []
+
+
+def test_open_ended_rules_run_for_the_horizon():
+    schedule = build_schedule(catalog([{"movie": 1, "theater": 1, "times": ["7:00 PM"]}]),
+                              today=FIRST_DAY, horizon_days=3)
+    assert [s.start for s in schedule.starting(datetime(2026, 1, 1), datetime(2027, 1, 1))] == [
+        datetime(2026, 9, day, 19) for day in (1, 2, 3)]
+    assert schedule.today == FIRST_DAY
+
+
+def test_catalog_without_rules_plays_everything_everywhere():
+    data = catalog(None, showtimes=["6:30 PM"])
+    del data["schedule"]
+    schedule = build_schedule(data, today=FIRST_DAY, horizon_days=1)
+    assert schedule.theaters_showing(1, datetime(2026, 9, 1, 18, 30)) == [1, 2]
+    assert schedule.theaters_showing(1, datetime(2026, 9, 1, 19, 0)) == []
+
+
+def test_playing_at_finds_long_screenings_started_earlier():
+    schedule = build_schedule(catalog([
+        {"movie": 1, "theater": 1, "times": ["6:00 PM"], "from": "2026-09-01", "to": "2026-09-01"},
+    ], duration="3h 30m"), today=FIRST_DAY)
+    assert len(schedule.playing_at(datetime(2026, 9, 1, 21, 29))) == 1
+    assert schedule.playing_at(datetime(2026, 9, 1, 21, 30)) == []
+    assert schedule.playing_at(datetime(2026, 9, 1, 17, 59)) == []
+
+
+def test_indexed_queries_match_a_scan():
+    data = synthetic_catalog(movies=6, theaters=4, screens=3, days=30, first_day=FIRST_DAY)
+    schedule = build_schedule(data, today=FIRST_DAY)
+    everything = schedule.starting(datetime(2026, 1, 1), datetime(2027, 1, 1))
+    assert len(everything) == len(schedule)
+    assert [s.start for s in everything] == sorted(s.start for s in everything)
+
+    for offset in (0, 9, 29):
+        day = FIRST_DAY + timedelta(days=offset)
+        for movie_id in (None, 1, 4):
+            for theater_id in (None, 2):
+                expected = [s for s in everything if s.start.date() == day
+                            and movie_id in (None, s.movie_id) and theater_id in (None, s.theater_id)]
+                assert sorted(schedule.on_day(day, movie_id, theater_id)) == sorted(expected)
+        moment = datetime.combine(day, time(21, 0))
+        expected = [s for s in everything if s.start <= moment < s.end]
+        assert sorted(schedule.playing_at(moment)) == sorted(expected)
+        after = [s for s in everything if s.start.date() == day and s.start.time() >= time(17)]
+        assert sorted(schedule.on_day(day, after=time(17))) == sorted(after)
@@ -0,0 +1,214 @@
+import multiprocessing
+import os
+import shutil
+import threading
+
+import pytest
+
+from engine import ChatEngine, new_booking_flow
+from seating import SeatInventory, ShowSeats, booking_show, parse_seat_label, seat_label
+from storage import open_storage
+from timer_wheel import TimerWheel
+
+SHOW = ("Cosmic Dreams", "Grand Arena", "2026-10-18", "7:00 PM")
+
+
+def test_seat_labels_round_trip():
+    for row, seat in [(0, 0), (0, 6), (25, 19), (26, 0), (51, 3)]:
+        assert parse_seat_label(seat_label(row, seat)) == (row, seat)
+    assert seat_label(0, 6) == "A7"
+
+
+def test_take_prefers_a_centered_block_in_the_middle_row():
+    seats = ShowSeats(5, 10)
+    assert seats.take(4) == [(2, 3), (2, 4), (2, 5), (2, 6)]
+    assert seats.available == 46
+
+
+def test_take_together_needs_one_block():
+    seats = ShowSeats(2, 4)
+    assert seats.mark([(0, 1), (1, 2)])
+    assert seats.take(3, together=True) is None
+    taken = seats.take(3)
+    assert len(taken) == 3 and seats.available == 3
+    assert seats.take(4) is None
+
+
+def test_booking_show_normalizes_date_and_time():
+    shows = {booking_show({"movie": "M", "theater": "T", "date": day, "time": start})
+             for day, start in [("2026-10-18", "7:00 PM"), ("2026-10-18 (Sunday)", "19:00"),
+                                ("2026-10-18", "7 pm")]}
+    assert shows == {("M", "T", "2026-10-18", "7:00 PM")}
+
+
+def test_holds_never_share_seats():
+    inventory = SeatInventory(lambda theater: (3, 4))
+    holds = [inventory.hold(SHOW, 2) for _ in range(6)]
+    seats = [label for hold in holds for label in hold.seats]
+    assert len(set(seats)) == 12
+    assert inventory.hold(SHOW, 1) is None
+    assert inventory.release(holds[0].hold_id)
+    assert not inventory.release(holds[0].hold_id)
+    assert inventory.available(SHOW) == 2
+
+
+def test_hold_expires_and_frees_its_seats():
+    inventory = SeatInventory(lambda theater: (1, 4))
+    inventory.timers = TimerWheel(tick=0.01, on_expire=inventory._expire)
+    expired = threading.Event()
+    hold = inventory.hold(SHOW, 4, ttl=0.05, on_expire=lambda hold: expired.set())
+    assert inventory.available(SHOW) == 0
+    assert expired.wait(2)
+    assert inventory.available(SHOW) == 4 and inventory.holds() == 0
+    assert inventory.commit(hold.hold_id) is None
+
+
+def test_committed_hold_does_not_expire():
+    inventory = SeatInventory(lambda theater: (1, 4))
+    inventory.timers = TimerWheel(tick=0.01, on_expire=inventory._expire)
+    expired = threading.Event()
+    hold = inventory.hold(SHOW, 2, ttl=0.05, on_expire=lambda hold: expired.set())
+    assert inventory.commit(hold.hold_id) == hold
+    assert not expired.wait(0.2)
+    assert inventory.available(SHOW) == 2
+
+
+def sell(directory, n, backend, barrier, rounds=6):
+    """Child process: try to buy a pair of seats each round until the show is full"""
+    os.chdir(directory)
+    storage = open_storage(backend=backend, db_file="moviebot.db")
+    inventory = SeatInventory(lambda theater: (2, 5), storage)
+    for attempt in range(rounds):
+        # Half the processes write the date and time the way the quick form does
+        booking = {"booking_id": f"BK{n}-{attempt}", "username": f"user{n}", "movie": SHOW[0],
+                   "theater": SHOW[1], "date": "2026-10-18 (Sunday)" if n % 2 else "2026-10-18",
+                   "time": "19:00" if n % 2 else "7:00 PM", "tickets": 2, "status": "confirmed"}
+        hold = inventory.hold(booking_show(booking), 2)
+        # Everyone holds before anyone saves, so the holds overlap
+        barrier.wait(30)
+        if hold is None:
+            continue
+        booking["seats"] = hold.seats
+        if storage.add_booking(booking, check=inventory.fits):
+            inventory.commit(hold.hold_id)
+        else:
+            inventory.release(hold.hold_id)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_processes_sharing_storage_never_oversell(tmp_path, backend):
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(4)
+    processes = [context.Process(target=sell, args=(str(tmp_path), n, backend, barrier)) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path)
+    try:
+        storage = open_storage(backend=backend, db_file="moviebot.db")
+        seats = [label for booking in storage.all_bookings() for label in booking["seats"]]
+    finally:
+        os.chdir(cwd)
+    assert len(seats) == 10
+    assert len(set(seats)) == 10
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    return open_storage(*(str(tmp_path / name) for name in ("bookings.json", "users.json", "preferences.json")),
+                        backend=request.param, db_file=str(tmp_path / "moviebot.db"))
+
+
+def booking(booking_id, seats, **fields):
+    return dict({"booking_id": booking_id, "username": "demo", "movie": SHOW[0], "theater": SHOW[1],
+                 "date": SHOW[2], "time": SHOW[3], "tickets": len(seats), "seats": seats,
+                 "status": "confirmed"}, **fields)
+
+
+def test_inventory_follows_sales_and_cancellations_in_the_storage(storage):
+    inventory = SeatInventory(lambda theater: (1, 4), storage)
+    storage.add_booking(booking("BK1", ["A1"]))
+    storage.add_booking(booking("BK2", ["A2"], date="2026-10-19"))  # another show
+    assert inventory.available(SHOW) == 3
+
+    # Written behind its back, as by another process
+    storage.add_booking(booking("BK3", ["A3"]))
+    assert inventory.available(SHOW) == 2
+    storage.update_booking("BK1", {"status": "cancelled"})
+    storage.delete_booking("BK3")
+    assert inventory.available(SHOW) == 4
+
+
+def test_releasing_a_hold_keeps_a_seat_sold_elsewhere(storage):
+    inventory = SeatInventory(lambda theater: (1, 4), storage)
+    hold = inventory.hold(SHOW, 4)
+    storage.add_booking(booking("BK1", ["A2"]))  # another process sold one of the held seats
+    assert inventory.available(SHOW) == 0
+    assert inventory.release(hold.hold_id)
+    assert inventory.available(SHOW) == 3
+
+
+def test_committed_sale_is_counted_once(storage):
+    inventory = SeatInventory(lambda theater: (1, 4), storage)
+    hold = inventory.hold(SHOW, 2)
+    sale = booking("BK1", hold.seats)
+    assert storage.add_booking(sale, check=inventory.fits)
+    assert inventory.available(SHOW) == 2  # read back before the commit
+    assert inventory.commit(hold.hold_id, sale) == hold
+    assert inventory.available(SHOW) == 2
+    storage.update_booking("BK1", {"status": "cancelled"})
+    assert inventory.available(SHOW) == 4
+
+
+def test_falling_behind_the_change_log_rereads_the_show(tmp_path):
+    storage = open_storage(*(str(tmp_path / name) for name in ("bookings.json", "users.json", "preferences.json")))
+    storage.journal.change_log_size = 3
+    inventory = SeatInventory(lambda theater: (1, 8), storage)
+    assert inventory.available(SHOW) == 8
+    for n in range(5):
+        storage.add_booking(booking(f"BK{n}", [f"A{n + 1}"]))
+    assert storage.changes_since(inventory._seen)[0] is None
+    assert inventory.available(SHOW) == 3
+
+
+def test_fits_only_sees_the_same_show(storage):
+    inventory = SeatInventory(lambda theater: (1, 2), storage)
+    seen = []
+
+    def check(new, others):
+        seen.append([other["booking_id"] for other in others])
+        return inventory.fits(new, others)
+
+    assert storage.add_booking(booking("BK1", ["A1"], date="2026-10-18 (Sunday)", time="19:00"), check=check)
+    assert storage.add_booking(booking("BK2", ["A1"], date="2026-10-19"), check=check)
+    assert not storage.add_booking(booking("BK3", ["A1"]), check=check)
+    assert seen == [[], [], ["BK1"]]
+
+
+def test_engine_sells_held_seats_only_once_the_booking_is_saved(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(__file__)), "movies.json"), tmp_path)
+    engine = ChatEngine(*(str(tmp_path / name) for name in
+                          ("movies.json", "bookings.json", "users.json", "preferences.json")))
+    session = engine.session("s1")
+    session.booking_flow = dict(new_booking_flow(), step=6, movie=SHOW[0], theater=SHOW[1],
+                                date=SHOW[2], time=SHOW[3], tickets=2)
+    everything = engine.inventory.available(SHOW)
+    assert engine._hold_seats(session) is not None
+    assert engine.inventory.available(SHOW) == everything - 2
+
+    def broken(booking, check=None):
+        raise OSError("disk full")
+    monkeypatch.setattr(engine.storage, "add_booking", broken)
+    reply, booking = engine.confirm_booking(session)
+    assert booking is None and "disk full" in reply
+    assert engine.inventory.available(SHOW) == everything and engine.inventory.holds() == 0
+
+    monkeypatch.undo()
+    reply, booking = engine.confirm_booking(session)
+    assert booking is not None and engine.storage.get_booking(booking["booking_id"])
+    assert engine.inventory.available(SHOW) == everything - 2 and engine.inventory.holds() == 0
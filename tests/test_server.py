@@ -0,0 +1,130 @@
+import asyncio
+import base64
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+from booking_ids import BookingIds
+from engine import ChatEngine
+from server import ChatServer, encode_frame, read_frame
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    for name in ("movies.json", "users.json"):
+        shutil.copy(os.path.join(ROOT, name), tmp_path)
+    return ChatEngine(*(str(tmp_path / name) for name in
+                        ("movies.json", "bookings.json", "users.json", "preferences.json")))
+
+
+def serve(engine, scenario):
+    """Run scenario(server, port) against a private server on localhost"""
+    async def main():
+        server = ChatServer(engine, port=0, workers=2)
+        _, port = await server.start()
+        try:
+            await scenario(server, port)
+        finally:
+            await server.close()
+    asyncio.run(main())
+
+
+async def post(port, path, payload):
+    """POST JSON, return (status, JSON reply)"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode() + body)
+    head, _, body = (await reader.read()).partition(b"\r\n\r\n")
+    writer.close()
+    return int(head.split()[1]), json.loads(body)
+
+
+async def open_websocket(port, session_id):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write(f"GET /ws?session={session_id} HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+                 f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n\r\n".encode())
+    await reader.readuntil(b"\r\n\r\n")
+    return reader, writer
+
+
+async def receive(reader):
+    opcode, payload = await asyncio.wait_for(read_frame(reader, max_size=1 << 20), 10)
+    assert opcode == 0x1
+    return json.loads(payload)
+
+
+def test_login_binds_the_session_to_the_user(engine):
+    async def scenario(server, port):
+        status, reply = await post(port, "/login", {"username": "demo", "password": "wrong"})
+        assert status == 401
+        status, reply = await post(port, "/login", {"username": "demo", "password": "demo123"})
+        assert status == 200 and reply["username"] == "demo"
+        status, _ = await post(port, "/chat", {"session": reply["session"], "text": "hello",
+                                               "username": "someone-else"})
+        assert status == 200
+        assert engine.session(reply["session"]).username == "demo"
+    serve(engine, scenario)
+
+
+def test_anonymous_sessions_only_see_their_own_bookings(engine):
+    booking_id = BookingIds(node=0).new_id()
+    engine.storage.add_booking({"booking_id": booking_id, "username": "guest-alice", "movie": "Cosmic Dreams",
+                                "theater": "Grand Arena", "date": "2026-10-18", "time": "6:00 PM",
+                                "tickets": 1, "status": "confirmed"})
+
+    async def scenario(server, port):
+        for session_id in ("mallory", "alice"):
+            status, _ = await post(port, "/chat", {"session": session_id, "text": "hello"})
+            assert status == 200
+    serve(engine, scenario)
+
+    mallory, alice = engine.session("mallory"), engine.session("alice")
+    assert booking_id not in engine.view_my_bookings(mallory)
+    assert "not found" in engine.handle_cancel_booking(mallory, f"cancel booking {booking_id}")
+    assert engine.storage.get_booking(booking_id)["status"] == "confirmed"
+    assert booking_id in engine.view_my_bookings(alice)
+    assert "has been cancelled" in engine.handle_cancel_booking(alice, f"cancel booking {booking_id}")
+
+
+def test_expired_login_is_refused_rather_than_served_as_a_guest(engine):
+    async def scenario(server, port):
+        _, login = await post(port, "/login", {"username": "demo", "password": "demo123"})
+        session_id = login["session"]
+        reader, writer = await open_websocket(port, session_id)
+        writer.write(encode_frame(0x1, b"hello", mask=os.urandom(4)))
+        assert "text" in await receive(reader)
+
+        server.sweep(time.monotonic() + server.session_ttl + 1)
+        assert (await receive(reader))["event"] == "session_expired"
+        writer.write(encode_frame(0x1, b"show my bookings", mask=os.urandom(4)))
+        assert (await receive(reader))["event"] == "session_expired"
+        writer.close()
+
+        status, reply = await post(port, "/chat", {"session": session_id, "text": "show my bookings"})
+        assert status == 401 and "log in" in reply["error"]
+        # Anonymous sessions just start over
+        status, _ = await post(port, "/chat", {"session": "guest-session", "text": "hello"})
+        server.sweep(time.monotonic() + server.session_ttl + 1)
+        status, _ = await post(port, "/chat", {"session": "guest-session", "text": "hello"})
+        assert status == 200
+    serve(engine, scenario)
+
+
+def test_failed_turn_is_a_500_not_a_dropped_connection(engine, monkeypatch):
+    def broken(session_id, text):
+        raise RuntimeError("engine bug")
+    monkeypatch.setattr(engine, "respond", broken)
+
+    async def scenario(server, port):
+        status, reply = await post(port, "/chat", {"session": "s", "text": "hello"})
+        assert status == 500 and reply == {"error": "Internal error"}
+        status, reply = await post(port, "/health", {})
+        assert status == 200 and reply["status"] == "ok"
+    serve(engine, scenario)
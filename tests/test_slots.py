@@ -0,0 +1,42 @@
+import os
+from datetime import date, datetime, time
+
+import pytest
+
+from catalog import get_catalog
+from slots import SlotExtractor
+
+NOW = datetime(2026, 10, 17, 10, 0)  # a Saturday morning
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return SlotExtractor(get_catalog(os.path.join(os.path.dirname(os.path.dirname(__file__)), "movies.json")))
+
+
+def test_one_message_fills_every_slot(extractor):
+    slots = extractor.extract("book 3 VIP tickets for Cosmic Dreams at Grand Arena tomorrow 9:30pm", NOW)
+    assert slots.movie["title"] == "Cosmic Dreams" and slots.theater["name"] == "Grand Arena"
+    assert (slots.date, slots.time, slots.tickets, slots.seat_type) == (
+        date(2026, 10, 18), time(21, 30), 3, "VIP")
+
+
+def test_names_are_not_read_as_times(extractor):
+    slots = extractor.extract("two tickets for Mystery at Midnight", NOW)
+    assert slots.movie["title"] == "Mystery at Midnight"
+    assert (slots.time, slots.tickets) == (None, 2)
+
+
+@pytest.mark.parametrize("message, tickets", [
+    ("a pair of seats", 2),
+    ("for a party of 4", 4),
+    ("3 premium seats", 3),
+    ("at 7 tonight", None),  # a number without a ticket noun
+    ("50 tickets", None),    # more than anyone books at once
+])
+def test_ticket_counts(extractor, message, tickets):
+    assert extractor.extract(message, NOW).tickets == tickets
+
+
+def test_a_message_without_details_fills_nothing(extractor):
+    assert extractor.extract("hello there", NOW) == (None,) * 6
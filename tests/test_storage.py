@@ -0,0 +1,163 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from seating import booking_show
+from storage import SQLiteStorage, migrate_json_to_sqlite, open_storage
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    return open_storage(*(str(tmp_path / name) for name in ("bookings.json", "users.json", "preferences.json")),
+                        backend=request.param, db_file=str(tmp_path / "moviebot.db"))
+
+
+def add_bookings(storage, count):
+    for i in range(count):
+        storage.add_booking({"booking_id": f"BK{i}", "username": "demo" if i % 2 else "guest",
+                             "movie": "Cosmic Dreams", "theater": "Grand Arena", "status": "confirmed"})
+
+
+def test_cancel_updates_one_booking_in_place(storage):
+    add_bookings(storage, 5)
+    assert storage.update_booking("BK3", {"status": "cancelled"}, expect={"status": "confirmed"})
+    assert storage.get_booking("BK3")["status"] == "cancelled"
+    bookings = storage.all_bookings()
+    assert [b["booking_id"] for b in bookings] == [f"BK{i}" for i in range(5)]
+    assert [b["status"] for b in bookings].count("cancelled") == 1
+    assert [b["booking_id"] for b in storage.bookings_for_user("demo")] == ["BK1", "BK3"]
+
+
+def test_cancel_of_a_missing_booking_fails(storage):
+    add_bookings(storage, 2)
+    assert not storage.update_booking("BK9", {"status": "cancelled"})
+    assert storage.get_booking("BK9") is None
+
+
+def test_only_the_first_of_two_cancellations_wins(storage):
+    add_bookings(storage, 1)
+    assert storage.update_booking("BK0", {"status": "cancelled"}, expect={"status": "confirmed"})
+    assert not storage.update_booking("BK0", {"status": "cancelled"}, expect={"status": "confirmed"})
+
+
+def test_racing_threads_cancel_once(storage):
+    add_bookings(storage, 1)
+    results = []
+    barrier = threading.Barrier(8)
+
+    def cancel():
+        barrier.wait()
+        results.append(storage.update_booking("BK0", {"status": "cancelled"}, expect={"status": "confirmed"}))
+
+    threads = [threading.Thread(target=cancel) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+
+
+def add_in_child(directory, backend):
+    """Child process: store BK0, so the parent never opens (and forks) the storage"""
+    os.chdir(directory)
+    add_bookings(open_storage(backend=backend, db_file="moviebot.db"), 1)
+
+
+def cancel_in_child(directory, backend, barrier, results):
+    """Child process: try to cancel BK0"""
+    os.chdir(directory)
+    storage = open_storage(backend=backend, db_file="moviebot.db")
+    barrier.wait(30)
+    results.put(storage.update_booking("BK0", {"status": "cancelled"}, expect={"status": "confirmed"}))
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_racing_processes_cancel_once(tmp_path, backend):
+    context = multiprocessing.get_context("fork")
+    setup = context.Process(target=add_in_child, args=(str(tmp_path), backend))
+    setup.start()
+    setup.join(60)
+    assert setup.exitcode == 0
+    barrier, results = context.Barrier(4), context.Queue()
+    processes = [context.Process(target=cancel_in_child, args=(str(tmp_path), backend, barrier, results))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    wins = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(60)
+    assert wins.count(True) == 1
+
+
+def test_pages_of_recent_bookings(storage):
+    add_bookings(storage, 9)
+    page, cursor = storage.recent_bookings_for_user("demo", limit=3)
+    assert [b["booking_id"] for b in page] == ["BK7", "BK5", "BK3"]
+    page, cursor = storage.recent_bookings_for_user("demo", limit=3, before=cursor)
+    assert [b["booking_id"] for b in page] == ["BK1"] and cursor is None
+
+
+def test_users_and_preferences_round_trip(storage):
+    storage.add_user({"username": "demo", "password": "x"})
+    storage.save_preferences("demo", {"genres": {"sci-fi": 2}})
+    storage.save_many_preferences({"ann": {"genres": {}}, "bob": {"theaters": {"1": 1}}})
+    assert storage.get_user("demo") == {"username": "demo", "password": "x"}
+    assert storage.get_user("nobody") is None
+    assert storage.load_preferences("demo") == {"genres": {"sci-fi": 2}}
+    assert set(storage.all_preferences()) == {"demo", "ann", "bob"}
+
+
+def test_changes_since_reports_changed_bookings_in_order(storage):
+    add_bookings(storage, 3)
+    _, seq = storage.changes_since(0)
+    storage.update_booking("BK1", {"status": "cancelled"})
+    storage.update_booking("BK1", {"tickets": 2})
+    storage.delete_booking("BK2")
+    changed, last = storage.changes_since(seq)
+    assert list(dict.fromkeys(b["booking_id"] for b in changed)) == ["BK1", "BK2"]
+    assert {b["booking_id"]: b["status"] for b in changed} == {"BK1": "cancelled", "BK2": "deleted"}
+    assert storage.changes_since(last) == ([], last)
+    assert storage.changes_since(None)[0] is None
+
+
+def test_migration_copies_the_json_files_once(tmp_path):
+    files = [str(tmp_path / name) for name in ("bookings.json", "users.json", "preferences.json")]
+    source = open_storage(*files, backend="json")
+    add_bookings(source, 4)
+    source.add_user({"username": "demo"})
+    source.save_preferences("demo", {"genres": {"drama": 1}})
+
+    db_file = str(tmp_path / "moviebot.db")
+    assert migrate_json_to_sqlite(*files, db_file=db_file) == (4, 1, 1)
+    target = SQLiteStorage(db_file)
+    assert target.all_bookings() == source.all_bookings()
+    assert target.get_user("demo") == {"username": "demo"}
+    assert target.load_preferences("demo") == {"genres": {"drama": 1}}
+    with pytest.raises(ValueError):
+        migrate_json_to_sqlite(*files, db_file=db_file)
+
+
+def test_old_databases_get_the_show_column(tmp_path):
+    db_file = str(tmp_path / "moviebot.db")
+    booking = {"booking_id": "BK0", "username": "demo", "movie": "Cosmic Dreams", "theater": "Grand Arena",
+               "date": "2026-10-18", "time": "6:00 PM", "status": "confirmed"}
+    with sqlite3.connect(db_file) as conn:
+        conn.executescript("""
+            CREATE TABLE bookings (seq INTEGER PRIMARY KEY AUTOINCREMENT, booking_id TEXT NOT NULL,
+                                   username TEXT, data TEXT NOT NULL);
+            CREATE INDEX idx_bookings_show ON bookings (json_extract(data, '$.movie'));
+        """)
+        conn.executemany("INSERT INTO bookings (booking_id, username, data) VALUES (?, ?, ?)",
+                         [(f"BK{i}", "demo", json.dumps(dict(booking, booking_id=f"BK{i}"))) for i in range(5)])
+    conn.close()
+
+    storage = SQLiteStorage(db_file)
+    show = booking_show(booking)
+    assert [b["booking_id"] for b in storage.bookings_for_show(show)] == [f"BK{i}" for i in range(5)]
+    indexes = {row[1] for row in storage._connection().execute("PRAGMA index_list(bookings)")}
+    assert "idx_bookings_show" not in indexes and "idx_bookings_show_key" in indexes
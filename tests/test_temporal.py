@@ -0,0 +1,59 @@
+from datetime import date, datetime, time
+
+import pytest
+
+from temporal import TemporalParser, When, format_day, parse_many, parse_when
+
+NOW = datetime(2026, 10, 17, 12, 0)  # a Saturday
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Book 2 for Dune tomorrow evening", When(date(2026, 10, 18), time(18, 30), None)),
+    ("next friday at 7", When(date(2026, 10, 23), time(19, 0), None)),
+    ("saturday", When(date(2026, 10, 17), None, None)),
+    ("next saturday", When(date(2026, 10, 24), None, None)),
+    ("this weekend", When(date(2026, 10, 17), None, None)),
+    ("in 3 days", When(date(2026, 10, 20), None, None)),
+    ("Oct 3rd after 6pm", When(date(2027, 10, 3), None, time(18, 0))),  # past dates mean next year
+    ("3rd of november", When(date(2026, 11, 3), None, None)),
+    ("12/24", When(date(2026, 12, 24), None, None)),
+    ("2026-10-18 (Sunday)", When(date(2026, 10, 18), None, None)),
+    ("6:30 PM", When(None, time(18, 30), None)),
+    ("at 21:15", When(None, time(21, 15), None)),
+    ("at 7am", When(None, time(7, 0), None)),
+    ("noon", When(None, time(12, 0), None)),
+])
+def test_phrases(text, expected):
+    assert parse_when(text, NOW) == expected
+
+
+@pytest.mark.parametrize("text", ["2 tickets", "Feb 30", "at 13pm", "", "hello"])
+def test_nothing_to_find(text):
+    assert parse_when(text, NOW) == When(None, None, None)
+
+
+def test_cache_keeps_relative_days_relative():
+    clock = [NOW]
+    parser = TemporalParser(clock=lambda: clock[0], cache_size=2)
+    assert parser.parse("Tomorrow").day == date(2026, 10, 18)
+    clock[0] = datetime(2026, 10, 20, 9, 0)
+    assert parser.parse("  tomorrow ").day == date(2026, 10, 21)
+    assert (parser.hits, parser.misses) == (1, 1)
+
+    parser.parse("today")
+    parser.parse("in 2 days")
+    parser.parse("tomorrow")  # evicted by the two newer phrases
+    assert parser.misses == 4
+
+
+def test_parse_many_uses_one_clock_reading():
+    assert parse_many(["tomorrow", "", "tomorrow at 7"], NOW) == [
+        When(date(2026, 10, 18), None, None), When(None, None, None),
+        When(date(2026, 10, 18), time(19, 0), None)]
+
+
+def test_format_day():
+    today = NOW.date()
+    assert format_day(today, today) == "today, Saturday 17 October"
+    assert format_day(date(2026, 10, 18), today) == "tomorrow, Sunday 18 October"
+    assert format_day(date(2026, 11, 1), today) == "Sunday 1 November"
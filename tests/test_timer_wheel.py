@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from timer_wheel import TimerWheel
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run(wheel, clock, until):
+    """Advance one tick at a time, return {tick: items fired at it}"""
+    fired = {}
+    while clock.now < until:
+        clock.now += wheel.tick
+        items = wheel.advance()
+        if items:
+            fired[round(clock.now / wheel.tick)] = sorted(items)
+    return fired
+
+
+def test_timers_fire_on_the_tick_their_delay_ends():
+    clock = Clock()
+    wheel = TimerWheel(clock=clock)
+    wheel.schedule(2.5, "b")
+    wheel.schedule(1, "a")
+    wheel.schedule(0, "now")  # fires on the next tick, never on the current one
+    assert wheel.advance() == []
+    assert len(wheel) == 3
+    assert run(wheel, clock, 5) == {1: ["a", "now"], 3: ["b"]}
+    assert len(wheel) == 0
+
+
+def test_cancelled_timers_never_fire():
+    clock = Clock()
+    fired = []
+    wheel = TimerWheel(clock=clock, on_expire=fired.append)
+    keep, drop = wheel.schedule(3, "keep"), wheel.schedule(3, "drop")
+    assert wheel.cancel(drop)
+    assert not wheel.cancel(drop)
+    run(wheel, clock, 5)
+    assert fired == ["keep"]
+    assert not wheel.cancel(keep)  # already fired
+
+
+def test_timers_cascade_down_the_levels():
+    clock = Clock()
+    wheel = TimerWheel(slots=4, levels=3, clock=clock)  # reaches 63 ticks
+    rng = random.Random(3)
+    delays = {n: rng.randint(1, 63) for n in range(200)}
+    for n, delay in delays.items():
+        wheel.schedule(delay, n)
+    expected = {}
+    for n, delay in delays.items():
+        expected.setdefault(delay, []).append(n)
+    assert run(wheel, clock, 70) == {tick: sorted(items) for tick, items in expected.items()}
+    with pytest.raises(ValueError):
+        wheel.schedule(64, "too far")
+
+
+def test_an_idle_wheel_catches_up_at_once():
+    clock = Clock()
+    wheel = TimerWheel(clock=clock)
+    clock.now = 1000.0
+    assert wheel.advance() == []
+    wheel.schedule(2, "late")
+    clock.now = 1001.0
+    assert wheel.advance() == []
+    clock.now = 1002.0
+    assert wheel.advance() == ["late"]
@@ -0,0 +1,44 @@
+from transcript import Transcript, trim_text_widget
+
+
+def test_old_messages_spill_in_batches():
+    spilled = []
+    transcript = Transcript(capacity=3, spill=spilled.append, spill_batch=2)
+    for n in range(8):
+        transcript.append(n)
+    assert list(transcript) == [5, 6, 7] and transcript[0] == 5
+    assert spilled == [[0, 1], [2, 3]]
+    transcript.flush()
+    assert spilled[-1] == [4]
+    transcript.flush(everything=True)
+    assert spilled[-1] == [5, 6, 7] and len(transcript) == 0
+
+
+def test_without_a_spill_old_messages_are_dropped():
+    transcript = Transcript(capacity=2)
+    for n in range(5):
+        transcript.append(n)
+    assert list(transcript) == [3, 4]
+    transcript.flush(everything=True)
+
+
+class TextWidget:
+    """Just enough of a Tk Text widget: one entry per line"""
+
+    def __init__(self, lines):
+        self.lines = list(range(1, lines + 1))
+
+    def index(self, mark):
+        return f"{len(self.lines) + 1}.0"  # "end-1c" sits on the empty last line
+
+    def delete(self, start, end):
+        del self.lines[:int(end.split(".")[0]) - 1]
+
+
+def test_the_widget_is_trimmed_only_well_past_its_limit():
+    widget = TextWidget(110)
+    trim_text_widget(widget, 100)
+    assert len(widget.lines) == 110
+    widget = TextWidget(125)
+    trim_text_widget(widget, 100)
+    assert widget.lines[0] == 27 and len(widget.lines) == 99  # plus the empty last line
@@ -0,0 +1,108 @@
+import re
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase text and split it into alphanumeric tokens"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def token_spans(text):
+    """tokenize() that also returns where each token is, as [(token, start, end)]"""
+    return [(match.group(), match.start(), match.end()) for match in _TOKEN_PATTERN.finditer(text.lower())]
+
+
+class TitleMatcher:
+    """Finds every catalog title mentioned in a message in one pass over its tokens
+
+    Titles live in a trie keyed by token, so a message is scanned once with a
+    walk from each token position that stops at the first token no title
+    continues with. Each title is stored under a key (the movie or theater id),
+    so several entries may share a title, as re-releases do. A matcher is
+    built once and only read after that; the catalog builds a new one for
+    every reload.
+    """
+
+    def __init__(self, items=()):
+        self._trie = {}
+        self._names = {}  # key -> name
+        self._max_tokens = 0
+        for key, name in dict(items).items():
+            self.add(key, name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, key, name):
+        """Index a title under a key not used yet"""
+        tokens = tokenize(name)
+        if not tokens:
+            return
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node.setdefault(None, []).append(key)
+
+        self._names[key] = name
+        self._max_tokens = max(self._max_tokens, len(tokens))
+
+    def find_all(self, text):
+        """Return (key, start, end) token spans for every title in text, in text order"""
+        return self.find_all_tokens(tokenize(text))
+
+    def find_all_tokens(self, tokens):
+        """find_all for a message already split by tokenize()"""
+        found = []
+        for start in range(len(tokens)):
+            node = self._trie
+            for end in range(start, min(len(tokens), start + self._max_tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                for key in node.get(None, ()):
+                    found.append((key, start, end + 1))
+        return found
+
+    def find(self, text):
+        """Return the key of the longest title mentioned in text, or None"""
+        best = None
+        for key, start, end in self.find_all(text):
+            if best is None or end - start > best[2] - best[1]:
+                best = (key, start, end)
+        return best[0] if best else None
+
+
+if __name__ == "__main__":
+    import random
+    import string
+    import timeit
+
+    random.seed(1)
+    words = ["".join(random.choices(string.ascii_lowercase, k=random.randint(3, 8))) for _ in range(5000)]
+    titles = {i: " ".join(random.choices(words, k=random.randint(1, 4))) for i in range(30000)}
+    # Re-releases share a title under a new id
+    for i in range(30000, 31000):
+        titles[i] = titles[i - 30000]
+
+    started = timeit.default_timer()
+    matcher = TitleMatcher(titles)
+    print(f"index {len(titles)} titles {(timeit.default_timer() - started) * 1e3:8.1f} ms")
+
+    messages = [
+        f"I want to book 2 tickets for {titles[7]} tomorrow at 6:30 pm",
+        f"is {titles[30001]} playing this weekend",
+        "what movies are playing tonight",
+    ]
+
+    def scan(message):
+        message_lower = message.lower()
+        for title in titles.values():
+            if title.lower() in message_lower:
+                return title
+        return None
+
+    rounds = 20
+    for name, func in (("substring scan", scan), ("matcher", matcher.find)):
+        elapsed = timeit.timeit(lambda: [func(m) for m in messages], number=rounds)
+        print(f"{name:14s} {elapsed / (rounds * len(messages)) * 1e6:10.1f} us/message")
@@ -0,0 +1,89 @@
+import threading
+from collections import deque
+
+
+class Transcript:
+    """Chat transcript holding at most capacity messages in memory
+
+    Appending past capacity pushes the oldest message out. Pushed-out messages
+    go to spill(messages) in batches of spill_batch, or are dropped when there
+    is no spill, so memory stays flat however long the conversation runs.
+    """
+
+    def __init__(self, capacity=500, spill=None, spill_batch=100):
+        self.capacity = capacity
+        self.spill = spill
+        self.spill_batch = spill_batch
+        self._messages = deque()
+        self._pending = []  # pushed out, not spilled yet
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._messages))
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+    def append(self, message):
+        """Add a message, spilling the oldest ones once a batch is full"""
+        batch = None
+        with self._lock:
+            self._messages.append(message)
+            if len(self._messages) > self.capacity:
+                oldest = self._messages.popleft()
+                if self.spill is not None:
+                    self._pending.append(oldest)
+                    if len(self._pending) >= self.spill_batch:
+                        batch, self._pending = self._pending, []
+        if batch:
+            self.spill(batch)
+
+    def flush(self, everything=False):
+        """Spill pending messages now; with everything, the in-memory ones too"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if everything:
+                batch.extend(self._messages)
+                self._messages.clear()
+        if batch and self.spill is not None:
+            self.spill(batch)
+
+
+def trim_text_widget(widget, max_lines):
+    """Delete the oldest lines of a Tk Text widget beyond max_lines
+
+    Waits until the widget is a fifth over max_lines and then trims back down,
+    so the delete runs once every few dozen messages rather than on each one.
+    The widget must be in NORMAL state.
+    """
+    lines = int(widget.index("end-1c").split(".")[0])
+    if lines > max_lines * 1.2:
+        widget.delete("1.0", f"{lines - max_lines + 1}.0")
+
+
+if __name__ == "__main__":
+    import tracemalloc
+
+    # A kiosk chatting all day: memory held by the transcript as messages pile up
+    messages = 100_000
+
+    def run(history):
+        tracemalloc.start()
+        samples = []
+        for n in range(1, messages + 1):
+            history.append({"timestamp": "12:00", "sender": "user" if n % 2 else "bot",
+                            "message": f"message {n}: which showtimes are left for Dune tonight?"})
+            if n % (messages // 4) == 0:
+                samples.append(tracemalloc.get_traced_memory()[0] / 1e6)
+        tracemalloc.stop()
+        return samples
+
+    unbounded = run([])
+    bounded = run(Transcript(capacity=500))
+    print(f"{messages} messages, memory after each quarter (MB)")
+    print("  list:       " + ", ".join(f"{mb:.1f}" for mb in unbounded))
+    print("  transcript: " + ", ".join(f"{mb:.1f}" for mb in bounded))